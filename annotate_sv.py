@@ -1,262 +1,568 @@
+import gzip
+import io
 import pandas as pd
 import subprocess
 import os
+from contextlib import nullcontext
 
+from annotation_cache import open_cache
+from clinvar_track import CLINVAR_TRACK, PATHOGENIC_RANK, pathogenicity_rank
+from interval_index import IntervalIndex
+from metrics import measure
+from reference_cache import load_reference
+from sv_store import StoreWriter
+from table_io import TableWriter, to_columnar, write_table
 
-def annotate_sv(
-    input_file,
-    output_file,
-    gene_bed="hg38_refGene.bed",
-    exon_bed="hg38_exons.bed",
-    clinvar_bed="clinvar_SV.bed"):
-    
-# for generating clinvar_SV.bed, we used https://www.ncbi.nlm.nih.gov/clinvar/?term=%22structural+variant%22 
-# (downloaded the txt file from here)
 
+OVERLAP_KEYS = ["sv_chrom", "sv_start0", "sv_end"]
+
+# bedtools: bedtools intersect per file; index: in-memory interval index;
+# cache: memory-mapped compiled reference (reference_cache.py)
+BACKENDS = ["bedtools", "index", "cache"]
+
+# SVs per chunk in annotate_sv_chunked
+CHUNK_SIZE = 100_000
+
+FINAL_COLS = [
+    "chrom","start","end","ref","alt",
+    "Function","Gene","Priority",
+    "clinvar_germline_classification",
+    "clinvar_condition",
+    "clinvar_pathogenic_rank"
+]
+
+# Highest ClinVar pathogenicity rank of the hits (clinvar_track.PATHOGENICITY_RANK, 0 = none)
+RANK_COL = "clinvar_pathogenic_rank"
+
+
+def _overlap_keys(overlap_df):
     """
-    This annotation function is using the following:
-       - Gene overlaps
-       - Exon overlaps
-       - Checking priority (Exonic > Intronic > Intergenic)
-       - ClinVar pathogenicity category
+    (chrom, start0, end) keys of the SVs that have at least one hit
+    in an overlap table.
+    """
+    return pd.MultiIndex.from_frame(overlap_df[OVERLAP_KEYS])
 
-    Expected input_file format (ANNOVAR input format, AVINPUT):
-        chrom   start   end   ref   alt
 
-    ClinVar BED format:
-        chrom   start   end   germline_classification
-        
-    ClinVar BED format (with condition):
-        chrom   start   end   germline_classification  condition
+def _collapse_overlaps(df, overlap_df, value_col):
     """
+    Collapses an overlap table to one row per SV (grouped on chrom, start0, end)
+    and maps it back onto df, so the cost grows with the number of overlaps
+    instead of SVs x overlaps.
 
-# ----------------------------------------------------------------
-# 1. If file is empty, then will produce an empty annotated file
-# ----------------------------------------------------------------
-    if os.path.getsize(input_file) == 0:
-        print(f"{input_file} is empty — writing empty annotation file.")
+    Each SV gets its unique hit values, sorted and joined with ";"
+    (or "-" when nothing overlaps).
+    """
+    if overlap_df.empty:
+        return pd.Series("-", index=df.index)
 
-        empty_cols = [
-            "chrom","start","end","ref","alt",
-            "Function","Gene","Priority",
-            "clinvar_germline_classification",
-            "clinvar_condition"
-            
-        ]
-        pd.DataFrame(columns=empty_cols).to_csv(output_file, index=False)
-        return pd.DataFrame()
+    hits = (
+        overlap_df.groupby(OVERLAP_KEYS, sort=False)[value_col]
+        .agg(lambda values: ";".join(sorted(values.unique())))
+    )
+    hits.index.names = ["chrom", "start0", "end"]
 
+    joined = df[["chrom","start0","end"]].join(hits, on=["chrom","start0","end"])
+    return joined[value_col].fillna("-")
 
-# ------------------------------------------------
-# 2. Loading input SVs (chrom, start, end, ref, alt)
-# ------------------------------------------------
-    df = pd.read_csv(
-        input_file, sep="\t", header=None,
-        names=["chrom","start","end","ref","alt"]
+
+def _max_overlap(df, overlap_df, value_col):
+    """
+    Same as _collapse_overlaps for an integer column: each SV gets the
+    highest of its hit values (0 when nothing overlaps).
+    """
+    if overlap_df.empty:
+        return pd.Series(0, index=df.index, dtype="int64")
+
+    hits = (
+        overlap_df.astype({value_col: "int64"})
+        .groupby(OVERLAP_KEYS, sort=False)[value_col].max()
+    )
+    hits.index.names = ["chrom", "start0", "end"]
+
+    joined = df[["chrom","start0","end"]].join(hits, on=["chrom","start0","end"])
+    return joined[value_col].fillna(0).astype("int64")
+
+
+def _bedtools_overlaps(sv_bed, ref_bed, cols):
+    """
+    Pipes the SV BED (text) into `bedtools intersect -a stdin -b ref_bed -wa -wb`
+    and parses its output straight from the pipe (empty table if nothing
+    overlaps). Nothing is written to disk, so concurrent runs cannot collide.
+    """
+    result = subprocess.run(
+        ["bedtools", "intersect", "-a", "stdin", "-b", ref_bed, "-wa", "-wb"],
+        input=sv_bed,
+        stdout=subprocess.PIPE,
+        check=False
     )
 
+    if not result.stdout:
+        return pd.DataFrame(columns=cols)
+    return pd.read_csv(io.BytesIO(result.stdout), sep="\t", names=cols)
+
+
+# ClinVar classes of the pathLink table, for tables without RANK_COL
+# (matched case-insensitively)
+PATHOGENIC_PATTERN = "pathogenic|likely pathogenic"
+
+
+def exonic_rows(annotated):
+    """SVs of an annotated table that hit an exon."""
+    return annotated[annotated["Function"] == "exonic"]
+
+
+def pathogenic_rows(annotated):
+    """SVs of an annotated table overlapping a pathogenic / likely pathogenic ClinVar SV."""
+    if RANK_COL in annotated.columns:
+        return annotated[annotated[RANK_COL] >= PATHOGENIC_RANK]
+    # annotated before the rank column existed
+    return annotated[
+        annotated["clinvar_germline_classification"].str.contains(
+            PATHOGENIC_PATTERN, case=False, na=False
+        )
+    ]
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown annotation backend: {backend}")
+
+
+def load_indexes(references):
+    """{reference BED: IntervalIndex} for the "index" backend (no condition BED = None is skipped)."""
+    return {bed: IntervalIndex.from_bed(bed) for bed in set(references) if bed}
+
+
+def _fill_ref_alt(df):
     # Replaces missing REF or ALT
     df["ref"] = df["ref"].fillna("N")
     df["alt"] = df["alt"].fillna("<NA>")
-    
+    return df
+
+
+def is_empty(input_file):
+    """True for an empty AVINPUT, plain or bgzipped (a .gz of nothing is not 0 bytes)."""
+    if input_file.endswith(".gz"):
+        with gzip.open(input_file, "rb") as f:
+            return not f.read(1)
+    return os.path.getsize(input_file) == 0
+
+
+def read_avinput(input_file):
+    """
+    Loads an AVINPUT file (chrom, start, end, ref, alt), filling missing REF/ALT.
+    A bgzipped .avinput.gz (bgzf.bgzip_file) is read the same way.
+    """
+    df = pd.read_csv(
+        input_file, sep="\t", header=None,
+        names=["chrom","start","end","ref","alt"]
+    )
+    return _fill_ref_alt(df)
 
-    # Creates BED file for BEDTools (internally only)
+
+def read_avinput_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """Same as read_avinput, chunk_size SVs at a time."""
+    reader = pd.read_csv(
+        input_file, sep="\t", header=None,
+        names=["chrom","start","end","ref","alt"],
+        chunksize=chunk_size
+    )
+    with reader:
+        for df in reader:
+            yield _fill_ref_alt(df)
+
+
+def _annotate(
+    df,
+    gene_bed,
+    exon_bed,
+    clinvar_bed,
+    clinvar_condition_bed,
+    backend,
+    indexes=None,
+    annotation_cache=None):
+    """
+    Steps 3-8 of annotate_sv on an already loaded AVINPUT table.
+    clinvar_condition_bed: None when clinvar_bed is the unified ClinVar track
+        (clinvar_track.py); then one overlap query gives all the ClinVar columns
+    indexes: optional {reference BED: IntervalIndex} already loaded ("index" backend)
+    annotation_cache: optional AnnotationCache; only the SVs it does not hold are annotated
+    Returns the FINAL_COLS table.
+    """
+    if annotation_cache is not None:
+        return _annotate_cached(df, gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed,
+                                backend, indexes, annotation_cache)
+
+    df = df.copy()
+
+    # BED coordinates of the SVs (internally only)
     df["start0"] = df["start"] - 1  
     # convert for BEDTools. internal only, not in output.
     
-    sv_bed = input_file + ".tmp.bed"
-    df[["chrom","start0","end","alt"]].to_csv(
-        sv_bed, sep="\t", header=False, index=False
-    )  
+    sv_table = df[["chrom","start0","end","alt"]]
+
+    # BED text piped to bedtools (kept in memory, no temp file)
+    sv_bed = None
+    if backend == "bedtools":
+        sv_bed = sv_table.to_csv(sep="\t", header=False, index=False).encode()
+
+    def find_overlaps(ref_bed, name, cols):
+        with measure(f"overlaps_{name}", rows_in=len(sv_table)) as m:
+            if backend == "index":
+                index = (indexes or {}).get(ref_bed) or IntervalIndex.from_bed(ref_bed)
+                overlaps = index.intersect(sv_table, cols)
+            elif backend == "cache":
+                overlaps = load_reference(ref_bed).intersect(sv_table, cols)
+            else:
+                overlaps = _bedtools_overlaps(sv_bed, ref_bed, cols)
+            m["rows_out"] = len(overlaps)
+        return overlaps
     
     
     
 # ----------------------------------------------------
 # 3. Gene overlaps
 # ----------------------------------------------------
-    gene_overlap_file = input_file + ".gene_overlap"
-    subprocess.run(
-        ["bedtools", "intersect", "-a", sv_bed, "-b", gene_bed, "-wa", "-wb"],
-        stdout=open(gene_overlap_file, "w"),
-        check=False
-    )
-
     gene_cols = [
         "sv_chrom","sv_start0","sv_end","sv_alt",
         "gene_chrom","gene_start","gene_end","gene_name"
     ]
 
-    try:
-        gene_df = pd.read_csv(gene_overlap_file, sep="\t", names=gene_cols)
-    except pd.errors.EmptyDataError:
-        gene_df = pd.DataFrame(columns=gene_cols)
+    gene_df = find_overlaps(gene_bed, "gene", gene_cols)
 
 # ----------------------------------------------------
 # 4. Exon overlaps
 # ----------------------------------------------------
-    exon_overlap_file = input_file + ".exon_overlap"
-    subprocess.run(
-        ["bedtools", "intersect", "-a", sv_bed, "-b", exon_bed, "-wa", "-wb"],
-        stdout=open(exon_overlap_file, "w"),
-        check=False
-    )
-
     exon_cols = [
         "sv_chrom","sv_start0","sv_end","sv_alt",
         "exon_chrom","exon_start","exon_end","exon_gene"
     ]
 
-    try:
-        exon_df = pd.read_csv(exon_overlap_file, sep="\t", names=exon_cols)
-    except pd.errors.EmptyDataError:
-        exon_df = pd.DataFrame(columns=exon_cols)
+    exon_df = find_overlaps(exon_bed, "exon", exon_cols)
 
-    exonic_sv = set(zip(
-        exon_df["sv_chrom"],
-        exon_df["sv_start0"],
-        exon_df["sv_end"]
-    ))
-    
     
     
 # ----------------------------------------------------
 # 5. Functional classification
 # ----------------------------------------------------
-    def classify(row):
-        key = (row.chrom, row.start0, row.end)
-
-        if key in exonic_sv:
-            return "exonic"
-
-        hits = gene_df[
-            (gene_df["sv_chrom"] == row.chrom) &
-            (gene_df["sv_start0"] == row.start0) &
-            (gene_df["sv_end"] == row.end)
-        ]
-
-        if not hits.empty:
-            return "intronic"
-
-        return "intergenic"
-
-    df["Function"] = df.apply(classify, axis=1)
+    with measure("classify_function", rows_in=len(df)):
+        sv_keys = pd.MultiIndex.from_frame(df[["chrom","start0","end"]])
+        in_exon = sv_keys.isin(_overlap_keys(exon_df))
+        in_gene = sv_keys.isin(_overlap_keys(gene_df))
+
+        df["Function"] = "intergenic"
+        df.loc[in_gene, "Function"] = "intronic"
+        df.loc[in_exon, "Function"] = "exonic"
     
     
 
 # ----------------------------------------------------
 # 6. Assigning overlapping gene(s)
 # ----------------------------------------------------
-    def get_gene(row):
-        hits = gene_df[
-            (gene_df["sv_chrom"] == row.chrom) &
-            (gene_df["sv_start0"] == row.start0) &
-            (gene_df["sv_end"] == row.end)
-        ]
-
-        if hits.empty:
-            return "-"
-
-        unique_genes = sorted(hits["gene_name"].unique())
-        return ";".join(unique_genes)
-
-    df["Gene"] = df.apply(get_gene, axis=1)
+    with measure("assign_genes", rows_in=len(gene_df)):
+        df["Gene"] = _collapse_overlaps(df, gene_df, "gene_name")
         
     
 
 # ----------------------------------------------------
 # 7. Priority score
 # ----------------------------------------------------
-    df["Priority"] = df["Function"].map({
-        "exonic": "High",
-        "intronic": "Medium",
-        "intergenic": "Low"
-    })
+    with measure("priority", rows_in=len(df)):
+        df["Priority"] = df["Function"].map({
+            "exonic": "High",
+            "intronic": "Medium",
+            "intergenic": "Low"
+        })
 
 
 # ----------------------------------------------------
 # 8. ClinVar pathogenicity annotation
 # ----------------------------------------------------
-    clin_file = input_file + ".clinvar_overlap"
+    if clinvar_condition_bed is None:
+        # unified track: classification, condition and rank in one query
+        clin_cols = [
+            "sv_chrom","sv_start0","sv_end","sv_alt",
+            "c_chrom","c_start","c_end","c_germ","condition","c_rank"
+        ]
+
+        clin_df = find_overlaps(clinvar_bed, "clinvar", clin_cols)
 
-    subprocess.run([
-        "bedtools", "intersect",
-        "-a", sv_bed,
-        "-b", clinvar_bed,
-        "-wa", "-wb"
-    ], stdout=open(clin_file, "w"), check=False)
+        with measure("assign_clinvar", rows_in=len(clin_df)):
+            df["clinvar_germline_classification"] = _collapse_overlaps(df, clin_df, "c_germ")
+            df["clinvar_condition"] = _collapse_overlaps(df, clin_df, "condition")
+            df[RANK_COL] = _max_overlap(df, clin_df, "c_rank")
+
+        return df[FINAL_COLS]
 
     clin_cols = [
         "sv_chrom","sv_start0","sv_end","sv_alt",
         "c_chrom","c_start","c_end","c_germ"
     ]
 
-    try:
-        clin_df = pd.read_csv(clin_file, sep="\t", names=clin_cols)
-    except pd.errors.EmptyDataError:
-        clin_df = pd.DataFrame(columns=clin_cols)
-
-    def lookup_clinvar(row):
-        hits = clin_df[
-            (clin_df["sv_chrom"] == row.chrom) &
-            (clin_df["sv_start0"] == row.start0) &
-            (clin_df["sv_end"] == row.end)
-        ]
-
-        if hits.empty:
-            return "-"
-
-        return ";".join(sorted(hits["c_germ"].unique()))
+    clin_df = find_overlaps(clinvar_bed, "clinvar", clin_cols)
 
-    df["clinvar_germline_classification"] = df.apply(lookup_clinvar, axis=1)
+    with measure("assign_clinvar", rows_in=len(clin_df)):
+        df["clinvar_germline_classification"] = _collapse_overlaps(df, clin_df, "c_germ")
+        clin_df["c_rank"] = clin_df["c_germ"].map(pathogenicity_rank)
+        df[RANK_COL] = _max_overlap(df, clin_df, "c_rank")
     
     
 # ----------------------------------------------------
 # 8. ClinVar Clinical Condition annotation
 # ----------------------------------------------------
-    clin_cond_file = input_file + ".clinvar_condition_overlap"
-
-    subprocess.run([
-        "bedtools", "intersect",
-        "-a", sv_bed,
-        "-b", "clinvar_SV_condition.bed",
-        "-wa", "-wb"
-    ], stdout=open(clin_cond_file, "w"), check=False)
-
     cond_cols = [
         "sv_chrom","sv_start0","sv_end","sv_alt",
         "c_chrom","c_start","c_end","condition","GermlineClass"
     ]
 
-    try:
-        cond_df = pd.read_csv(clin_cond_file, sep="\t", names=cond_cols)
-    except pd.errors.EmptyDataError:
-        cond_df = pd.DataFrame(columns=cond_cols)
+    cond_df = find_overlaps(clinvar_condition_bed, "clinvar_condition", cond_cols)
 
-    def lookup_condition(row):
-        hits = cond_df[
-            (cond_df["sv_chrom"] == row.chrom) &
-            (cond_df["sv_start0"] == row.start0) &
-            (cond_df["sv_end"] == row.end)
-        ]
-        if hits.empty:
-            return "-"
-        return ";".join(sorted(hits["condition"].unique()))
-
-    df["clinvar_condition"] = df.apply(lookup_condition, axis=1)
+    with measure("assign_clinvar_condition", rows_in=len(cond_df)):
+        df["clinvar_condition"] = _collapse_overlaps(df, cond_df, "condition")
 
     
     
+    return df[FINAL_COLS]
+
+
+def _annotate_cached(
+    df,
+    gene_bed,
+    exon_bed,
+    clinvar_bed,
+    clinvar_condition_bed,
+    backend,
+    indexes,
+    annotation_cache):
+    """
+    _annotate through the persistent annotation cache (annotation_cache.py):
+    the cached SVs are looked up in one query, the others are annotated and
+    added to the cache. Same table as _annotate.
+    """
+    references = (gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed)
+    fingerprint = annotation_cache.fingerprint(references)
+
+    with measure("cache_lookup", rows_in=len(df)) as m:
+        cached = annotation_cache.lookup(df, fingerprint)
+        joined = df.merge(
+            cached.astype({c: df[c].dtype for c in SUBSET_KEYS}),
+            on=SUBSET_KEYS, how="left", indicator=True
+        )
+        joined.index = df.index
+        missing = (joined["_merge"] == "left_only").to_numpy()
+        m["rows_out"] = int(len(df) - missing.sum())
+    print(f"----Annotation cache: {m['rows_out']} of {len(df)} SVs cached----")
+
+    if missing.any():
+        extra = _annotate(df[missing], *references, backend, indexes=indexes)
+        annotation_cache.add(extra, fingerprint)
+        joined.loc[missing, FINAL_COLS] = extra[FINAL_COLS].to_numpy()
+    return joined[FINAL_COLS].astype({RANK_COL: "int64"})
+
+
+def annotate_sv(
+    input_file,
+    output_file,
+    gene_bed="hg38_refGene.bed",
+    exon_bed="hg38_exons.bed",
+    clinvar_bed=CLINVAR_TRACK,
+    clinvar_condition_bed=None,
+    backend="bedtools",
+    annotation_cache=None):
+    
+# for generating the ClinVar track (clinvar_track.py), we used https://www.ncbi.nlm.nih.gov/clinvar/?term=%22structural+variant%22 
+# (downloaded the txt file from here: annovar/humandb/clinvar_SV.txt)
+
+    """
+    This annotation function is using the following:
+       - Gene overlaps
+       - Exon overlaps
+       - Checking priority (Exonic > Intronic > Intergenic)
+       - ClinVar pathogenicity category, condition and rank
+
+    Expected input_file format (ANNOVAR input format, AVINPUT):
+        chrom   start   end   ref   alt
+
+    ClinVar track format (clinvar_track.py, clinvar_condition_bed=None):
+        chrom   start   end   germline_classification  condition  pathogenicity_rank
+
+    or the two separate ClinVar BEDs:
+        chrom   start   end   germline_classification
+        chrom   start   end   condition  germline_classification
+    (the rank is then derived from the classification)
+
+    output_file:
+        .csv, .parquet or .feather/.arrow (see table_io.write_table)
+
+    backend:
+        "bedtools" runs `bedtools intersect` once per reference BED (default);
+        the SVs are piped in and the overlaps read back from the pipe, so no
+        intermediate files are written.
+        "index" uses the in-process IntervalIndex (interval_index.py) instead,
+        with the same half-open overlap semantics and no bedtools process.
+        "cache" is the same index, loaded from the memory-mapped reference
+        cache next to each BED (reference_cache.py), rebuilt automatically
+        when a BED changes.
+
+    annotation_cache:
+        optional SQLite annotation cache (path or AnnotationCache, see
+        annotation_cache.py). SVs annotated in an earlier run against the
+        same reference BEDs are read from it instead of being recomputed.
+    """
+
+    _check_backend(backend)
+
+# ----------------------------------------------------------------
+# 1. If file is empty, then will produce an empty annotated file
+# ----------------------------------------------------------------
+    if is_empty(input_file):
+        print(f"{input_file} is empty — writing empty annotation file.")
+
+        empty = pd.DataFrame(columns=FINAL_COLS)
+        write_table(empty, output_file)
+        return empty
+
+
+# ------------------------------------------------
+# 2. Loading input SVs (chrom, start, end, ref, alt)
+# ------------------------------------------------
+    df = read_avinput(input_file)
+
+    # steps 3-8 (overlaps, classification, ClinVar) are in _annotate
+    annotated = _annotate(
+        df,
+        gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed, backend,
+        annotation_cache=open_cache(annotation_cache)
+    )
+
 # ----------------------------------------------------
 # 9. Final output
 # ----------------------------------------------------
-    final_cols = [
-        "chrom","start","end","ref","alt",
-        "Function","Gene","Priority",
-        "clinvar_germline_classification", 
-        "clinvar_condition"
-    ]
+    write_table(annotated, output_file)
+
+    print(f"Annotation written to {output_file}")
+    # typed (categorical) table, so later stages can use it without re-reading
+    return to_columnar(annotated)
+
+
+def annotate_sv_chunked(
+    input_file,
+    output_file,
+    gene_bed="hg38_refGene.bed",
+    exon_bed="hg38_exons.bed",
+    clinvar_bed=CLINVAR_TRACK,
+    clinvar_condition_bed=None,
+    backend="index",
+    chunk_size=CHUNK_SIZE,
+    annotation_cache=None,
+    store_dir=None):
+    """
+    Memory-bounded annotate_sv for very large call sets: the AVINPUT is read
+    chunk_size SVs at a time, every chunk is annotated against the sorted
+    reference tracks (loaded once) and appended to output_file. Only one
+    chunk and its overlap tables are in memory at any time, so peak memory
+    follows chunk_size, not the size of the call set.
+
+    The output has the same rows, in the same order, as annotate_sv.
+    Coordinate-sorted input keeps the overlaps of each chunk local, but
+    any order gives the same result.
 
-    df[final_cols].to_csv(output_file, index=False)
+    With store_dir, the region / gene query store of the output
+    (sv_store.StoreWriter) is built from the same chunks.
+
+    Returns the number of annotated SVs (the table itself is not kept).
+    """
+    _check_backend(backend)
+    references = (gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed)
+
+    indexes = None
+    if backend == "index":
+        indexes = load_indexes(references)
+    annotation_cache = open_cache(annotation_cache)
+
+    store = StoreWriter(store_dir, FINAL_COLS) if store_dir else nullcontext()
+    with TableWriter(output_file, FINAL_COLS) as out, store:
+        if not is_empty(input_file):
+            for n, df in enumerate(read_avinput_chunks(input_file, chunk_size)):
+                with measure("annotate_chunk", rows_in=len(df)):
+                    annotated = _annotate(df, *references, backend, indexes=indexes,
+                                          annotation_cache=annotation_cache)
+                    out.write(annotated)
+                    if store_dir:
+                        store.write(annotated)
+                print(f"----Chunk {n + 1}: {out.rows} SVs annotated----")
 
     print(f"Annotation written to {output_file}")
-    return df[final_cols]
\ No newline at end of file
+    if store_dir:
+        print(f"{store_dir} is saved.")
+    return out.rows
+
+
+SUBSET_KEYS = ["chrom","start","end","alt"]
+
+
+def annotate_sv_batch(
+    input_file,
+    output_file,
+    subsets,
+    gene_bed="hg38_refGene.bed",
+    exon_bed="hg38_exons.bed",
+    clinvar_bed=CLINVAR_TRACK,
+    clinvar_condition_bed=None,
+    backend="bedtools",
+    annotation_cache=None):
+    """
+    Annotates input_file once and derives the annotation of every subset
+    of it (e.g. the de novo AVINPUT files, which only hold SVs that are also
+    in SV_summary.avinput) by joining on (chrom, start, end, alt), instead of
+    computing the same overlaps again.
+
+    subsets: {subset_input_file: subset_output_file}
+
+    Each subset output has exactly the rows (and order) of its AVINPUT, as
+    annotate_sv would write it, including the empty-file case. Subset SVs
+    missing from input_file are annotated on their own.
+
+    Returns {output_file: typed table} for the full set and every subset.
+    """
+    _check_backend(backend)
+    references = (gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed, backend)
+    annotation_cache = open_cache(annotation_cache)
+
+    if is_empty(input_file):
+        annotated = annotate_sv(input_file, output_file, *references)
+    else:
+        annotated = _annotate(read_avinput(input_file), *references,
+                              annotation_cache=annotation_cache)
+        write_table(annotated, output_file)
+        print(f"Annotation written to {output_file}")
+
+    results = {output_file: to_columnar(annotated)}
+
+    # one annotation per key (identical keys always get identical annotation)
+    lookup = annotated.drop(columns="ref").drop_duplicates(SUBSET_KEYS)
+
+    for subset_input, subset_output in subsets.items():
+        if is_empty(subset_input):
+            results[subset_output] = annotate_sv(subset_input, subset_output, *references)
+            continue
+
+        subset = read_avinput(subset_input)
+        joined = subset.merge(
+            lookup.astype({c: subset[c].dtype for c in SUBSET_KEYS}),
+            on=SUBSET_KEYS, how="left", indicator=True
+        )
+
+        missing = (joined["_merge"] == "left_only").to_numpy()
+        if missing.any():
+            print(f"{missing.sum()} SVs of {subset_input} are not in {input_file} — annotating them.")
+            extra = _annotate(subset[missing], *references,
+                              annotation_cache=annotation_cache)
+            joined.loc[missing, FINAL_COLS] = extra[FINAL_COLS].to_numpy()
+
+        annotated = joined[FINAL_COLS].astype({RANK_COL: "int64"})
+        write_table(annotated, subset_output)
+        print(f"Annotation written to {subset_output} (joined from {output_file})")
+        results[subset_output] = to_columnar(annotated)
+
+    return results
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Persistent annotation cache shared across runs (and across families).
+
+Recurrent SVs (common deletions, segmental duplication calls) come back in
+almost every sample. Their annotation only depends on the SV and on the
+reference BEDs, so it is kept in a SQLite file keyed by
+
+    (reference fingerprint, chrom, start, end, alt)
+
+where the fingerprint is a hash of the contents of the reference BEDs
+(a ClinVar update gives a new fingerprint, and the old entries age out).
+annotate_sv(..., annotation_cache="annotation_cache.sqlite") looks all SVs up in one
+query and annotates only the misses, which are then added.
+
+Rows are found by a 64-bit hash of the key (pandas.util.hash_pandas_object)
+under a small integer id of the fingerprint; the key itself is stored too
+and checked on the way out, so a hash collision is only a miss.
+
+The cache holds at most max_entries SVs (about 100 bytes each on disk); the
+least recently used ones are evicted first. Several processes can share
+one file (WAL mode), e.g. the workers of batch.py.
+
+    python3 annotation_cache.py annotation_cache.sqlite            # size and hit counts
+    python3 annotation_cache.py annotation_cache.sqlite --max-entries 1000000
+    python3 annotation_cache.py annotation_cache.sqlite --clear
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Bumped whenever the table layout or the annotation itself changes
+CACHE_VERSION = 3
+
+# Default size cap (SVs); eviction removes EVICT_FRACTION of it at a time
+MAX_ENTRIES = 5_000_000
+EVICT_FRACTION = 0.1
+
+KEY_COLS = ["chrom", "start", "end", "alt"]
+VALUE_COLS = ["Function", "Gene", "Priority",
+              "clinvar_germline_classification", "clinvar_condition",
+              "clinvar_pathogenic_rank"]
+INTEGER_COLS = ["start", "end", "clinvar_pathogenic_rank"]
+
+# Hits refresh their last use at most this often (seconds): LRU at that
+# granularity, and no writes when the same SVs come back within it
+TOUCH_SECONDS = 3600
+
+# SQLite page cache of a connection (KB)
+PAGE_CACHE_KB = 64 * 1024
+
+# SQLite waits this long for another process's write to finish (seconds)
+BUSY_TIMEOUT = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS refs (id INTEGER PRIMARY KEY, fingerprint TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS annotations (
+    ref INTEGER, key INTEGER,
+    chrom TEXT, start INTEGER, "end" INTEGER, alt TEXT,
+    Function TEXT, Gene TEXT, Priority TEXT,
+    clinvar_germline_classification TEXT, clinvar_condition TEXT,
+    clinvar_pathogenic_rank INTEGER,
+    last_used INTEGER,
+    PRIMARY KEY (ref, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS annotations_last_used ON annotations (last_used);
+"""
+
+
+class AnnotationCache:
+    """
+    SQLite annotation cache. lookup() and add() work on DataFrames;
+    hits and misses of this process are counted in self.hits / self.misses.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._ref_ids = {}
+        # entries at the last count plus the rows added since (an upper bound,
+        # so the table is only counted again when it may be over the cap)
+        self._entries = None
+        # used by one thread at a time, not always the one that opened it (streaming.py)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(f"PRAGMA cache_size=-{PAGE_CACHE_KB}")
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self.db.execute(statement)
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None:
+                self.db.execute("INSERT INTO meta VALUES ('version', ?)", (str(CACHE_VERSION),))
+            elif int(row[0]) != CACHE_VERSION:
+                # older layout / annotation: start over
+                for table in ["annotations", "refs", "sources"]:
+                    self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        self.db.execute(statement)
+                self.db.execute("UPDATE meta SET value = ? WHERE key = 'version'",
+                                (str(CACHE_VERSION),))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------------------------
+    # reference fingerprint
+    # ---------------------------------------------------------------
+    def _sha256(self, bed_file):
+        """sha256 of a BED, re-read only when its size or mtime changed."""
+        path = os.path.abspath(bed_file)
+        st = os.stat(path)
+        row = self.db.execute(
+            "SELECT size, mtime_ns, sha256 FROM sources WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        sha256 = h.hexdigest()
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                            (path, st.st_size, st.st_mtime_ns, sha256))
+        return sha256
+
+    def fingerprint(self, beds):
+        """
+        Hash of the contents of the reference BEDs, in order (gene, exon,
+        ClinVar, condition; no condition BED with the unified ClinVar track).
+        """
+        h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+        for bed in beds:
+            h.update(self._sha256(bed).encode() if bed else b"-")
+        return h.hexdigest()[:32]
+
+    def _ref_id(self, fingerprint):
+        if fingerprint not in self._ref_ids:
+            with self.db:
+                self.db.execute("INSERT OR IGNORE INTO refs (fingerprint) VALUES (?)",
+                                (fingerprint,))
+            self._ref_ids[fingerprint] = self.db.execute(
+                "SELECT id FROM refs WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()[0]
+        return self._ref_ids[fingerprint]
+
+    # ---------------------------------------------------------------
+    # lookup / add
+    # ---------------------------------------------------------------
+    @staticmethod
+    def key_hashes(keys):
+        """int64 hash of every (chrom, start, end, alt) row (same for str / categorical columns)."""
+        hashes = pd.util.hash_pandas_object(keys[KEY_COLS], index=False)
+        return hashes.to_numpy().view(np.int64)
+
+    def lookup(self, keys, fingerprint):
+        """
+        Cached annotation of the (chrom, start, end, alt) rows of keys:
+        a DataFrame KEY_COLS + VALUE_COLS with one row per cached key.
+        The hits become the most recently used entries.
+        """
+        hashes = np.unique(self.key_hashes(keys))
+        columns = ", ".join(f'"{c}"' for c in KEY_COLS + VALUE_COLS)
+        ref = self._ref_id(fingerprint)
+
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (key INTEGER PRIMARY KEY)")
+            self.db.execute("DELETE FROM temp.lookup")
+            self.db.executemany("INSERT INTO temp.lookup VALUES (?)",
+                                ((k,) for k in hashes.tolist()))
+            found = self.db.execute(
+                f"SELECT {columns} FROM temp.lookup k JOIN annotations a "
+                "ON a.ref = ? AND a.key = k.key", (ref,)
+            ).fetchall()
+            now = int(time.time())
+            self.db.execute(
+                "UPDATE annotations SET last_used = ? "
+                "WHERE ref = ? AND key IN (SELECT key FROM temp.lookup) AND last_used < ?",
+                (now, ref, now - TOUCH_SECONDS)
+            )
+
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return pd.DataFrame(found, columns=KEY_COLS + VALUE_COLS)
+
+    def add(self, annotated, fingerprint):
+        """
+        Stores the annotation of an annotated table (FINAL_COLS), then evicts
+        if the cache may be over the cap.
+        """
+        values = annotated[KEY_COLS + VALUE_COLS].drop_duplicates(KEY_COLS)
+        # in key order, so the rows are appended to the B-tree instead of
+        # splitting pages all over it
+        hashes = self.key_hashes(values)
+        order = np.argsort(hashes, kind="stable")
+        values = values.iloc[order]
+        ref = self._ref_id(fingerprint)
+        now = int(time.time())
+        columns = [
+            values[c].astype(int if c in INTEGER_COLS else str).tolist()
+            for c in KEY_COLS + VALUE_COLS
+        ]
+        rows = zip(hashes[order].tolist(), *columns)
+        placeholders = ", ".join("?" * (1 + len(columns)))
+
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO annotations VALUES ({ref}, {placeholders}, {now})",
+                rows
+            )
+        if self._entries is None:
+            self._entries = len(self)
+        else:
+            self._entries += len(values)
+        if self._entries > self.max_entries:
+            self.evict()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+
+    def evict(self):
+        """Removes the least recently used entries when the cache is over max_entries."""
+        entries = len(self)
+        excess = entries - self.max_entries
+        if excess <= 0:
+            self._entries = entries
+            return 0
+        # evict a little more than needed, so not every add has to evict
+        n = excess + int(self.max_entries * EVICT_FRACTION)
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            deleted = self.db.execute(
+                "DELETE FROM annotations WHERE (ref, key) IN "
+                "(SELECT ref, key FROM annotations ORDER BY last_used LIMIT ?)", (n,)
+            ).rowcount
+        self._entries = entries - deleted
+        return n
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM annotations")
+        self.db.execute("VACUUM")
+        self._entries = 0
+
+
+def open_cache(cache):
+    """An AnnotationCache for a path; an AnnotationCache (or None) is returned as is."""
+    if cache is None or isinstance(cache, AnnotationCache):
+        return cache
+    return AnnotationCache(cache)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or trim the annotation cache")
+    parser.add_argument("cache", help="SQLite cache file, e.g. annotation_cache.sqlite")
+    parser.add_argument("--max-entries", type=int, help="evict down to this many SVs")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+
+    with AnnotationCache(args.cache, max_entries=args.max_entries or MAX_ENTRIES) as cache:
+        if args.clear:
+            cache.clear()
+        elif args.max_entries:
+            cache.evict()
+        fingerprints = cache.db.execute(
+            "SELECT r.fingerprint, COUNT(*) FROM annotations a JOIN refs r ON r.id = a.ref "
+            "GROUP BY a.ref ORDER BY MAX(a.last_used) DESC"
+        ).fetchall()
+        print(f"{args.cache}: {len(cache)} SVs, {os.path.getsize(args.cache)} bytes")
+        for fingerprint, count in fingerprints:
+            print(f"    references {fingerprint}: {count} SVs")
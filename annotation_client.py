@@ -0,0 +1,67 @@
+"""
+Thin client for annotation_server.py (standard library only, so it starts
+in milliseconds).
+
+    from annotation_client import annotate_sv
+    annotate_sv("trio.avinput", "output/trio_annotated.csv")
+
+Paths are sent as absolute paths, since the server reads and writes the
+files itself.
+"""
+import argparse
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def annotate_sv(input_file, output_file, server=DEFAULT_URL, timeout=3600, retries=5):
+    """
+    Same call as annotate_sv.annotate_sv, answered by a running annotation
+    server. Returns the server's reply ({output_file, rows, seconds, batch}).
+
+    A busy server (503) is retried with back-off up to `retries` times;
+    annotation errors are raised as RuntimeError.
+    """
+    body = json.dumps({
+        "input_file": os.path.abspath(input_file),
+        "output_file": os.path.abspath(output_file),
+    }).encode()
+
+    for attempt in range(retries + 1):
+        request = urllib.request.Request(
+            server.rstrip("/") + "/annotate", data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                reply = json.load(response)
+            print(f"Annotation written to {reply['output_file']}")
+            return reply
+        except urllib.error.HTTPError as error:
+            message = json.load(error).get("error", str(error))
+            if error.code != 503 or attempt == retries:
+                raise RuntimeError(f"Annotation of {input_file} failed: {message}") from None
+        time.sleep(0.5 * 2 ** attempt)
+
+
+def server_is_up(server=DEFAULT_URL, timeout=2):
+    try:
+        with urllib.request.urlopen(server.rstrip("/") + "/health", timeout=timeout) as response:
+            return json.load(response).get("status") == "ok"
+    except OSError:
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Annotate an AVINPUT / VCF via annotation_server.py")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--server", default=DEFAULT_URL)
+    args = parser.parse_args()
+
+    annotate_sv(args.input_file, args.output_file, server=args.server)
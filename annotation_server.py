@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local annotation service.
+
+Loads the reference BEDs once (in-process interval indexes, rebuilt when a
+BED changes) and answers annotation requests over localhost HTTP, so small
+jobs do not pay for starting Python, importing pandas and reading the
+references every time.
+
+    python3 annotation_server.py --port 8765 --workers 2
+
+    POST /annotate   {"input_file": "/abs/trio.avinput", "output_file": "/abs/out.csv"}
+                     -> {"output_file": ..., "rows": ..., "seconds": ...}
+    GET  /health     -> {"status": "ok", "pending": ..., "references": [...]}
+
+input_file is an AVINPUT file, or a Delly VCF (.vcf / .vcf.gz) whose PASS
+records are annotated. output_file may be .csv, .parquet or .feather/.arrow.
+annotation_client.annotate_sv(input_file, output_file) is the matching
+client (standard library only).
+
+Requests arriving within --batch-window seconds of each other (up to
+--batch-size) are annotated together in one pass and written back to their
+own output files; batches run on a pool of --workers threads that share the
+loaded indexes. At most --max-pending requests wait at a time; beyond that
+the server answers 503 so clients can back off.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from annotate_sv import FINAL_COLS, _annotate, is_empty, load_indexes, read_avinput
+from metrics import measure, take_records
+from table_io import write_table
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+# -------------------------------------------------------------------
+# 1. WARM REFERENCES
+# -------------------------------------------------------------------
+class References:
+    """
+    IntervalIndex of every reference BED, loaded once and rebuilt only
+    when a BED's size or mtime changes.
+    """
+
+    def __init__(self, gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed=None):
+        self.beds = (gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed)
+        self._lock = threading.Lock()
+        self._stamps = None
+        self._indexes = None
+        self.current()
+
+    def _stamp(self):
+        return [(os.stat(bed).st_size, os.stat(bed).st_mtime_ns) for bed in self.beds if bed]
+
+    def current(self):
+        """{bed: IntervalIndex}, reloaded first if a BED changed on disk."""
+        with self._lock:
+            stamps = self._stamp()
+            if stamps != self._stamps:
+                print("----Loading reference BEDs----")
+                self._indexes = load_indexes(self.beds)
+                self._stamps = stamps
+            return self._indexes
+
+
+def read_input(input_file):
+    """AVINPUT table of an AVINPUT file, or of the PASS records of a Delly VCF."""
+    if not input_file.endswith((".vcf", ".vcf.gz")):
+        if is_empty(input_file):
+            return pd.DataFrame(columns=["chrom", "start", "end", "ref", "alt"])
+        return read_avinput(input_file)
+
+    from delly_parser import read_vcf_batches
+
+    parts = [
+        pd.DataFrame({
+            "chrom": batch["chrom"], "start": batch["pos"], "end": batch["end"],
+            "ref": "N", "alt": ["<" + t + ">" for t in batch["svtype"]],
+        })
+        for batch in read_vcf_batches(input_file)
+    ]
+    if not parts:
+        return pd.DataFrame(columns=["chrom", "start", "end", "ref", "alt"])
+    return pd.concat(parts, ignore_index=True)
+
+
+# -------------------------------------------------------------------
+# 2. BATCHING AND THE WORKER POOL
+# -------------------------------------------------------------------
+class AnnotationService:
+    """
+    Collects requests into batches and annotates each batch in one
+    _annotate call on a bounded thread pool.
+    """
+
+    def __init__(self, references, workers=2, batch_size=32, batch_window=0.05,
+                 max_pending=256):
+        self.references = references
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # bounds the batches handed to the pool to the number of workers
+        self._slots = threading.Semaphore(workers)
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+
+    def submit(self, input_file, output_file):
+        """Future of {output_file, rows, seconds}; raises queue.Full when overloaded."""
+        future = Future()
+        self.requests.put_nowait((input_file, output_file, future))
+        return future
+
+    def _batch_loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._slots.acquire()
+            self.pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            start = time.perf_counter()
+            tables, ready = [], []
+            for input_file, output_file, future in batch:
+                try:
+                    tables.append(read_input(input_file))
+                    ready.append((output_file, future))
+                except Exception as error:
+                    future.set_exception(error)
+
+            if not ready:
+                return
+
+            sizes = [len(t) for t in tables]
+            non_empty = [t for t in tables if len(t)]
+            df = pd.concat(non_empty, ignore_index=True) if non_empty else None
+
+            try:
+                with measure("annotate_batch", rows_in=sum(sizes)):
+                    annotated = None
+                    if df is not None:
+                        annotated = _annotate(
+                            df, *self.references.beds, "index",
+                            indexes=self.references.current(),
+                        )
+            except Exception as error:
+                for _, future in ready:
+                    future.set_exception(error)
+                return
+            finally:
+                # a long-running server does not keep per-step metrics
+                take_records()
+
+            # every request gets back exactly its own rows, in its own order
+            offset = 0
+            for (output_file, future), size in zip(ready, sizes):
+                try:
+                    if size:
+                        part = annotated.iloc[offset:offset + size]
+                    else:
+                        part = pd.DataFrame(columns=FINAL_COLS)
+                    offset += size
+                    write_table(part, output_file)
+                    future.set_result({
+                        "output_file": output_file,
+                        "rows": size,
+                        "seconds": round(time.perf_counter() - start, 4),
+                        "batch": len(ready),
+                    })
+                except Exception as error:
+                    future.set_exception(error)
+
+            print(f"----Batch of {len(ready)} requests ({sum(sizes)} SVs) annotated in "
+                  f"{time.perf_counter() - start:.2f}s----")
+        finally:
+            self._slots.release()
+
+
+# -------------------------------------------------------------------
+# 3. HTTP FRONT END
+# -------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        self._reply(200, {
+            "status": "ok",
+            "pending": self.service.requests.qsize(),
+            "references": list(self.service.references.beds),
+        })
+
+    def do_POST(self):
+        if self.path != "/annotate":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            input_file, output_file = request["input_file"], request["output_file"]
+        except (ValueError, KeyError) as error:
+            return self._reply(400, {"error": f"bad request: {error}"})
+
+        try:
+            future = self.service.submit(input_file, output_file)
+        except queue.Full:
+            return self._reply(503, {"error": "too many pending requests"})
+
+        try:
+            self._reply(200, future.result())
+        except Exception as error:
+            self._reply(500, {"error": f"{type(error).__name__}: {error}"})
+
+    def log_message(self, fmt, *args):
+        print(f"{self.address_string()} {fmt % args}")
+
+
+def serve(references, host=DEFAULT_HOST, port=DEFAULT_PORT, **service_args):
+    _Handler.service = AnnotationService(references, **service_args)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    print(f"=== Annotation server listening on http://{host}:{port} ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SV annotation server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="batches annotated at the same time")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="most requests annotated in one pass")
+    parser.add_argument("--batch-window", type=float, default=0.05,
+                        help="seconds to wait for more requests to batch")
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="queued requests before answering 503")
+    parser.add_argument("--gene-bed", default="hg38_refGene.bed")
+    parser.add_argument("--exon-bed", default="hg38_exons.bed")
+    parser.add_argument("--clinvar-bed", default="clinvar_SV.track.bed",
+                        help="unified ClinVar track (clinvar_track.py), or the ClinVar BED "
+                             "of the two-BED layout")
+    parser.add_argument("--clinvar-condition-bed",
+                        help="condition BED of the two-BED layout")
+    args = parser.parse_args()
+
+    references = References(
+        os.path.abspath(args.gene_bed), os.path.abspath(args.exon_bed),
+        os.path.abspath(args.clinvar_bed),
+        args.clinvar_condition_bed and os.path.abspath(args.clinvar_condition_bed),
+    )
+    serve(references, args.host, args.port, workers=args.workers,
+          batch_size=args.batch_size, batch_window=args.batch_window,
+          max_pending=args.max_pending)
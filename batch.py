@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Batch runner: the trio pipeline for a cohort of families on one node.
+
+    python3 batch.py families.tsv -o cohort_run --jobs 8
+    python3 batch.py --vcf joint.vcf.gz --ped cohort.ped -o cohort_run --jobs 8
+
+Manifest (tab or space separated, # comments, optional header line):
+
+    family   vcf               ped
+    FAM001   fam001.vcf.gz
+    FAM002   joint.vcf.gz      cohort.ped
+
+A row without a PED is a trio VCF as script.sh expects it (sample3 = child).
+A row with a PED first takes that family's trio out of a joint-called VCF
+(father, mother, child -> sample1, sample2, sample3). --vcf/--ped instead of
+a manifest runs every trio of the PED.
+
+Every family runs the pipeline stages (parse -> annotate -> filter -> plots)
+in its own folder <output>/<family>/, with its log in pipeline.log, on a pool
+of --jobs processes. The reference BEDs are compiled into their memory-mapped
+caches (reference_cache.py) and loaded once before the pool starts; the
+workers share those pages instead of each building its own index.
+
+<output>/batch_state.json records the status of every family. Running the
+same command again skips finished families and re-runs failed ones, whose
+completed stages are skipped by their own stage manifest. A failing family
+does not stop the others.
+
+Cohort rollup, in <output>/cohort/:
+
+    families.tsv              status, run time and SV counts per family
+    summary_stats.json        record counters of the trio summary summed over the
+                              families; the per-sample ones under each family
+    plot_stats/*.stats.json   plot aggregates summed over the families (sv_stats)
+    plots/                    the usual plots, drawn from the cohort aggregates
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+
+import metrics
+
+
+STATE_FILE = "batch_state.json"
+COHORT_DIR = "cohort"
+FAMILY_LOG = "pipeline.log"
+
+# Tables whose plot aggregates are rolled up
+PLOT_TABLES = ["SV_summary_annotated", "denovo_variants_imprecise_annotated",
+               "SV_summary_annotated_exonic", "SV_summary_annotated_pathLink"]
+
+# summary_stats.json sections that count records and add up over the
+# families. The others (deviations, chrX het, inferred parents and sex of
+# sample1..3) describe the three people of one trio and stay per family.
+COHORT_SUMMARY_KEYS = ["version", "reads", "alleles", "variants", "sv_types",
+                       "genotype_combinations", "chromosomes"]
+FAMILY_SUMMARY_KEYS = ["samples", "deviations", "chrX", "parents", "child_sex"]
+
+
+# -------------------------------------------------------------------
+# 1. THE FAMILIES
+# -------------------------------------------------------------------
+def read_manifest(manifest_file):
+    """[(family, vcf, ped or None)] of a manifest; relative paths are taken from its folder."""
+    base = os.path.dirname(os.path.abspath(manifest_file))
+    jobs = []
+    with open(manifest_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#") or fields[:2] == ["family", "vcf"]:
+                continue
+            if len(fields) < 2:
+                raise ValueError(f"{manifest_file}: expected 'family vcf [ped]', got: {line.strip()}")
+            family, vcf = fields[:2]
+            ped = fields[2] if len(fields) > 2 else None
+            jobs.append((family, os.path.join(base, vcf), ped and os.path.join(base, ped)))
+    return _check_families(jobs)
+
+
+def families_from_ped(vcf_file, ped_file):
+    """One job per family of the PED (its first trio), all from the same joint VCF."""
+    from genotype_matrix import read_ped
+
+    families = dict.fromkeys(family for family, *_ in read_ped(ped_file))
+    return _check_families([(family, vcf_file, ped_file) for family in families])
+
+
+def _check_families(jobs):
+    seen = set()
+    for family, _, _ in jobs:
+        if family in seen:
+            raise ValueError(f"Family {family} is listed twice")
+        if os.sep in family or family in (".", "..", COHORT_DIR):
+            raise ValueError(f"Bad family name (it names a folder): {family}")
+        seen.add(family)
+    return jobs
+
+
+def trio_vcf(vcf_file, ped_file, family, output):
+    """
+    Writes the trio of `family` (father, mother, child, as script.sh
+    expects them) from a joint-called VCF into output. All records are
+    kept, like `bcftools view -s father,mother,child`. Skipped when output
+    is newer than the VCF and the PED.
+    """
+    from delly_parser import open_vcf
+    from genotype_matrix import read_ped
+
+    if os.path.exists(output) and os.path.getmtime(output) >= max(
+            os.path.getmtime(vcf_file), os.path.getmtime(ped_file)):
+        return output
+
+    trios = [t for t in read_ped(ped_file) if t[0] == family]
+    if not trios:
+        raise ValueError(f"{ped_file}: no trio (both parents known) for family {family}")
+    _, child, father, mother = trios[0]
+
+    tmp = output + ".tmp"
+    with open_vcf(vcf_file) as src, open(tmp, "w") as out:
+        columns = None
+        for line in src:
+            if line.startswith("##"):
+                out.write(line)
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if columns is None:
+                missing = [s for s in (father, mother, child) if s not in fields[9:]]
+                if missing:
+                    raise ValueError(f"{vcf_file}: samples of {family} not in the VCF: "
+                                     f"{', '.join(missing)}")
+                columns = list(range(9)) + [fields.index(s) for s in (father, mother, child)]
+            out.write("\t".join([fields[i] for i in columns]) + "\n")
+    os.replace(tmp, output)
+    return output
+
+
+# -------------------------------------------------------------------
+# 2. ONE FAMILY (in a pool worker)
+# -------------------------------------------------------------------
+def _reference_beds(options):
+    # no condition BED with the unified ClinVar track
+    return [options[name] for name in ["gene_bed", "exon_bed", "clinvar_bed",
+                                       "clinvar_condition_bed"] if options[name]]
+
+
+def load_references(options):
+    """Compiles (if needed) and loads the reference caches of the "cache" backend."""
+    if options["backend"] != "cache":
+        return
+    from reference_cache import load_reference
+
+    for bed in _reference_beds(options):
+        load_reference(bed)
+
+
+def _init_worker(options):
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    # already loaded when the worker was forked; mapped (not built) otherwise
+    load_references(options)
+
+
+def run_family(job, output_dir, options):
+    """
+    Runs the pipeline stages of one family in <output_dir>/<family>/.
+    Returns {"family", "status": "done" | "failed", "seconds", "error"}.
+    """
+    import pipeline
+    from stage_runner import StageRunner
+
+    family, vcf_file, ped_file = job
+    family_dir = os.path.join(output_dir, family)
+    os.makedirs(family_dir, exist_ok=True)
+    start = time.perf_counter()
+    result = {"family": family, "status": "done", "error": None}
+
+    with open(os.path.join(family_dir, FAMILY_LOG), "a") as log, \
+            redirect_stdout(log), redirect_stderr(log):
+        print(f"\n=== {family}: {time.strftime('%Y-%m-%d %H:%M:%S')} ===")
+        metrics.reset()
+        try:
+            if ped_file:
+                vcf_file = trio_vcf(vcf_file, ped_file, family,
+                                    os.path.join(family_dir, f"{family}.vcf"))
+            pipeline.set_output_dir(family_dir)
+            pipeline.configure(argparse.Namespace(vcf=vcf_file, **options))
+            try:
+                # the ClinVar track is a shared reference: families only read it
+                StageRunner(pipeline.build_stages(with_clinvar=False),
+                            pipeline.MANIFEST_FILE).run()
+            finally:
+                metrics.write_metrics(pipeline.METRICS_FILE)
+        except Exception as e:
+            traceback.print_exc()
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+# -------------------------------------------------------------------
+# 3. THE BATCH
+# -------------------------------------------------------------------
+def load_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"families": {}}
+
+
+def save_state(state, output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run_batch(jobs, output_dir, options, workers=1, force=False):
+    """
+    Runs every family of jobs ([(family, vcf, ped or None)]) on a pool of
+    `workers` processes, then writes the cohort rollup. Families finished
+    in an earlier run are skipped unless force. Returns the batch state.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+    done = {f for f, s in state["families"].items() if s["status"] == "done"}
+    todo = [job for job in jobs if force or job[0] not in done]
+
+    print(f"=== {len(jobs)} families: {len(jobs) - len(todo)} already done, "
+          f"{len(todo)} to run on {workers} workers ===")
+
+    if todo:
+        # loaded here, before the pool forks, so the workers share the mapped pages
+        load_references(options)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(options,)) as executor:
+            futures = [executor.submit(run_family, job, output_dir, options) for job in todo]
+            for n, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                state["families"][result["family"]] = result
+                save_state(state, output_dir)
+                note = f" — {result['error']}" if result["error"] else ""
+                print(f"----[{n}/{len(todo)}] {result['family']} {result['status']} "
+                      f"({result['seconds']} s){note}----")
+
+    cohort_rollup(jobs, output_dir, state)
+    return state
+
+
+# -------------------------------------------------------------------
+# 4. COHORT ROLLUP
+# -------------------------------------------------------------------
+def _family_paths(output_dir, family):
+    """(plot_stats folder, summary_stats.json) of a family folder."""
+    import pipeline
+
+    pipeline.set_output_dir(os.path.join(output_dir, family))
+    paths = pipeline.PLOT_STATS_DIR, pipeline.SUMMARY_STATS
+    pipeline.set_output_dir(None)
+    return paths
+
+
+def cohort_summary(summaries):
+    """
+    Cohort summary_stats.json from {family: summary_stats dict}: the record
+    counters summed (TrioStats.merge, first-seen order kept), and the
+    per-sample sections of every family under "families".
+    """
+    from delly_parser import TrioStats
+
+    total = None
+    for summary in summaries.values():
+        stats = TrioStats.from_dict(summary)
+        if total is None:
+            total = stats
+        else:
+            total.merge(stats)
+    merged = total.to_dict()
+
+    cohort = {key: merged[key] for key in COHORT_SUMMARY_KEYS}
+    cohort["chrX"] = {"total": merged["chrX"]["total"]}
+    cohort["families"] = {family: {key: summary[key] for key in FAMILY_SUMMARY_KEYS}
+                          for family, summary in summaries.items()}
+    return cohort
+
+
+def cohort_rollup(jobs, output_dir, state):
+    """Writes <output_dir>/cohort/ from the finished families."""
+    from delly_parser import load_summary, write_summary_json
+    from sv_stats import SVStats, load_stats, write_stats
+
+    cohort_dir = os.path.join(output_dir, COHORT_DIR)
+    stats_dir = os.path.join(cohort_dir, "plot_stats")
+    os.makedirs(stats_dir, exist_ok=True)
+
+    merged = {name: SVStats() for name in PLOT_TABLES}
+    summaries = {}
+    rows = []
+    for family, _, _ in jobs:
+        status = state["families"].get(family, {"status": "not run", "seconds": None,
+                                                "error": None})
+        counts = {}
+        if status["status"] == "done":
+            plot_stats, summary_stats = _family_paths(output_dir, family)
+            for name in PLOT_TABLES:
+                stats_file = os.path.join(plot_stats, f"{name}.stats.json")
+                if os.path.exists(stats_file):
+                    stats = load_stats(stats_file)
+                    merged[name].merge(stats)
+                    counts[name] = stats.rows
+            summaries[family] = load_summary(summary_stats)
+        rows.append([family, status["status"], status["seconds"],
+                     *[counts.get(name, "") for name in PLOT_TABLES], status["error"] or ""])
+
+    families_file = os.path.join(cohort_dir, "families.tsv")
+    with open(families_file, "w") as f:
+        f.write("\t".join(["family", "status", "seconds", "svs", "denovo_imprecise",
+                           "exonic", "pathogenic", "error"]) + "\n")
+        for row in rows:
+            f.write("\t".join("" if v is None else str(v) for v in row) + "\n")
+    print(f"{families_file} is saved.")
+
+    finished = sum(row[1] == "done" for row in rows)
+    if not finished:
+        return
+
+    for name, stats in merged.items():
+        write_stats(stats, os.path.join(stats_dir, f"{name}.stats.json"))
+    summary = cohort_summary(summaries)
+    write_summary_json(summary, os.path.join(cohort_dir, "summary_stats.json"))
+    print(f"{stats_dir} is saved ({finished} families).")
+
+    import sv_plot
+
+    sv_plot.run_all_plots(tables=merged, summary_stats=summary,
+                          plot_dir=os.path.join(cohort_dir, "plots"))
+
+
+if __name__ == "__main__":
+    from annotate_sv import BACKENDS
+
+    parser = argparse.ArgumentParser(
+        description="Run the trio pipeline for many families, with a cohort rollup")
+    parser.add_argument("manifest", nargs="?", help="family / vcf / [ped] manifest")
+    parser.add_argument("--vcf", help="joint-called VCF (with --ped, instead of a manifest)")
+    parser.add_argument("--ped", help="PED file: one job per family")
+    parser.add_argument("-o", "--output", default="batch_output",
+                        help="folder of the family folders and the cohort rollup")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="families processed at the same time (default: CPU count)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-run families that already finished")
+    parser.add_argument("--table-ext", default=".csv",
+                        choices=[".csv", ".parquet", ".feather", ".arrow", ".tsv.gz"])
+    parser.add_argument("--backend", default="cache", choices=BACKENDS,
+                        help="annotation backend (default cache: the reference index "
+                             "is loaded once and shared by the workers; index builds "
+                             "it in every worker)")
+    parser.add_argument("--chunk-size", type=int, help="annotate in chunks of this many SVs")
+    parser.add_argument("--annotation-cache", metavar="SQLITE",
+                        help="annotation cache shared by all families and runs "
+                             "(recurrent SVs are annotated once)")
+    parser.add_argument("--bgzip", action="store_true", default=None,
+                        help="bgzip + tabix-index the trio tables and AVINPUT files")
+    parser.add_argument("--gene-bed", default="hg38_refGene.bed")
+    parser.add_argument("--exon-bed", default="hg38_exons.bed")
+    parser.add_argument("--clinvar-bed", default="clinvar_SV.track.bed",
+                        help="unified ClinVar track (clinvar_track.py), or the ClinVar BED "
+                             "of the two-BED layout")
+    parser.add_argument("--clinvar-condition-bed",
+                        help="condition BED of the two-BED layout")
+    args = parser.parse_args()
+
+    if args.manifest:
+        jobs = read_manifest(args.manifest)
+    elif args.vcf and args.ped:
+        jobs = families_from_ped(os.path.abspath(args.vcf), os.path.abspath(args.ped))
+    else:
+        parser.error("give a manifest, or --vcf and --ped")
+
+    options = {
+        "table_ext": args.table_ext,
+        "backend": args.backend,
+        "chunk_size": args.chunk_size,
+        "annotation_cache": args.annotation_cache and os.path.abspath(args.annotation_cache),
+        "bgzip": args.bgzip,
+        "gene_bed": os.path.abspath(args.gene_bed),
+        "exon_bed": os.path.abspath(args.exon_bed),
+        "clinvar_bed": os.path.abspath(args.clinvar_bed),
+        "clinvar_condition_bed": (args.clinvar_condition_bed
+                                  and os.path.abspath(args.clinvar_condition_bed)),
+    }
+    state = run_batch(jobs, args.output, options, workers=max(1, args.jobs), force=args.force)
+
+    failed = [f for f, s in state["families"].items() if s["status"] == "failed"]
+    if failed:
+        print(f"\n{len(failed)} families failed: {', '.join(sorted(failed))} "
+              f"(see <family>/{FAMILY_LOG}; run again to resume)")
+        sys.exit(1)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the pipeline stages.
+
+For every requested size a synthetic Delly VCF is generated (synth_vcf.py)
+in its own work directory and the stages of pipeline.py are run on it:
+
+    parse     delly_parser (or script.sh with --parser awk)
+    annotate  annotate_sv on the full SV set and the de novo subsets
+    filter    exonic / pathogenic extraction
+    plots     sv_plot.run_all_plots
+
+Each stage runs in a fresh process, so its peak RSS is its own. Per stage
+the wall time, CPU time, peak RSS, rows in and rows/sec are recorded, and
+all runs are stored as JSON. Two result files can be compared with --compare.
+
+    python3 benchmark.py --records 10000 100000 1000000 --output bench.json
+    python3 benchmark.py --compare old.json bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["parse", "annotate", "filter", "plots"]
+RESULTS_VERSION = 1
+
+
+# -------------------------------------------------------------------
+# 1. MEASURING ONE STAGE
+# -------------------------------------------------------------------
+def _count_rows(path):
+    """Records of a VCF / .avinput, or rows of an SV table (header not counted)."""
+    if not os.path.exists(path):
+        return 0
+    if path.endswith((".parquet", ".feather", ".arrow")):
+        from table_io import read_table
+        return len(read_table(path))
+
+    with open(path, "rb") as f:
+        rows = sum(1 for line in f if line.strip() and not line.startswith(b"#"))
+    return rows - 1 if path.endswith(".csv") else rows
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process and of the commands it ran (awk, bedtools)."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _run_stage(name, workdir, settings):
+    """Runs one pipeline stage in workdir (called in a fresh process)."""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+
+    import pipeline
+    for key, value in settings.items():
+        setattr(pipeline, key, value)
+
+    rows_in = {
+        "parse": lambda: _count_rows(pipeline.VCF_FILE),
+        "annotate": lambda: _count_rows(pipeline.ALL_AVINPUT),
+        "filter": lambda: _count_rows(pipeline.SV_ANNOTATED),
+        "plots": lambda: _count_rows(pipeline.SV_ANNOTATED),
+    }
+    run = {
+        "parse": pipeline.parse_vcf,
+        "annotate": pipeline.annotate,
+        "filter": pipeline.extract_exonic_pathogenic,
+        "plots": pipeline.plots,
+    }
+
+    cpu_start = sum(os.times()[:4])
+    wall_start = time.perf_counter()
+    run[name]()
+    seconds = time.perf_counter() - wall_start
+    cpu_seconds = sum(os.times()[:4]) - cpu_start
+
+    rows = rows_in[name]()
+    return {
+        "stage": name,
+        "seconds": round(seconds, 4),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def measure_stage(name, workdir, settings):
+    """
+    Runs a stage in a new (spawned, not forked) process and returns its
+    measurements, so the peak RSS does not include this process.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_stage, name, workdir, settings).result()
+
+
+# -------------------------------------------------------------------
+# 2. ONE BENCHMARK RUN PER VCF SIZE
+# -------------------------------------------------------------------
+def _settings(args):
+    """pipeline.py configuration for the benchmark (reference paths made absolute)."""
+    settings = {
+        "PARSER": args.parser,
+        "PARSER_WORKERS": args.parser_workers,
+        "PLOT_WORKERS": args.plot_workers,
+        "ANNOTATION_BACKEND": args.backend,
+        "DELLY_SCRIPT": os.path.join(REPO_DIR, "script.sh"),
+        "VCF_FILE": "DellyVariation.vcf",
+    }
+    for key, path in [("GENE_BED", args.gene_bed), ("EXON_BED", args.exon_bed),
+                      ("CLINVAR_BED", args.clinvar_bed),
+                      ("CLINVAR_CONDITION_BED", args.clinvar_condition_bed)]:
+        settings[key] = path and os.path.abspath(path)
+    return settings
+
+
+def run_benchmark(n_records, args):
+    from synth_vcf import generate_vcf
+
+    workdir = os.path.join(args.workdir, f"records_{n_records}")
+    os.makedirs(os.path.join(workdir, "output"), exist_ok=True)
+    settings = _settings(args)
+    vcf_file = os.path.join(workdir, settings["VCF_FILE"])
+
+    print(f"\n=== Generating {n_records} records ({args.samples} samples) ===")
+    start = time.perf_counter()
+    generate_vcf(vcf_file, n_records, n_samples=args.samples, gene_bed=args.gene_bed,
+                 precise_fraction=args.precise_fraction, seed=args.seed)
+    generate_seconds = time.perf_counter() - start
+
+    stages = []
+    for name in args.stages:
+        print(f"\n=== Benchmarking stage '{name}' ({n_records} records) ===")
+        result = measure_stage(name, workdir, settings)
+        stages.append(result)
+        print(f"{name}: {result['seconds']:.2f}s, {result['peak_rss_mb']:.0f} MB peak, "
+              f"{result['rows_per_sec']} rows/s")
+
+    return {
+        "records": n_records,
+        "samples": args.samples,
+        "vcf_bytes": os.path.getsize(vcf_file),
+        "generate_seconds": round(generate_seconds, 4),
+        "stages": stages,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------------------------------------------------------
+# 3. COMPARING TWO RESULT FILES
+# -------------------------------------------------------------------
+def compare(old_file, new_file):
+    """Prints new/old time and memory ratios for every (records, stage) in both files."""
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+
+    def by_stage(results):
+        return {(run["records"], s["stage"]): s
+                for run in results["runs"] for s in run["stages"]}
+
+    old_stages, new_stages = by_stage(old), by_stage(new)
+    print(f"{'records':>10} {'stage':<10} {'old s':>9} {'new s':>9} {'time x':>7} "
+          f"{'old MB':>8} {'new MB':>8} {'rss x':>6}")
+    for key in sorted(old_stages.keys() & new_stages.keys()):
+        o, n = old_stages[key], new_stages[key]
+        print(f"{key[0]:>10} {key[1]:<10} {o['seconds']:>9.2f} {n['seconds']:>9.2f} "
+              f"{n['seconds'] / max(o['seconds'], 1e-9):>7.2f} "
+              f"{o['peak_rss_mb']:>8.0f} {n['peak_rss_mb']:>8.0f} "
+              f"{n['peak_rss_mb'] / max(o['peak_rss_mb'], 1e-9):>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline scaling benchmark")
+    parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000],
+                        help="VCF sizes to benchmark (records)")
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--precise-fraction", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--parser", choices=["python", "awk"], default="python")
+    parser.add_argument("--parser-workers", type=int, default=1)
+    parser.add_argument("--plot-workers", type=int, default=1)
+    parser.add_argument("--backend", choices=["bedtools", "index", "cache"], default="index")
+    parser.add_argument("--gene-bed", default=os.path.join(REPO_DIR, "hg38_refGene.bed"))
+    parser.add_argument("--exon-bed", default=os.path.join(REPO_DIR, "hg38_exons.bed"))
+    parser.add_argument("--clinvar-bed", default=os.path.join(REPO_DIR, "clinvar_SV.track.bed"))
+    parser.add_argument("--clinvar-condition-bed",
+                        help="condition BED of the two-BED ClinVar layout")
+    parser.add_argument("--workdir", default="benchmark_runs",
+                        help="generated VCFs and stage outputs go here")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    if "annotate" in args.stages:
+        missing = [path for path in [args.gene_bed, args.exon_bed, args.clinvar_bed,
+                                     args.clinvar_condition_bed]
+                   if path and not os.path.exists(path)]
+        if missing:
+            parser.error(f"missing reference files: {', '.join(missing)}")
+
+    results = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "runs": [],
+    }
+    for n_records in args.records:
+        results["runs"].append(run_benchmark(n_records, args))
+        # saved after every size, so a long 10M run keeps the smaller results
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+
+    print(f"\n{args.output} is saved.")
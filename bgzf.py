@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+BGZF (blocked gzip) output with tabix-style indexes, in pure Python.
+
+BGZF files are ordinary multi-member gzip files (gzip / zcat / pandas read
+them), cut into blocks of at most 64 KB so that any line can be reached
+with a seek; bgzip, tabix, htslib and pysam use them directly. Blocks are
+compressed in a thread pool (zlib releases the GIL).
+
+    write_bgzf_table(df, "output/SV_summary_annotated.tsv.gz")   sorted + .tbi
+    bgzip_file("output/SV_summary.txt", skip=1)                   -> .txt.gz + .tbi
+    fetch("output/SV_summary_annotated.tsv.gz", "chr7", 57_900_000, 58_100_000)
+
+    python3 bgzf.py output/SV_summary.txt --skip 1            # like bgzip + tabix
+    python3 bgzf.py output/SV_summary.txt.gz --region chr7:57900000-58100000
+
+Lines are sorted by chromosome (chr1..chr22, chrX, chrY, then the rest)
+and start before compression. Coordinates are read as in AVINPUT / tabix
+"generic" files: 1-based start and inclusive end columns. The .tbi index
+covers positions below 2^29; .csi (index="csi") has no such limit.
+"""
+import argparse
+import gzip
+import os
+import re
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# Uncompressed bytes per block (what bgzip uses; the compressed block must stay < 64 KB)
+BLOCK_SIZE = 0xff00
+# Blocks compressed per batch handed to the thread pool (per thread)
+BLOCKS_PER_THREAD = 16
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+# Binning scheme shared by .tbi and .csi (.tbi fixes these values)
+MIN_SHIFT = 14
+TBI_DEPTH = 5
+TBI_MAX_POS = 1 << (MIN_SHIFT + 3 * TBI_DEPTH)
+# the .csi depth tabix uses (positions below 2^38)
+CSI_DEPTH = 8
+# htslib folds a bin into its parent when its chunks span less compressed file than this
+MIN_MARKER_DIST = 0x10000
+
+
+def chrom_sort_key(chrom):
+    name = chrom.replace("chr", "")
+    if name.isdigit():
+        return (0, int(name), "")
+    if name == "X":
+        return (1, 23, "")
+    if name == "Y":
+        return (1, 24, "")
+    return (2, 0, name)
+
+
+# -------------------------------------------------------------------
+# 1. WRITING BLOCKS
+# -------------------------------------------------------------------
+def compress_block(data, level=6):
+    """One BGZF block (gzip member with the BC extra field) of up to BLOCK_SIZE bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack("<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6,
+                         ord("B"), ord("C"), 2, len(cdata) + 25)
+    return header + cdata + struct.pack("<II", zlib.crc32(data), len(data))
+
+
+class BGZFWriter:
+    """
+    Writes bytes as BGZF blocks. Full blocks are compressed in batches on a
+    thread pool and written in order; virtual_offset() turns an offset in
+    the uncompressed stream into the (block << 16 | within-block) offset
+    the indexes store.
+    """
+
+    def __init__(self, path, threads=None, level=6):
+        self.path = path
+        self.level = level
+        self.threads = threads or os.cpu_count() or 1
+        self._file = open(path, "wb")
+        self._pool = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+        self._buffer = bytearray()
+        self._written = 0          # uncompressed bytes already compressed
+        self._block_starts = []    # file offset of every block written
+
+    def tell(self):
+        """Uncompressed offset of the next byte written."""
+        return self._written + len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= BLOCK_SIZE * BLOCKS_PER_THREAD * self.threads:
+            self._flush(full_blocks_only=True)
+
+    def _flush(self, full_blocks_only):
+        n = len(self._buffer) // BLOCK_SIZE if full_blocks_only else -(-len(self._buffer) // BLOCK_SIZE)
+        if n == 0:
+            return
+        end = min(n * BLOCK_SIZE, len(self._buffer))
+        chunks = [bytes(self._buffer[i:i + BLOCK_SIZE]) for i in range(0, end, BLOCK_SIZE)]
+        if self._pool is not None:
+            blocks = self._pool.map(compress_block, chunks, [self.level] * len(chunks))
+        else:
+            blocks = (compress_block(chunk, self.level) for chunk in chunks)
+        for block in blocks:
+            self._block_starts.append(self._file.tell())
+            self._file.write(block)
+        del self._buffer[:end]
+        self._written += end
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush(full_blocks_only=False)
+        # the end of the data (and of the last line) points at the EOF block
+        self._block_starts.append(self._file.tell())
+        self._file.write(EOF_BLOCK)
+        self._file.close()
+        self._file = None
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def virtual_offset(self, offsets):
+        """Virtual offsets of uncompressed offsets (of data already compressed)."""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts = np.asarray(self._block_starts, dtype=np.int64)
+        blocks, within = offsets // BLOCK_SIZE, offsets % BLOCK_SIZE
+        # the end of the data is the start of the EOF block (as bgzf_tell has it)
+        at_end = offsets == self._written
+        blocks[at_end], within[at_end] = len(starts) - 1, 0
+        return (starts[blocks] << 16) | within
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------------------------------------------------
+# 2. TABIX (.tbi) AND CSI INDEXES
+# -------------------------------------------------------------------
+def reg2bin(beg, end, min_shift=MIN_SHIFT, depth=TBI_DEPTH):
+    """htslib hts_reg2bin for arrays of 0-based, half-open [beg, end)."""
+    beg = np.asarray(beg, dtype=np.int64)
+    last = np.asarray(end, dtype=np.int64) - 1
+    bins = np.zeros(len(beg), dtype=np.int64)
+    done = np.zeros(len(beg), dtype=bool)
+    shift = min_shift
+    for level in range(depth, 0, -1):
+        first_bin = ((1 << 3 * level) - 1) // 7
+        fits = ~done & ((beg >> shift) == (last >> shift))
+        bins[fits] = first_bin + (beg[fits] >> shift)
+        done |= fits
+        shift += 3
+    return bins
+
+
+def reg2bins(beg, end, min_shift=MIN_SHIFT, depth=TBI_DEPTH):
+    """Every bin that can hold a record overlapping [beg, end) (htslib hts_reg2bins)."""
+    end -= 1
+    bins, first_bin = [], 0
+    shift = min_shift + 3 * depth
+    for level in range(depth + 1):
+        bins.extend(range(first_bin + (beg >> shift), first_bin + (end >> shift) + 1))
+        first_bin += 1 << 3 * level
+        shift -= 3
+    return bins
+
+
+def _csi_depth(max_end):
+    depth = CSI_DEPTH
+    while max_end > 1 << (MIN_SHIFT + 3 * depth):
+        depth += 1
+    return depth
+
+
+def _compress_bins(lists, depth):
+    """
+    htslib's compress_binning on {bin: chunks}: a bin whose chunks span less
+    than MIN_MARKER_DIST of compressed file moves into its parent (if the
+    parent exists), from the leaves up; then chunks starting in the block
+    where the previous one ends are merged.
+    """
+    for level in range(depth, 0, -1):
+        level_first = ((1 << 3 * level) - 1) // 7
+        for bin_id in sorted(lists):
+            if bin_id < level_first:
+                continue
+            chunks = lists[bin_id]
+            chunks.sort()
+            parent = (bin_id - 1) >> 3
+            if (chunks[-1][1] >> 16) - (chunks[0][0] >> 16) < MIN_MARKER_DIST and parent in lists:
+                lists[parent] += lists.pop(bin_id)
+    for bin_id in lists:
+        merged = []
+        for u, v in sorted(lists[bin_id]):
+            if merged and merged[-1][1] >> 16 >= u >> 16:
+                merged[-1][1] = max(merged[-1][1], v)
+            else:
+                merged.append([u, v])
+        lists[bin_id] = merged
+
+
+def _index_refs(ref_ids, beg, end, vbeg, vend, n_refs, depth):
+    """
+    Per reference: the bins as (bin id, CSI loffset, chunks) in bin order,
+    and the linear index. Binned as htslib's hts_idx_push / hts_idx_finish
+    bin records: consecutive records of one bin share a chunk, small bins
+    are folded into their parents, and a pseudo-bin after the last real one
+    holds the reference's offsets and record count.
+    """
+    n_bins = ((1 << 3 * depth + 3) - 1) // 7
+    refs = [([], np.zeros(0, dtype=np.int64))] * n_refs
+    if not len(beg):
+        return refs
+
+    bins = reg2bin(beg, end, MIN_SHIFT, depth)
+    new_chunk = np.r_[True, (ref_ids[1:] != ref_ids[:-1]) | (bins[1:] != bins[:-1])]
+    first = np.flatnonzero(new_chunk)
+    last = np.r_[first[1:], len(bins)] - 1
+    chunk_ref = ref_ids[first]
+
+    for ref in range(n_refs):
+        lo, hi = np.searchsorted(chunk_ref, [ref, ref + 1])
+        if lo == hi:
+            continue
+        row0, row1 = first[lo], last[hi - 1] + 1
+
+        # linear index: smallest offset of a record overlapping each 16 kb window
+        w_first = beg[row0:row1] >> MIN_SHIFT
+        spans = ((end[row0:row1] - 1) >> MIN_SHIFT) - w_first + 1
+        windows = np.repeat(w_first, spans) + (
+            np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans))
+        linear = np.full(int(windows.max()) + 1, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(linear, windows, np.repeat(vbeg[row0:row1], spans))
+        # windows nothing overlaps take the next window's offset (as htslib fills them)
+        is_set = linear != np.iinfo(np.int64).max
+        following = np.where(is_set, np.arange(len(linear)), len(linear))
+        linear = linear[np.minimum.accumulate(following[::-1])[::-1]]
+
+        lists = {}
+        for bin_id, u, v in zip(bins[first[lo:hi]].tolist(), vbeg[first[lo:hi]].tolist(),
+                                vend[last[lo:hi]].tolist()):
+            lists.setdefault(bin_id, []).append([u, v])
+
+        # loffset: linear-index offset at the bin's first position (before folding)
+        loffsets = {}
+        for bin_id in lists:
+            level_first, shift = _level_first_bin(bin_id, depth)
+            window = (bin_id - level_first) << (shift - MIN_SHIFT)
+            loffsets[bin_id] = int(linear[window]) if window < len(linear) else 0
+        _compress_bins(lists, depth)
+
+        ref_bins = [(b, loffsets[b], lists[b]) for b in sorted(lists)]
+        meta = [[int(vbeg[row0]), int(vend[row1 - 1])], [int(row1 - row0), 0]]
+        ref_bins.append((n_bins + 1, 0, meta))
+        refs[ref] = (ref_bins, linear)
+    return refs
+
+
+def _tabix_conf(names, col_seq, col_beg, col_end, meta, skip):
+    names_blob = b"".join(name.encode() + b"\0" for name in names)
+    return struct.pack("<6i", 0, col_seq, col_beg, col_end, ord(meta), skip) + \
+        struct.pack("<i", len(names_blob)) + names_blob
+
+
+def write_index(path, chroms, beg, end, vbeg, vend, index="tbi",
+                col_seq=1, col_beg=2, col_end=3, meta="#", skip=0):
+    """
+    Writes <path>.tbi or <path>.csi for records given in file order
+    (chromosomes contiguous): chromosome, 0-based half-open [beg, end),
+    and the virtual offsets of the start and end of the line.
+    """
+    chroms = np.asarray(chroms, dtype=object)
+    beg, end = np.asarray(beg, dtype=np.int64), np.asarray(end, dtype=np.int64)
+    vbeg, vend = np.asarray(vbeg, dtype=np.int64), np.asarray(vend, dtype=np.int64)
+    max_end = int(end.max()) if len(end) else 0
+
+    new_ref = np.r_[True, chroms[1:] != chroms[:-1]] if len(chroms) else np.zeros(0, dtype=bool)
+    names = list(chroms[new_ref])
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: chromosomes are not contiguous; sort the records first")
+    ref_ids = np.cumsum(new_ref) - 1
+
+    if index == "tbi":
+        if max_end > TBI_MAX_POS:
+            raise ValueError(f"{path}: positions beyond 2^29 need index='csi'")
+        depth = TBI_DEPTH
+    else:
+        depth = _csi_depth(max_end)
+    refs = _index_refs(ref_ids, beg, end, vbeg, vend, len(names), depth)
+
+    conf = _tabix_conf(names, col_seq, col_beg, col_end, meta, skip)
+    if index == "tbi":
+        out = [b"TBI\1", struct.pack("<i", len(names)), conf]
+    else:
+        out = [b"CSI\1", struct.pack("<3i", MIN_SHIFT, depth, len(conf)), conf,
+               struct.pack("<i", len(names))]
+
+    for ref_bins, linear in refs:
+        out.append(struct.pack("<i", len(ref_bins)))
+        for bin_id, loffset, chunks in ref_bins:
+            if index == "tbi":
+                out.append(struct.pack("<Ii", bin_id, len(chunks)))
+            else:
+                out.append(struct.pack("<IQi", bin_id, loffset, len(chunks)))
+            out.append(np.asarray(chunks, dtype="<u8").tobytes())
+        if index == "tbi":
+            out.append(struct.pack("<i", len(linear)))
+            out.append(linear.astype("<u8").tobytes())
+    # records without coordinates: none
+    out.append(struct.pack("<Q", 0))
+
+    index_file = f"{path}.{index}"
+    with BGZFWriter(index_file, threads=1) as writer:
+        writer.write(b"".join(out))
+    return index_file
+
+
+def _level_first_bin(bin_id, depth):
+    """(first bin of bin_id's level, shift of that level), for the CSI loffset."""
+    first, shift = 0, MIN_SHIFT + 3 * depth
+    for level in range(depth + 1):
+        next_first = first + (1 << 3 * level)
+        if bin_id < next_first:
+            return first, shift
+        first, shift = next_first, shift - 3
+    raise ValueError(f"bin {bin_id} is beyond depth {depth}")
+
+
+# -------------------------------------------------------------------
+# 3. WRITING SORTED, INDEXED TABLES
+# -------------------------------------------------------------------
+def _line_starts(text):
+    """Offsets of the line starts of text (bytes ending with a newline), plus its length."""
+    newlines = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n"))
+    return np.r_[0, newlines + 1].astype(np.int64)
+
+
+def sort_order(chroms, starts, ends):
+    """Row order by chromosome (chrom_sort_key), start and end."""
+    names, codes = np.unique(np.asarray(chroms, dtype=str), return_inverse=True)
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[sorted(range(len(names)), key=lambda i: chrom_sort_key(names[i]))] = np.arange(len(names))
+    return np.lexsort((np.asarray(ends), np.asarray(starts), rank[codes]))
+
+
+def _write_indexed(path, header, body, chroms, starts, ends, index, threads, skip=0,
+                   meta="#", cols=(1, 2, 3)):
+    """
+    Writes header + body (lines already in coordinate order) as BGZF and
+    indexes the body's lines. starts / ends are 1-based, inclusive.
+    """
+    with BGZFWriter(path, threads=threads) as writer:
+        writer.write(header)
+        bounds = writer.tell() + _line_starts(body)
+        writer.write(body)
+
+    if index:
+        beg0 = np.asarray(starts, dtype=np.int64) - 1
+        # records need at least one base (INS: end == start)
+        end0 = np.maximum(np.asarray(ends, dtype=np.int64), beg0 + 1)
+        write_index(path, chroms, beg0, end0,
+                    writer.virtual_offset(bounds[:-1]), writer.virtual_offset(bounds[1:]),
+                    index=index, col_seq=cols[0], col_beg=cols[1], col_end=cols[2],
+                    meta=meta, skip=skip)
+
+
+def write_bgzf_table(df, path, index="tbi", threads=None):
+    """
+    Writes an SV table (chrom, start, end, ...) as a coordinate-sorted,
+    tab-separated BGZF file with a "#"-prefixed header line, plus its
+    tabix index (index="tbi" or "csi"; None for no index).
+    """
+    chroms = df["chrom"].astype(str).to_numpy(dtype=object)
+    order = sort_order(chroms, df["start"].to_numpy(), df["end"].to_numpy())
+    df = df.iloc[order]
+    header = ("#" + "\t".join(df.columns) + "\n").encode()
+    body = df.to_csv(sep="\t", header=False, index=False).encode()
+    _write_indexed(path, header, body, chroms[order], df["start"].to_numpy(),
+                   df["end"].to_numpy(), index, threads)
+
+
+def bgzip_file(path, output=None, index="tbi", threads=None, skip=0, meta="#",
+               seq_col=1, start_col=2, end_col=3, keep=True):
+    """
+    Compresses a tab-separated text file (SV_summary.txt, .avinput, ...)
+    into a coordinate-sorted <path>.gz and indexes it. The first `skip`
+    lines (and lines starting with meta) are kept on top as the header.
+    """
+    output = output or path + ".gz"
+    with open(path, "rb") as f:
+        raw = f.read().splitlines(keepends=True)
+
+    header, lines = [], []
+    for i, line in enumerate(raw):
+        if i < skip or line.startswith(meta.encode()):
+            header.append(line)
+        else:
+            lines.append(line if line.endswith(b"\n") else line + b"\n")
+
+    fields = [line.rstrip(b"\n").split(b"\t") for line in lines]
+    chroms = np.array([f[seq_col - 1].decode() for f in fields], dtype=object)
+    starts = np.array([int(f[start_col - 1]) for f in fields], dtype=np.int64)
+    ends = np.array([int(f[end_col - 1]) for f in fields], dtype=np.int64) if end_col else starts
+    order = sort_order(chroms, starts, ends)
+    body = b"".join(lines[i] for i in order)
+    _write_indexed(output, b"".join(header), body, chroms[order], starts[order], ends[order],
+                   index, threads, skip=skip, meta=meta, cols=(seq_col, start_col, end_col))
+    if not keep:
+        os.remove(path)
+    return output
+
+
+class BGZFTableWriter:
+    """
+    Writes an SV table chunk by chunk as BGZF (see TableWriter). Chunks in
+    coordinate order (chromosomes contiguous, starts ascending) are indexed
+    as they stream through; if the order breaks, the finished file is
+    re-sorted once at close.
+    """
+
+    def __init__(self, path, columns, index="tbi", threads=None):
+        self.path = path
+        self.index = index
+        self._writer = BGZFWriter(path, threads=threads)
+        self._writer.write(("#" + "\t".join(columns) + "\n").encode())
+        self._records = []   # per chunk: (chroms, starts, ends, line bounds)
+        self._chroms_done = set()
+        self._last = None
+        self._sorted = True
+
+    def write(self, df):
+        text = df.to_csv(sep="\t", header=False, index=False).encode()
+        bounds = self._writer.tell() + _line_starts(text)
+        chroms = df["chrom"].astype(str).to_numpy(dtype=object)
+        starts = df["start"].to_numpy(np.int64)
+        ends = df["end"].to_numpy(np.int64)
+        self._writer.write(text)
+        self._records.append((chroms, starts, ends, bounds))
+        if self._sorted and len(df):
+            self._check_order(chroms, starts)
+
+    def _check_order(self, chroms, starts):
+        if self._last is not None:
+            chroms = np.r_[[self._last[0]], chroms]
+            starts = np.r_[[self._last[1]], starts]
+        same = chroms[1:] == chroms[:-1]
+        runs = list(chroms[np.r_[True, ~same]])
+        if (np.diff(starts)[same] < 0).any() or len(set(runs)) != len(runs) \
+                or self._chroms_done & set(runs[1 if self._last else 0:]):
+            self._sorted = False
+            return
+        self._chroms_done.update(runs[:-1])
+        self._last = (chroms[-1], starts[-1])
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        if not self._sorted:
+            # coordinate order is needed for the index: sort the whole table once
+            from table_io import read_table
+            write_bgzf_table(read_table(self.path), self.path, index=self.index,
+                             threads=self._writer.threads)
+        elif self.index:
+            records = [r for r in self._records if len(r[0])]
+            if records:
+                chroms = np.concatenate([r[0] for r in records])
+                starts = np.concatenate([r[1] for r in records])
+                ends = np.concatenate([r[2] for r in records])
+                vbeg = np.concatenate([self._writer.virtual_offset(r[3][:-1]) for r in records])
+                vend = np.concatenate([self._writer.virtual_offset(r[3][1:]) for r in records])
+            else:
+                chroms = np.zeros(0, dtype=object)
+                starts = ends = vbeg = vend = np.zeros(0, dtype=np.int64)
+            beg0 = starts - 1
+            write_index(self.path, chroms, beg0, np.maximum(ends, beg0 + 1), vbeg, vend,
+                        index=self.index)
+        self._writer = None
+
+
+# -------------------------------------------------------------------
+# 4. RANDOM ACCESS
+# -------------------------------------------------------------------
+def read_index(path):
+    """Parses <path>.tbi (or <path>.csi)."""
+    for kind in ("tbi", "csi"):
+        if os.path.exists(f"{path}.{kind}"):
+            break
+    else:
+        raise FileNotFoundError(f"No .tbi or .csi index next to {path}")
+    with gzip.open(f"{path}.{kind}", "rb") as f:
+        data = f.read()
+
+    pos = 4
+    def take(fmt):
+        nonlocal pos
+        values = struct.unpack_from(fmt, data, pos)
+        pos += struct.calcsize(fmt)
+        return values
+
+    if kind == "tbi":
+        min_shift, depth = MIN_SHIFT, TBI_DEPTH
+        (n_ref,) = take("<i")
+        conf = take("<6i")
+        (l_nm,) = take("<i")
+    else:
+        min_shift, depth, _ = take("<3i")
+        conf = take("<6i")
+        (l_nm,) = take("<i")
+    names = data[pos:pos + l_nm].split(b"\0")[:-1]
+    pos += l_nm
+    if kind == "csi":
+        (n_ref,) = take("<i")
+
+    refs = []
+    for _ in range(n_ref):
+        bins = {}
+        (n_bin,) = take("<i")
+        for _ in range(n_bin):
+            if kind == "tbi":
+                bin_id, n_chunk = take("<Ii")
+                loffset = 0
+            else:
+                bin_id, loffset, n_chunk = take("<IQi")
+            chunks = [take("<QQ") for _ in range(n_chunk)]
+            bins[bin_id] = (loffset, chunks)
+        linear = []
+        if kind == "tbi":
+            (n_intv,) = take("<i")
+            linear = list(take(f"<{n_intv}Q")) if n_intv else []
+        refs.append((bins, linear))
+
+    return {
+        "kind": kind, "min_shift": min_shift, "depth": depth,
+        "col_seq": conf[1], "col_beg": conf[2], "col_end": conf[3],
+        "meta": chr(conf[4]), "skip": conf[5],
+        "names": [n.decode() for n in names], "refs": refs,
+    }
+
+
+def _read_range(f, vbeg, vend):
+    """Uncompressed bytes between two virtual offsets."""
+    out = []
+    block, within = vbeg >> 16, vbeg & 0xffff
+    end_block, end_within = vend >> 16, vend & 0xffff
+    while block <= end_block:
+        f.seek(block)
+        header = f.read(18)
+        if len(header) < 18:
+            break
+        bsize = struct.unpack_from("<H", header, 16)[0] + 1
+        data = zlib.decompress(f.read(bsize - 18)[:-8], -15)
+        stop = end_within if block == end_block else len(data)
+        out.append(data[within:stop])
+        block, within = block + bsize, 0
+    return b"".join(out)
+
+
+def fetch(path, chrom, start, end, index=None):
+    """
+    Lines (bytes) of an indexed BGZF file overlapping chrom:start-end
+    (1-based, inclusive), read through its .tbi / .csi index.
+    """
+    index = index or read_index(path)
+    if chrom not in index["names"]:
+        return []
+    bins, linear = index["refs"][index["names"].index(chrom)]
+    beg0, end0 = start - 1, end
+    min_shift, depth = index["min_shift"], index["depth"]
+
+    if index["kind"] == "tbi":
+        window = beg0 >> min_shift
+        min_off = linear[min(window, len(linear) - 1)] if linear else 0
+    else:
+        # loffset of the first existing bin containing beg, from the leaf up
+        bin_id = ((1 << 3 * depth) - 1) // 7 + (beg0 >> min_shift)
+        min_off = 0
+        while True:
+            if bin_id in bins:
+                min_off = bins[bin_id][0]
+                break
+            if bin_id == 0:
+                break
+            bin_id = (bin_id - 1) >> 3
+
+    chunks = sorted(c for b in reg2bins(beg0, end0, min_shift, depth) if b in bins
+                    for c in bins[b][1] if c[1] > min_off)
+    merged = []
+    for c0, c1 in chunks:
+        if merged and c0 <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], c1)
+        else:
+            merged.append([c0, c1])
+
+    seq, col_beg, col_end = index["col_seq"] - 1, index["col_beg"] - 1, index["col_end"] - 1
+    hits = []
+    with open(path, "rb") as f:
+        for c0, c1 in merged:
+            for line in _read_range(f, c0, c1).splitlines(keepends=True):
+                fields = line.rstrip(b"\n").split(b"\t")
+                if fields[seq].decode() != chrom:
+                    continue
+                line_beg = int(fields[col_beg])
+                line_end = int(fields[col_end]) if index["col_end"] else line_beg
+                if line_beg <= end and max(line_end, line_beg) >= start:
+                    hits.append(line)
+    return hits
+
+
+def parse_region(region):
+    match = re.fullmatch(r"([^:]+):([\d,]+)-([\d,]+)", region.strip())
+    if not match:
+        raise ValueError(f"Bad region: {region} (use chrom:start-end)")
+    chrom, start, end = match.groups()
+    return chrom, int(start.replace(",", "")), int(end.replace(",", ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="bgzip + tabix for SV tables: compress (sorted) and index a "
+                    "tab-separated file, or query an indexed .gz"
+    )
+    parser.add_argument("file")
+    parser.add_argument("--region", action="append", default=[],
+                        help="print the lines of an indexed .gz overlapping chrom:start-end")
+    parser.add_argument("--csi", action="store_true", help="write a .csi instead of a .tbi")
+    parser.add_argument("--skip", type=int, default=0, help="header lines to keep on top")
+    parser.add_argument("--seq", type=int, default=1, help="chromosome column (1-based)")
+    parser.add_argument("--begin", type=int, default=2, help="start column (1-based)")
+    parser.add_argument("--end", type=int, default=3, help="end column (1-based, 0 = none)")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.region:
+        index = read_index(args.file)
+        for region in args.region:
+            sys.stdout.buffer.write(b"".join(fetch(args.file, *parse_region(region), index=index)))
+    else:
+        output = bgzip_file(args.file, index="csi" if args.csi else "tbi", threads=args.threads,
+                            skip=args.skip, seq_col=args.seq, start_col=args.begin,
+                            end_col=args.end)
+        print(f"{output} is saved.")
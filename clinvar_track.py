@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Unified ClinVar track, built from the raw ClinVar export.
+
+ClinVar used to come in as two BEDs: clinvar_SV.bed with the germline
+classification and clinvar_SV_condition.bed with the condition. Each one
+got its own overlap query, and the pathLink SVs were found with a regex
+over the joined classification strings. This module turns
+annovar/humandb/clinvar_SV.txt into one track instead. That file is the
+tab-separated download of
+https://www.ncbi.nlm.nih.gov/clinvar/?term=%22structural+variant%22
+
+    #chrom  start  end  germline_classification  condition  pathogenicity_rank
+
+With the track, annotate_sv answers the classification, the condition and
+the integer rank (PATHOGENICITY_RANK) from a single overlap query, and the
+pathLink extraction becomes an integer comparison. The track is compiled
+into the memory-mapped reference cache (reference_cache.py) straight away.
+
+    python3 clinvar_track.py                          # annovar/humandb/clinvar_SV.txt -> clinvar_SV.track.bed
+    python3 clinvar_track.py clinvar_SV.txt -o clinvar.track.bed --types Deletion Duplication
+"""
+import argparse
+import os
+
+import pandas as pd
+
+
+CLINVAR_TXT = "annovar/humandb/clinvar_SV.txt"
+CLINVAR_TRACK = "clinvar_SV.track.bed"
+
+# Variant types kept in the track: the same ones as the two ClinVar BEDs
+SV_TYPES = ["Deletion", "copy number loss"]
+
+TRACK_COLS = ["chrom", "start", "end", "germline_classification", "condition",
+              "pathogenicity_rank"]
+
+# Germline classifications in increasing order of pathogenicity; 0 means
+# no ClinVar hit, or a class with no rank ("not provided", risk allele, ...)
+PATHOGENICITY_RANK = {
+    "benign": 1,
+    "likely benign": 2,
+    "uncertain significance": 3,
+    "conflicting classifications of pathogenicity": 4,
+    "likely pathogenic": 5,
+    "pathogenic": 6,
+}
+
+# SVs at or above this rank go to the pathLink table
+PATHOGENIC_RANK = PATHOGENICITY_RANK["likely pathogenic"]
+
+
+def pathogenicity_rank(classification):
+    """
+    Integer rank of a ClinVar germline classification.
+
+    Qualifiers such as ", low penetrance" are ignored. A combined class such
+    as "Pathogenic/Likely pathogenic" gets the lower rank of its parts.
+    Several ";"-joined classes (several hits) get the highest rank among them.
+    """
+    best = 0
+    for part in str(classification).split(";"):
+        ranks = [PATHOGENICITY_RANK.get(c.split(",")[0].strip().lower(), 0)
+                 for c in part.split("/")]
+        best = max(best, min([r for r in ranks if r], default=0))
+    return best
+
+
+def build_track(clinvar_txt=CLINVAR_TXT, output=CLINVAR_TRACK, types=SV_TYPES, cache=True):
+    """
+    Writes the ClinVar records of the given variant types that have a GRCh38
+    range ("start - end") as one BED track (TRACK_COLS). Records are kept in
+    file order. Coordinates are written as ClinVar gives them, the same way
+    as in the two ClinVar BEDs. With cache=True the reference cache of the
+    track is built as well.
+
+    Returns the number of records in the track.
+    """
+    raw = pd.read_csv(clinvar_txt, sep="\t", dtype=str, keep_default_na=False)
+
+    location = raw["GRCh38Location"].str.extract(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
+    keep = (
+        raw["Variant type"].isin(types)
+        & raw["GRCh38Chromosome"].str.fullmatch(r"[0-9XYMT]+")
+        & location[0].notna()
+    )
+    raw, location = raw[keep], location[keep]
+
+    classification = raw["Germline classification"].replace("", "not provided")
+    track = pd.DataFrame({
+        "chrom": "chr" + raw["GRCh38Chromosome"],
+        "start": location[0].astype(int),
+        "end": location[1].astype(int),
+        "germline_classification": classification,
+        "condition": raw["Condition(s)"].replace("", "not provided"),
+        "pathogenicity_rank": classification.map(pathogenicity_rank),
+    })
+
+    tmp = f"{output}.{os.getpid()}"
+    track.to_csv(tmp, sep="\t", index=False, header=["#chrom", *TRACK_COLS[1:]])
+    os.replace(tmp, output)
+    print(f"{output} is saved ({len(track)} ClinVar SVs).")
+
+    if cache:
+        from reference_cache import build_cache
+        build_cache(output)
+    return len(track)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the unified ClinVar track from the raw ClinVar export"
+    )
+    parser.add_argument("clinvar_txt", nargs="?", default=CLINVAR_TXT,
+                        help=f"ClinVar tab-separated download (default {CLINVAR_TXT})")
+    parser.add_argument("-o", "--output", default=CLINVAR_TRACK,
+                        help=f"track BED (default {CLINVAR_TRACK})")
+    parser.add_argument("--types", nargs="+", default=SV_TYPES,
+                        help=f"ClinVar variant types to keep (default {' '.join(SV_TYPES)})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not compile the reference cache of the track")
+    args = parser.parse_args()
+
+    build_track(args.clinvar_txt, args.output, types=args.types, cache=not args.no_cache)
@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+"""
+Streaming Delly VCF parser (Python replacement for the awk stage in script.sh).
+
+The VCF (plain, gzip or bgzip) is read in fixed-size chunks and every chunk is
+turned into a batch of NumPy columns, so memory stays bounded whatever the
+size of the VCF. The same rules as script.sh are applied per batch:
+
+    - PASS filter
+    - PRECISE / IMPRECISE flags, SVTYPE, END, PE, SR from INFO
+    - GT of sample1, sample2, sample3 (records with any ./. are dropped
+      after the read counts)
+    - child identification (Mendelian deviations), de novo SVs,
+      chrX heterozygosity, parents and child sex
+
+write_trio_outputs() writes exactly the files script.sh writes
+(output/SV_summary.txt, de novo files, .avinput files, summary_stats.txt),
+plus summary_stats.json with the same statistics for plotting and cohort
+roll-ups, optionally parsing the chunks in a process pool (workers > 1).
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+
+CHUNK_SIZE = 50_000
+
+SUMMARY_HEADER = [
+    "CHROM", "START", "END", "SV_TYPE", "LENGTH_bp", "Paired_end_PE", "Split_end_SR"
+]
+# script.sh names the read columns differently in the imprecise de novo file
+IMPRECISE_HEADER = [
+    "CHROM", "START", "END", "SV_TYPE", "LENGTH_bp", "PairedEnd_PE", "SplitEnd_SR"
+]
+
+HET = ("0/1", "1/0")
+
+# Layout version of summary_stats.json (TrioStats.to_dict)
+SUMMARY_VERSION = 1
+
+_LEADING_INT = re.compile(r"\s*[-+]?\d+")
+
+
+# -------------------------------------------------------------------
+# 1. READING THE VCF IN BATCHES
+# -------------------------------------------------------------------
+def open_vcf(vcf_file):
+    """Opens a plain or gzip/bgzip-compressed VCF for reading text."""
+    with open(vcf_file, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(vcf_file, "rt")
+    return open(vcf_file)
+
+
+def vcf_samples(vcf_file):
+    """Sample names from the #CHROM header line."""
+    with open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith("#CHROM"):
+                return line.rstrip("\n").split("\t")[9:]
+            if not line.startswith("#"):
+                break
+    return []
+
+
+def _awk_int(text):
+    """Numeric value of a string the way awk's `val + 0` reads it."""
+    m = _LEADING_INT.match(text)
+    return int(m.group()) if m else 0
+
+
+def _parse_info(info, pos):
+    svtype, end, pe, sr = "NA", pos, 0, 0
+    precise = imprecise = False
+
+    for element in info.split(";"):
+        if element == "PRECISE":
+            precise = True
+        if element == "IMPRECISE":
+            imprecise = True
+
+        key_value = element.split("=")
+        key = key_value[0]
+        val = key_value[1] if len(key_value) > 1 else ""
+
+        if key == "SVTYPE":
+            svtype = val
+        elif key == "END":
+            end = _awk_int(val)
+        elif key == "PE":
+            pe = _awk_int(val)
+        elif key == "SR":
+            sr = _awk_int(val)
+
+    return svtype, end, pe, sr, precise, imprecise
+
+
+def _to_batch(rows, n_samples):
+    (chrom, pos, end, svtype, pe, sr,
+     precise, imprecise, ref, alt, gt) = zip(*rows)
+
+    pos = np.array(pos, dtype=np.int64)
+    end = np.array(end, dtype=np.int64)
+    return {
+        "chrom": np.array(chrom, dtype=object),
+        "pos": pos,
+        "end": end,
+        "svtype": np.array(svtype, dtype=object),
+        "length": end - pos,
+        "pe": np.array(pe, dtype=np.int64),
+        "sr": np.array(sr, dtype=np.int64),
+        "precise": np.array(precise, dtype=bool),
+        "imprecise": np.array(imprecise, dtype=bool),
+        "ref": np.array(ref, dtype=object),
+        "alt": np.array(alt, dtype=object),
+        "gt": np.array(gt, dtype=object).reshape(len(rows), n_samples),
+    }
+
+
+def read_record_chunks(vcf_file, chunk_size=CHUNK_SIZE):
+    """
+    Generator of raw PASS data lines, chunk_size lines at a time.
+    Chunks always end on a record boundary, so each one can be
+    parsed on its own (in another process if needed).
+    """
+    lines = []
+    with open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith("#"):
+                continue
+
+            fields = line.split("\t", 7)
+            if len(fields) < 8 or fields[6] != "PASS":
+                continue
+
+            lines.append(line)
+            if len(lines) == chunk_size:
+                yield lines
+                lines = []
+
+    if lines:
+        yield lines
+
+
+def parse_records(lines, n_samples):
+    """Turns a chunk of PASS data lines into a batch of NumPy columns."""
+    rows = []
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+
+        pos = _awk_int(fields[1])
+        svtype, end, pe, sr, precise, imprecise = _parse_info(fields[7], pos)
+
+        gt = [f.split(":")[0] for f in fields[9:9 + n_samples]]
+        gt += [""] * (n_samples - len(gt))
+
+        rows.append((fields[0], pos, end, svtype, pe, sr,
+                     precise, imprecise, fields[3], fields[4], gt))
+
+    return _to_batch(rows, n_samples)
+
+
+def read_vcf_batches(vcf_file, chunk_size=CHUNK_SIZE, n_samples=None):
+    """
+    Generator of PASS records, chunk_size records at a time.
+
+    Each batch is a dict of NumPy columns:
+        chrom, pos, end, svtype, length, pe, sr, precise, imprecise, ref, alt
+    and gt, a (records x samples) array with the GT field of every sample.
+    """
+    if n_samples is None:
+        n_samples = len(vcf_samples(vcf_file))
+
+    for lines in read_record_chunks(vcf_file, chunk_size):
+        yield parse_records(lines, n_samples)
+
+
+# -------------------------------------------------------------------
+# 2. TRIO STATISTICS (same counters as script.sh)
+# -------------------------------------------------------------------
+class TrioStats:
+    """
+    Counters accumulated batch by batch. Counter tables (types, chromosomes,
+    genotype combinations) keep the order in which keys were first seen.
+    """
+
+    def __init__(self, samples):
+        if len(samples) < 3:
+            raise ValueError(f"Trio analysis needs 3 samples, VCF has {len(samples)}")
+        self.samples = list(samples[:3])
+
+        self.total = 0
+        self.precise = 0
+        self.imprecise = 0
+        self.deviations = [0, 0, 0]
+        self.biallelic = 0
+        self.multiallelic = 0
+        self.snv = 0
+        self.sv = 0
+        self.type_counts = Counter()
+        self.chrom_counts = Counter()
+        self.combinations = Counter()
+        self.total_x = 0
+        self.het = [0, 0, 0]
+
+    def update(self, batch):
+        """
+        Adds one batch to the counters and returns the record masks
+        the writers need: called (no ./.), denovo_precise, denovo_imprecise.
+        """
+        precise = batch["precise"]
+        imprecise = batch["imprecise"]
+
+        # read counts include records with missing genotypes
+        self.total += len(precise)
+        self.precise += int(precise.sum())
+        self.imprecise += int(imprecise.sum())
+
+        s1, s2, s3 = (batch["gt"][:, i] for i in range(3))
+        called = (s1 != "./.") & (s2 != "./.") & (s3 != "./.")
+
+        # child identification: sample i carries the ALT, both others are 0/0
+        trio = (s1, s2, s3)
+        for i in range(3):
+            others = [trio[j] for j in range(3) if j != i]
+            carrier = (trio[i] == "1/1") | (trio[i] == "0/1")
+            self.deviations[i] += int(
+                (called & carrier & (others[0] == "0/0") & (others[1] == "0/0")).sum()
+            )
+
+        kept = called & precise
+        alt = batch["alt"][kept]
+        ref = batch["ref"][kept]
+        multi = np.array([("," in a) for a in alt], dtype=bool)
+        self.multiallelic += int(multi.sum())
+        self.biallelic += int((~multi).sum())
+
+        for r, a in zip(ref[~multi], alt[~multi]):
+            if len(r) == 1 and len(a) == 1:
+                self.snv += 1
+            if (len(r) >= 1 and len(a) > 1) or (len(r) > 1 and len(a) >= 1):
+                self.sv += 1
+
+        denovo = called & (s1 == "0/0") & (s2 == "0/0") & ((s3 == "0/1") | (s3 == "1/1"))
+
+        on_x = kept & (batch["chrom"] == "chrX")
+        self.total_x += int(on_x.sum())
+        for i, gt in enumerate(trio):
+            self.het[i] += int((on_x & ((gt == HET[0]) | (gt == HET[1]))).sum())
+
+        self.type_counts.update(batch["svtype"][kept])
+        self.chrom_counts.update(batch["chrom"][kept])
+        self.combinations.update(
+            f"{a}_{b}_{c}" for a, b, c in zip(s1[kept], s2[kept], s3[kept])
+        )
+
+        return {
+            "called": called,
+            "denovo_precise": denovo & precise,
+            "denovo_imprecise": denovo & (precise | imprecise),
+        }
+
+    def merge(self, other):
+        """
+        Adds the counters of another TrioStats (e.g. one shard of the VCF).
+        Merging shards in file order gives the same counts and the same
+        first-seen key order as processing the VCF in one go.
+        """
+        self.total += other.total
+        self.precise += other.precise
+        self.imprecise += other.imprecise
+        self.biallelic += other.biallelic
+        self.multiallelic += other.multiallelic
+        self.snv += other.snv
+        self.sv += other.sv
+        self.total_x += other.total_x
+        for i in range(3):
+            self.deviations[i] += other.deviations[i]
+            self.het[i] += other.het[i]
+        self.type_counts.update(other.type_counts)
+        self.chrom_counts.update(other.chrom_counts)
+        self.combinations.update(other.combinations)
+
+    def parents(self):
+        """(mother, father) inferred from chrX heterozygosity of sample1/sample2."""
+        if self.het[0] > self.het[1]:
+            return "sample1", "sample2"
+        if self.het[1] > self.het[0]:
+            return "sample2", "sample1"
+        return "Undetermined", "Undetermined"
+
+    def child_is_female(self):
+        return self.het[2] > 0
+
+    def to_text(self):
+        """summary_stats.txt, line for line as script.sh writes it."""
+        s = self.samples
+        mother, father = self.parents()
+
+        lines = ["=== Trio Summary==="]
+        lines += [f"sample{i + 1} deviations:\t{self.deviations[i]}" for i in range(3)]
+        lines += ["The sample with the least possible deviations is the child sample.", ""]
+
+        lines += ["", "=== Variant Read Count Summary ==="]
+        lines += [f"Total variant reads:\t{self.total}",
+                  f"Precise reads:\t{self.precise}",
+                  f"Imprecise reads:\t{self.imprecise}"]
+
+        lines += ["", "===Allele Structure Counts==="]
+        lines += [f"Bi-allelic variants:\t{self.biallelic}",
+                  f"Multi-allelic variants:\t{self.multiallelic}"]
+
+        lines += ["", "=== SNV / SV Counts==="]
+        lines += [f"SNVs (Single Nucleotide Variants):\t{self.snv}",
+                  f"SVs (Structural Variants):\t{self.sv}"]
+
+        lines += ["", "===Variant Types Count==="]
+        lines += [f"{k}\t{v}" for k, v in self.type_counts.items()]
+        lines += [""]
+
+        lines += ["", "===Genotype Combination Counts (Parent1_Parent2_Child)==="]
+        lines += [f"{k}\t{v}" for k, v in self.combinations.items()]
+        lines += [""]
+
+        lines += ["", "===Variants per Chromosome==="]
+        lines += [f"{k}\t{v}" for k, v in self.chrom_counts.items()]
+        lines += [""]
+
+        lines += ["", "==chrX Heterozygosity Analysis=="]
+        lines += [f"Total chrX variants:\t{self.total_x}",
+                  f"ParentA (sample1, {s[0]}) het:\t{self.het[0]}",
+                  f"ParentB (sample2, {s[1]}) het:\t{self.het[1]}",
+                  f"Child   (sample3, {s[2]}) het:\t{self.het[2]}",
+                  ""]
+
+        lines += ["", "===Inferred Parents==="]
+        lines += [f"Mother (likely):\t{mother}", f"Father (likely):\t{father}", ""]
+
+        lines += ["", "====Inferred Sex of Child (sample3)===="]
+        if self.child_is_female():
+            lines += ["Child = FEMALE (heterozygous chrX detected)"]
+        else:
+            lines += ["Child = MALE (no chrX heterozygosity)"]
+        lines += [""]
+
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """
+        The same statistics as summary_stats.txt as plain JSON-able data
+        (written to summary_stats.json). Counter tables keep their
+        first-seen order.
+        """
+        names = [f"sample{i + 1}" for i in range(3)]
+        mother, father = self.parents()
+        return {
+            "version": SUMMARY_VERSION,
+            "samples": dict(zip(names, self.samples)),
+            "deviations": dict(zip(names, self.deviations)),
+            "reads": {
+                "total": self.total,
+                "precise": self.precise,
+                "imprecise": self.imprecise,
+            },
+            "alleles": {"biallelic": self.biallelic, "multiallelic": self.multiallelic},
+            "variants": {"snv": self.snv, "sv": self.sv},
+            "sv_types": dict(self.type_counts),
+            "genotype_combinations": dict(self.combinations),
+            "chromosomes": dict(self.chrom_counts),
+            "chrX": {"total": self.total_x, "het": dict(zip(names, self.het))},
+            "parents": {"mother": mother, "father": father},
+            "child_sex": "FEMALE" if self.child_is_female() else "MALE",
+        }
+
+    @classmethod
+    def from_dict(cls, summary):
+        """
+        Rebuilds the counters from to_dict() output, e.g. to merge the
+        summaries of many trios without re-reading their VCFs.
+        """
+        names = [f"sample{i + 1}" for i in range(3)]
+        stats = cls([summary["samples"][n] for n in names])
+        stats.deviations = [summary["deviations"][n] for n in names]
+        stats.total = summary["reads"]["total"]
+        stats.precise = summary["reads"]["precise"]
+        stats.imprecise = summary["reads"]["imprecise"]
+        stats.biallelic = summary["alleles"]["biallelic"]
+        stats.multiallelic = summary["alleles"]["multiallelic"]
+        stats.snv = summary["variants"]["snv"]
+        stats.sv = summary["variants"]["sv"]
+        stats.type_counts = Counter(summary["sv_types"])
+        stats.combinations = Counter(summary["genotype_combinations"])
+        stats.chrom_counts = Counter(summary["chromosomes"])
+        stats.total_x = summary["chrX"]["total"]
+        stats.het = [summary["chrX"]["het"][n] for n in names]
+        return stats
+
+    def print_summary(self):
+        s = self.samples
+        for i in range(3):
+            print(f"Possible child = Sample{i + 1} ({s[i]}), deviations = {self.deviations[i]}")
+        print("The sample with the least possible deviations is the child sample.")
+
+        print("\n==chrX Heterozygosity Analysis==")
+        print(f"Total chrX variants: {self.total_x}")
+        print(f"ParentA (sample1, {s[0]}) het: {self.het[0]}")
+        print(f"ParentB (sample2, {s[1]}) het: {self.het[1]}")
+        print(f"Child   (sample3, {s[2]}) het: {self.het[2]}")
+
+        mother, father = self.parents()
+        print("\n===Inferred Parents====")
+        print(f"Mother (likely): {mother}")
+        print(f"Father (likely): {father}")
+
+        print("\n====Inferred Sex of Child (sample3)====")
+        if self.child_is_female():
+            print("Child = FEMALE (heterozygous chrX detected)")
+        else:
+            print("Child = MALE (no chrX heterozygosity observed)")
+
+
+def summary_from_text(text):
+    """
+    Converts a summary_stats.txt written by script.sh (awk parser) into the
+    to_dict() layout. Values are taken by section and position, not by the
+    wording of their labels.
+    """
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith("=="):
+            current = line.strip("= ")
+            sections[current] = []
+        elif current is not None and "\t" in line:
+            sections[current].append(line.rsplit("\t", 1))
+
+    def table(title):
+        return {key: int(value) for key, value in sections.get(title, [])}
+
+    def values(title):
+        return [int(value) for _, value in sections.get(title, [])]
+
+    het_lines = sections["chrX Heterozygosity Analysis"]
+    samples = [re.search(r"\(sample\d, (.*?)\)", label).group(1)
+               for label, _ in het_lines[1:4]]
+    total_x, *het = values("chrX Heterozygosity Analysis")
+    total, precise, imprecise = values("Variant Read Count Summary")
+    biallelic, multiallelic = values("Allele Structure Counts")
+    snv, sv = values("SNV / SV Counts")
+
+    stats = TrioStats(samples)
+    stats.deviations = values("Trio Summary")
+    stats.total, stats.precise, stats.imprecise = total, precise, imprecise
+    stats.biallelic, stats.multiallelic = biallelic, multiallelic
+    stats.snv, stats.sv = snv, sv
+    stats.type_counts = Counter(table("Variant Types Count"))
+    stats.combinations = Counter(
+        table("Genotype Combination Counts (Parent1_Parent2_Child)")
+    )
+    stats.chrom_counts = Counter(table("Variants per Chromosome"))
+    stats.total_x, stats.het = total_x, het
+    return stats.to_dict()
+
+
+def write_summary_json(summary, json_file):
+    with open(json_file, "w") as f:
+        json.dump(summary, f, indent=1)
+        f.write("\n")
+
+
+def load_summary(stats_file):
+    """
+    Trio summary as a dict from summary_stats.json, or from a
+    summary_stats.txt (converted with summary_from_text).
+    """
+    with open(stats_file) as f:
+        if stats_file.endswith(".json"):
+            return json.load(f)
+        return summary_from_text(f.read())
+
+
+# -------------------------------------------------------------------
+# 3. WRITING THE SCRIPT.SH OUTPUT FILES
+# -------------------------------------------------------------------
+def _summary_lines(batch, mask):
+    gt = batch["gt"][mask]
+    cols = zip(
+        batch["chrom"][mask], batch["pos"][mask], batch["end"][mask],
+        batch["svtype"][mask], batch["length"][mask],
+        batch["pe"][mask], batch["sr"][mask],
+        gt[:, 0], gt[:, 1], gt[:, 2],
+    )
+    return "".join("\t".join(map(str, row)) + "\n" for row in cols)
+
+
+def _avinput_lines(batch, mask):
+    cols = zip(batch["chrom"][mask], batch["pos"][mask],
+               batch["end"][mask], batch["svtype"][mask])
+    return "".join(f"{c}\t{p}\t{e}\tN\t<{t}>\n" for c, p, e, t in cols)
+
+
+def process_chunk(lines, samples):
+    """
+    Parses one chunk and returns its partial TrioStats plus the text of every
+    output table for that chunk: {table: (summary_txt_lines, avinput_lines)}.
+    Runs unchanged in a worker process.
+    """
+    stats = TrioStats(samples)
+    batch = parse_records(lines, len(samples))
+    masks = stats.update(batch)
+
+    texts = {
+        name: (_summary_lines(batch, mask), _avinput_lines(batch, mask))
+        for name, mask in masks.items()
+    }
+    return stats, texts
+
+
+def _ordered_map(executor, fn, items, window):
+    """
+    executor.map that yields results in input order but keeps at most
+    `window` chunks in flight, so the reader never runs far ahead.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_trio_outputs(vcf_file, output_dir="output", avinput_dir=".",
+                       chunk_size=CHUNK_SIZE, workers=1, on_chunk=None):
+    """
+    Streams the VCF and writes the same files as `awk -f script.sh`:
+
+        <output_dir>/SV_summary.txt
+        <output_dir>/denovo_variants_precise.txt
+        <output_dir>/denovo_variants_imprecise.txt
+        <output_dir>/summary_stats.txt
+        <output_dir>/summary_stats.json   (same statistics, see TrioStats.to_dict)
+        <avinput_dir>/SV_summary.avinput
+        <avinput_dir>/denovo_variants_precise.avinput
+        <avinput_dir>/denovo_variants_imprecise.avinput
+
+    workers > 1 parses the chunks in a process pool. Each chunk produces
+    partial counters and partial tables; they are merged back in file order,
+    so the output is identical to a single-process run.
+
+    on_chunk: optional function called with the {table: (txt, avinput)}
+    texts of every chunk once they are written, in file order (streaming.py
+    hands them on to annotation while the rest of the VCF is parsed).
+
+    Returns the TrioStats.
+    """
+    samples = vcf_samples(vcf_file)
+    stats = TrioStats(samples)
+    sample_cols = [f"sample{i + 1}_{name}" for i, name in enumerate(stats.samples)]
+
+    os.makedirs(output_dir, exist_ok=True)
+    print("=== PROCESSING STARTED ===")
+
+    tables = {
+        "called": (os.path.join(output_dir, "SV_summary.txt"),
+                   os.path.join(avinput_dir, "SV_summary.avinput"),
+                   SUMMARY_HEADER),
+        "denovo_precise": (os.path.join(output_dir, "denovo_variants_precise.txt"),
+                           os.path.join(avinput_dir, "denovo_variants_precise.avinput"),
+                           SUMMARY_HEADER),
+        "denovo_imprecise": (os.path.join(output_dir, "denovo_variants_imprecise.txt"),
+                             os.path.join(avinput_dir, "denovo_variants_imprecise.avinput"),
+                             IMPRECISE_HEADER),
+    }
+
+    chunks = read_record_chunks(vcf_file, chunk_size)
+    work = partial(process_chunk, samples=samples)
+
+    handles = {}
+    executor = None
+    try:
+        for name, (txt, avinput, header) in tables.items():
+            handles[name] = (open(txt, "w"), open(avinput, "w"))
+            handles[name][0].write("\t".join(header + sample_cols) + "\n")
+            # script.sh starts every .avinput with an empty line
+            handles[name][1].write("\n")
+
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = _ordered_map(executor, work, chunks, window=2 * workers)
+        else:
+            results = map(work, chunks)
+
+        for part, texts in results:
+            stats.merge(part)
+            for name, (txt_out, avinput_out) in handles.items():
+                txt_out.write(texts[name][0])
+                avinput_out.write(texts[name][1])
+            if on_chunk is not None:
+                on_chunk(texts)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        for txt_out, avinput_out in handles.values():
+            txt_out.close()
+            avinput_out.close()
+
+    with open(os.path.join(output_dir, "summary_stats.txt"), "w") as f:
+        f.write(stats.to_text())
+    write_summary_json(stats.to_dict(), os.path.join(output_dir, "summary_stats.json"))
+
+    stats.print_summary()
+    print("\n=== OUTPUT GENERATED ===")
+    for txt, avinput, _ in tables.values():
+        print(txt)
+        print(avinput)
+    print(os.path.join(output_dir, "summary_stats.txt"))
+    print(os.path.join(output_dir, "summary_stats.json"))
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming Delly VCF parser")
+    parser.add_argument("vcf", help="Delly VCF (plain, .gz or bgzip)")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--avinput-dir", default=".")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse chunks in this many processes")
+    args = parser.parse_args()
+
+    write_trio_outputs(args.vcf, args.output_dir, args.avinput_dir,
+                       chunk_size=args.chunk_size, workers=args.workers)
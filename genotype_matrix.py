@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Genotype matrix engine for joint-called VCFs with any number of samples.
+
+GT strings are encoded once per batch into an int8 matrix (variants x samples):
+
+    -1 missing (./.)    0 hom-ref (0/0)    1 het (0/1)    2 hom-alt (1/1)
+
+and every trio statistic is computed on that matrix in one vectorised pass:
+
+    - Mendelian-violation counts for every (child, parent1, parent2) assignment
+    - de novo masks (both parents 0/0, child carries the ALT)
+    - chrX heterozygosity per trio, counted as in script.sh: PRECISE records
+      on which all three trio members are called (no ./.)
+    - chrX heterozygosity per sample: every PRECISE record on which that
+      sample is called, whatever the other samples are (not a script.sh count)
+
+Trios come either from a PED file (several families in one VCF) or, when no
+pedigree is known, from every candidate assignment of the samples, so the
+child of an unlabelled trio can be identified the way script.sh does it.
+"""
+import argparse
+import os
+from itertools import combinations
+
+import numpy as np
+
+from delly_parser import CHUNK_SIZE, read_vcf_batches, vcf_samples
+
+
+MISSING, HOM_REF, HET, HOM_ALT = -1, 0, 1, 2
+
+
+# -------------------------------------------------------------------
+# 1. ENCODING GENOTYPES
+# -------------------------------------------------------------------
+def _gt_code(gt):
+    alleles = gt.replace("|", "/").split("/")
+    if any(a in (".", "") for a in alleles):
+        return MISSING
+    alt = sum(a != "0" for a in alleles)
+    if alt == 0:
+        return HOM_REF
+    if alt == len(alleles):
+        return HOM_ALT
+    return HET
+
+
+def encode_genotypes(gt):
+    """
+    (variants x samples) array of GT strings -> int8 matrix.
+    Only the distinct GT strings of the batch are decoded in Python.
+    """
+    gt = np.asarray(gt, dtype=object)
+    if gt.size == 0:
+        return np.empty(gt.shape, dtype=np.int8)
+
+    uniques, inverse = np.unique(gt, return_inverse=True)
+    codes = np.array([_gt_code(g) for g in uniques], dtype=np.int8)
+    return codes[inverse].reshape(gt.shape)
+
+
+# -------------------------------------------------------------------
+# 2. TRIOS AND MENDELIAN RULES
+# -------------------------------------------------------------------
+def _violation_table():
+    """
+    table[p1 + 1, p2 + 1, child + 1] is True when the child's genotype
+    cannot be inherited from the two parents. Any missing genotype -> False.
+    """
+    transmits = {HOM_REF: (0,), HET: (0, 1), HOM_ALT: (1,)}
+    table = np.zeros((4, 4, 4), dtype=bool)
+    for p1, p2, child in np.ndindex(3, 3, 3):
+        possible = {a + b for a in transmits[p1] for b in transmits[p2]}
+        table[p1 + 1, p2 + 1, child + 1] = child not in possible
+    return table
+
+
+VIOLATION = _violation_table()
+
+
+def candidate_trios(n_samples):
+    """
+    Every (child, parent1, parent2) assignment of n samples, parent1 < parent2.
+    n * (n-1)(n-2)/2 rows, so use a pedigree for large cohorts.
+    """
+    trios = [
+        (child, p1, p2)
+        for child in range(n_samples)
+        for p1, p2 in combinations([s for s in range(n_samples) if s != child], 2)
+    ]
+    return np.array(trios, dtype=np.int64).reshape(-1, 3)
+
+
+def read_ped(ped_file):
+    """
+    Trios from a PED file (family, individual, father, mother, sex, phenotype).
+    Individuals without both parents are skipped.
+    Returns a list of (family, child, father, mother).
+    """
+    trios = []
+    with open(ped_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#") or len(fields) < 4:
+                continue
+            family, child, father, mother = fields[:4]
+            if father != "0" and mother != "0":
+                trios.append((family, child, father, mother))
+    return trios
+
+
+def trio_indices(samples, ped_trios):
+    """
+    Maps PED trios onto VCF sample columns -> (families, T x 3 index array).
+    Trios with a member missing from the VCF are skipped.
+    """
+    column = {name: i for i, name in enumerate(samples)}
+    families, trios = [], []
+    for family, child, father, mother in ped_trios:
+        if child in column and father in column and mother in column:
+            families.append(family)
+            trios.append((column[child], column[father], column[mother]))
+    return families, np.array(trios, dtype=np.int64).reshape(-1, 3)
+
+
+def mendelian_violations(G, trios):
+    """(variants x trios) mask of Mendelian violations."""
+    child, p1, p2 = G[:, trios[:, 0]], G[:, trios[:, 1]], G[:, trios[:, 2]]
+    return VIOLATION[p1 + 1, p2 + 1, child + 1]
+
+
+def denovo_masks(G, trios):
+    """
+    (variants x trios) mask of de novo calls: both parents 0/0 and the child
+    het or hom-alt. For a trio this is exactly script.sh's de novo rule and,
+    per candidate child, its "deviation" count.
+    """
+    child, p1, p2 = G[:, trios[:, 0]], G[:, trios[:, 1]], G[:, trios[:, 2]]
+    return (p1 == HOM_REF) & (p2 == HOM_REF) & ((child == HET) | (child == HOM_ALT))
+
+
+# -------------------------------------------------------------------
+# 3. ACCUMULATING OVER THE WHOLE VCF
+# -------------------------------------------------------------------
+class GenotypeStats:
+    """
+    Per-trio and per-sample counters accumulated batch by batch.
+
+    trios: T x 3 array of (child, parent1, parent2) sample columns;
+           every candidate assignment when None.
+    """
+
+    def __init__(self, samples, trios=None, families=None):
+        self.samples = list(samples)
+        self.trios = candidate_trios(len(samples)) if trios is None else trios
+        self.families = families or [
+            f"trio{i + 1}" for i in range(len(self.trios))
+        ]
+
+        self.violations = np.zeros(len(self.trios), dtype=np.int64)
+        self.denovo = np.zeros(len(self.trios), dtype=np.int64)
+        self.x_called = np.zeros(len(samples), dtype=np.int64)
+        self.x_het = np.zeros(len(samples), dtype=np.int64)
+        # per trio, columns (child, parent1, parent2), script.sh's records only
+        self.trio_x_total = np.zeros(len(self.trios), dtype=np.int64)
+        self.trio_x_het = np.zeros((len(self.trios), 3), dtype=np.int64)
+
+    def update(self, batch):
+        """
+        Adds one delly_parser batch and returns its (variants x trios)
+        de novo mask.
+        """
+        G = encode_genotypes(batch["gt"])
+
+        self.violations += mendelian_violations(G, self.trios).sum(axis=0)
+        denovo = denovo_masks(G, self.trios)
+        self.denovo += denovo.sum(axis=0)
+
+        on_x = batch["precise"] & (batch["chrom"] == "chrX")
+        self.x_called += (G[on_x] != MISSING).sum(axis=0)
+        self.x_het += (G[on_x] == HET).sum(axis=0)
+
+        # script.sh drops every record with a ./. in the trio
+        members = G[on_x][:, self.trios]
+        complete = (members != MISSING).all(axis=2)
+        self.trio_x_total += complete.sum(axis=0)
+        self.trio_x_het += ((members == HET) & complete[:, :, None]).sum(axis=0)
+
+        return denovo
+
+    def merge(self, other):
+        self.violations += other.violations
+        self.denovo += other.denovo
+        self.x_called += other.x_called
+        self.x_het += other.x_het
+        self.trio_x_total += other.trio_x_total
+        self.trio_x_het += other.trio_x_het
+
+    def sex(self, sample):
+        """
+        FEMALE when the sample has any PRECISE chrX het call. Counted on every
+        record where the sample is called, so it can differ from child_sex.
+        """
+        return "FEMALE" if self.x_het[sample] > 0 else "MALE"
+
+    def child_sex(self, trio):
+        """Sex of a trio's child as script.sh infers it (chrX het on complete-trio records)."""
+        return "FEMALE" if self.trio_x_het[trio, 0] > 0 else "MALE"
+
+    def likely_child(self):
+        """Candidate trio with the fewest de novo-pattern deviations."""
+        return self.trios[int(np.argmin(self.denovo))]
+
+    def to_text(self):
+        s = self.samples
+        lines = ["family\tchild\tparent1\tparent2\tmendelian_violations\tdenovo"
+                 "\tchrX_total\tchrX_het_child\tchrX_het_parent1\tchrX_het_parent2"
+                 "\tchild_sex"]
+        for t, (family, (c, p1, p2), mv, dn) in enumerate(zip(
+                self.families, self.trios, self.violations, self.denovo)):
+            het = "\t".join(str(h) for h in self.trio_x_het[t])
+            lines.append(f"{family}\t{s[c]}\t{s[p1]}\t{s[p2]}\t{mv}\t{dn}"
+                         f"\t{self.trio_x_total[t]}\t{het}\t{self.child_sex(t)}")
+
+        lines += ["", "sample\tchrX_called\tchrX_het\tsex"]
+        for i, name in enumerate(s):
+            lines.append(f"{name}\t{self.x_called[i]}\t{self.x_het[i]}\t{self.sex(i)}")
+        return "\n".join(lines) + "\n"
+
+
+def genotype_stats(vcf_file, ped_file=None, denovo_dir=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams a joint VCF once and returns its GenotypeStats.
+
+    With denovo_dir, every trio also gets its de novo calls written as
+    ANNOVAR input (same rules as script.sh), ready for annotate_sv:
+        <denovo_dir>/<family>_<child>_denovo_variants_precise.avinput
+        <denovo_dir>/<family>_<child>_denovo_variants_imprecise.avinput
+    """
+    samples = vcf_samples(vcf_file)
+    if ped_file is None:
+        stats = GenotypeStats(samples)
+    else:
+        families, trios = trio_indices(samples, read_ped(ped_file))
+        stats = GenotypeStats(samples, trios, families)
+
+    handles = []
+    try:
+        if denovo_dir is not None:
+            os.makedirs(denovo_dir, exist_ok=True)
+            for family, (c, _, _) in zip(stats.families, stats.trios):
+                prefix = os.path.join(denovo_dir, f"{family}_{samples[c]}_denovo_variants")
+                handles.append((open(prefix + "_precise.avinput", "w"),
+                                open(prefix + "_imprecise.avinput", "w")))
+
+        for batch in read_vcf_batches(vcf_file, chunk_size, n_samples=len(samples)):
+            denovo = stats.update(batch)
+            if not handles:
+                continue
+
+            reads = batch["precise"] | batch["imprecise"]
+            for t, (precise_out, imprecise_out) in enumerate(handles):
+                for out, mask in ((precise_out, denovo[:, t] & batch["precise"]),
+                                  (imprecise_out, denovo[:, t] & reads)):
+                    out.writelines(
+                        f"{c}\t{p}\t{e}\tN\t<{sv}>\n" for c, p, e, sv in zip(
+                            batch["chrom"][mask], batch["pos"][mask],
+                            batch["end"][mask], batch["svtype"][mask])
+                    )
+    finally:
+        for precise_out, imprecise_out in handles:
+            precise_out.close()
+            imprecise_out.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genotype matrix trio statistics")
+    parser.add_argument("vcf", help="joint-called Delly VCF (plain, .gz or bgzip)")
+    parser.add_argument("--ped", help="PED file with the trios; all candidate "
+                                      "assignments are scored when omitted")
+    parser.add_argument("--denovo-dir", help="write per-trio de novo .avinput files here")
+    parser.add_argument("--output", default="output/genotype_stats.tsv")
+    args = parser.parse_args()
+
+    stats = genotype_stats(args.vcf, args.ped, args.denovo_dir)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(stats.to_text())
+    print(f"{args.output} is saved.")
+
+    if args.ped is None:
+        c, p1, p2 = stats.likely_child()
+        print(f"Likely child: {stats.samples[c]} "
+              f"(parents {stats.samples[p1]}, {stats.samples[p2]})")
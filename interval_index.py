@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# 1. READING REFERENCE BED FILES
+# -------------------------------------------------------------------
+def read_bed(bed_file):
+    """
+    Reads a reference BED file (chrom, start, end, extra columns...)
+    with every column kept as text, then converts start/end to integers.
+
+    Header lines ("#chrom start end gene", "chrom start end ...") are
+    dropped the same way bedtools skips them: any line whose start
+    is not a number is not an interval. An empty file is a BED with no
+    intervals (bedtools finds no overlaps in it either).
+    """
+    try:
+        bed = pd.read_csv(bed_file, sep="\t", header=None, dtype=str)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame({0: pd.Series(dtype=str),
+                             1: pd.Series(dtype=np.int64),
+                             2: pd.Series(dtype=np.int64)})
+
+    is_interval = pd.to_numeric(bed[1], errors="coerce").notna()
+    bed = bed[is_interval].reset_index(drop=True)
+
+    bed[1] = bed[1].astype(np.int64)
+    bed[2] = bed[2].astype(np.int64)
+    return bed
+
+
+# -------------------------------------------------------------------
+# 2. INTERVAL INDEX
+# -------------------------------------------------------------------
+class IntervalIndex:
+    """
+    In-process replacement for `bedtools intersect -wa -wb`.
+
+    For every chromosome the reference intervals are kept as NumPy arrays
+    sorted by start, together with the running maximum of their ends.
+    A query interval [qs, qe) can only hit the sorted block
+        first index where max_end > qs   ...   last index where start < qe
+    so all SVs are answered in one batch with searchsorted.
+
+    Overlap semantics follow bedtools on BED coordinates (half-open, 0-based):
+        ref.start < sv.end  and  sv.start0 < ref.end
+    """
+
+    def __init__(self, bed):
+        self.table = bed.reset_index(drop=True)
+        self.tracks = {}
+
+        starts = self.table[1].to_numpy(dtype=np.int64)
+        ends = self.table[2].to_numpy(dtype=np.int64)
+
+        for chrom, rows in self.table.groupby(0, sort=False).indices.items():
+            rows = rows[np.argsort(starts[rows], kind="stable")]
+            self.tracks[chrom] = (
+                starts[rows],
+                ends[rows],
+                np.maximum.accumulate(ends[rows]),
+                rows,
+            )
+
+    @classmethod
+    def from_bed(cls, bed_file):
+        return cls(read_bed(bed_file))
+
+    def query(self, chroms, starts, ends):
+        """
+        Batch query. Returns two aligned arrays (query_rows, ref_rows),
+        one entry per overlapping pair, ordered by query then by
+        position of the reference line in its BED file.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        query_hits = [np.empty(0, dtype=np.int64)]
+        ref_hits = [np.empty(0, dtype=np.int64)]
+
+        by_chrom = pd.DataFrame({"chrom": np.asarray(chroms)}).groupby("chrom", sort=False)
+        for chrom, q in by_chrom.indices.items():
+            if chrom not in self.tracks:
+                continue
+            t_starts, t_ends, t_max_end, t_rows = self.tracks[chrom]
+
+            lo = np.searchsorted(t_max_end, starts[q], side="right")
+            hi = np.searchsorted(t_starts, ends[q], side="left")
+            counts = np.maximum(hi - lo, 0)
+
+            # expanding every query into its candidate block [lo, hi)
+            q_rep = np.repeat(q, counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pos = np.repeat(lo, counts) + offsets
+
+            keep = t_ends[pos] > starts[q_rep]
+            query_hits.append(q_rep[keep])
+            ref_hits.append(t_rows[pos[keep]])
+
+        query_rows = np.concatenate(query_hits)
+        ref_rows = np.concatenate(ref_hits)
+
+        order = np.lexsort((ref_rows, query_rows))
+        return query_rows[order], ref_rows[order]
+
+    def take(self, ref_rows):
+        """Reference BED rows (all columns) for the given row numbers."""
+        return self.table.iloc[ref_rows].reset_index(drop=True)
+
+    def intersect(self, sv_bed, cols):
+        """
+        Same table as reading `bedtools intersect -a sv_bed -b ref -wa -wb`
+        back with pandas: the SV BED columns followed by the reference
+        BED columns, named by cols.
+
+        sv_bed: DataFrame whose first three columns are chrom, start0, end.
+        """
+        query_rows, ref_rows = self.query(
+            sv_bed.iloc[:, 0], sv_bed.iloc[:, 1], sv_bed.iloc[:, 2]
+        )
+
+        hits = pd.concat([
+            sv_bed.iloc[query_rows].reset_index(drop=True),
+            self.take(ref_rows),
+        ], axis=1)
+        if hits.shape[1] != len(cols):
+            # empty reference: no hits and no extra columns to name
+            return pd.DataFrame(columns=cols)
+        hits.columns = cols
+        return hits
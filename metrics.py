@@ -0,0 +1,209 @@
+"""
+Per-stage instrumentation.
+
+    with measure("annotate", rows_in=len(df)) as m:
+        ...
+        m["rows_out"] = len(annotated)
+
+records wall and CPU time (including commands run with subprocess), peak RSS,
+bytes read and written, and rows in/out of the block. Blocks nest (a stage
+and its steps); every record keeps the name of the block it ran in.
+write_metrics() saves all records as JSON.
+
+With enable_profiling(directory), every top-level block of the main thread
+is also run under cProfile and dumped to <directory>/<name>.prof (view with
+`python -m pstats` or snakeviz).
+
+Peak RSS and bytes come from /proc on Linux (the peak is reset per block);
+elsewhere the peak is the process peak so far and bytes are not recorded.
+The peak can only be reset for the whole process, so it is not reset while
+blocks are open in other threads (streaming.py's stages). Blocks that
+overlapped a block of another thread get "peak_rss_scope": "process": their
+peak is the process peak over the block, other threads included.
+"""
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+METRICS_VERSION = 1
+
+_records = []
+_profile_dir = None
+
+# open blocks, per thread (blocks measured in different threads do not nest)
+_local = threading.local()
+
+# thread id -> its open blocks, to see whether other threads are measuring
+_stacks = {}
+_stacks_lock = threading.Lock()
+
+
+def _open_blocks():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+        with _stacks_lock:
+            _stacks[threading.get_ident()] = _local.stack
+    return _local.stack
+
+
+# -------------------------------------------------------------------
+# 1. READING THE PROCESS COUNTERS
+# -------------------------------------------------------------------
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _io_bytes():
+    """(bytes read, bytes written) by this process so far, or (None, None)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":") for line in f)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _peak_rss_mb():
+    """Peak RSS since the last reset (Linux) or since the process started."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _checkpoint():
+    """
+    Folds the current peak into every open block, then starts a new peak,
+    unless blocks are open in other threads: a reset would wipe their peak.
+    """
+    peak = _peak_rss_mb()
+    with _stacks_lock:
+        me = threading.get_ident()
+        others = [s for t, s in _stacks.items() if t != me and s]
+        for frame in _open_blocks():
+            frame["peak"] = max(frame["peak"], peak)
+        if others:
+            for stack in [_open_blocks(), *others]:
+                for frame in stack:
+                    frame["shared"] = True
+            return
+        _reset_peak_rss()
+
+
+# -------------------------------------------------------------------
+# 2. MEASURING BLOCKS
+# -------------------------------------------------------------------
+@contextmanager
+def measure(name, rows_in=None):
+    """
+    Measures the enclosed block. The yielded dict can be given rows_in /
+    rows_out (or any other JSON-able value) while the block runs.
+    """
+    stack = _open_blocks()
+    record = {"name": name, "parent": stack[-1]["record"]["name"] if stack else None}
+    if rows_in is not None:
+        record["rows_in"] = int(rows_in)
+
+    _checkpoint()
+    frame = {"record": record, "peak": 0.0, "shared": False}
+    stack.append(frame)
+
+    # one profiler at a time: cProfile refuses a second one (Python 3.12+)
+    profiler = None
+    if (_profile_dir is not None and len(stack) == 1
+            and threading.current_thread() is threading.main_thread()):
+        profiler = cProfile.Profile()
+
+    read_start, written_start = _io_bytes()
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = _cpu_seconds() - cpu_start
+        read_end, written_end = _io_bytes()
+
+        _checkpoint()
+        stack.pop()
+
+        record["wall_seconds"] = round(wall, 4)
+        record["cpu_seconds"] = round(cpu, 4)
+        record["peak_rss_mb"] = round(frame["peak"], 1)
+        if frame["shared"]:
+            record["peak_rss_scope"] = "process"
+        if read_start is not None and read_end is not None:
+            record["bytes_read"] = read_end - read_start
+            record["bytes_written"] = written_end - written_start
+        _records.append(record)
+
+        if profiler is not None:
+            os.makedirs(_profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(_profile_dir, f"{name}.prof"))
+
+
+def enable_profiling(profile_dir):
+    """cProfile every top-level block into profile_dir (None switches it off)."""
+    global _profile_dir
+    _profile_dir = profile_dir
+
+
+def reset():
+    """Forgets all records and open blocks (e.g. inherited by a forked worker)."""
+    _records.clear()
+    _open_blocks().clear()
+
+
+def take_records():
+    """Returns and clears the records of this process (e.g. in a pool worker)."""
+    taken = list(_records)
+    _records.clear()
+    return taken
+
+
+def add_records(records):
+    """
+    Adds records measured in another process; top-level ones are attached
+    to the block that is currently open here.
+    """
+    stack = _open_blocks()
+    parent = stack[-1]["record"]["name"] if stack else None
+    for record in records:
+        if record["parent"] is None:
+            record["parent"] = parent
+        _records.append(record)
+
+
+def write_metrics(metrics_file):
+    os.makedirs(os.path.dirname(metrics_file) or ".", exist_ok=True)
+    with open(metrics_file, "w") as f:
+        json.dump({
+            "version": METRICS_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "records": _records,
+        }, f, indent=1)
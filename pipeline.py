@@ -1,25 +1,153 @@
+#!/usr/bin/env python3
+"""
+Delly trio SV pipeline.
+
+    python3 pipeline.py run [--only annotate ...] [--force]   all stages (the default)
+    python3 pipeline.py parse    --vcf calls.vcf [--parser awk]
+    python3 pipeline.py annotate [--backend index] [--input x.avinput --output x.csv]
+    python3 pipeline.py filter
+    python3 pipeline.py plot     [--plot-dir plots] [--workers 4]
+    python3 pipeline.py stream   [--backend index]      parse/annotate/filter overlapped
+    python3 pipeline.py clinvar  [--clinvar-txt clinvar_SV.txt]   rebuild the ClinVar track
+
+Every path below can be set on the command line. pandas, matplotlib and
+seaborn are only imported by the stages that use them, and importing this
+module has no side effects.
+"""
+import argparse
+import os
 import subprocess
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib.gridspec as gridspec
-import sv_plot as svp
+
+from metrics import enable_profiling, measure, write_metrics
+from stage_runner import Stage, StageRunner
 
 
 #===========CONFIGURATION=============
 
 # Delly VCF parsing script (.sh wrapper that calls awk)
-DELLY_SCRIPT = "script.sh"            
+DELLY_SCRIPT = "script.sh"
+
+# VCF parser: "python" (streaming delly_parser.py) or "awk" (script.sh)
+PARSER = "python"
 
-# Input VCF
+# Processes used by the python parser (chunks are merged back in file order)
+PARSER_WORKERS = 1
+
+# Input VCF (plain, .gz or bgzip with the python parser)
 VCF_FILE = "DellyVariation.vcf"
 
+# Table format of the annotated outputs: ".csv", ".parquet", ".feather" or
+# ".tsv.gz" (columnar formats need pyarrow; CSV stays available as an export;
+# .tsv.gz is coordinate-sorted BGZF with a tabix index, see bgzf.py)
+TABLE_EXT = ".csv"
+TABLE_EXTS = [".csv", ".parquet", ".feather", ".arrow", ".tsv.gz"]
+
+# Folder of the PNGs written by sv_plot
+PLOT_DIR = "plots"
+
+# Aggregates the plots are drawn from (sv_stats; mergeable across families)
+PLOT_STATS_DIR = "output/plot_stats"
+
+# Processes used to render the plots
+PLOT_WORKERS = 1
+
+# Annotation backend of annotate_sv: "bedtools", "index" or "cache"
+ANNOTATION_BACKEND = "bedtools"
+
+# Annotate in chunks of this many SVs to cap memory on very large call sets
+# (None = whole table in memory, with the de novo subsets joined onto it)
+ANNOTATION_CHUNK_SIZE = None
+
+# Persistent annotation cache shared across runs (annotation_cache.py), e.g.
+# "annotation_cache.sqlite"; only SVs not annotated before are computed
+ANNOTATION_CACHE = None
+
+# Reference BED files
+GENE_BED = "hg38_refGene.bed"
+EXON_BED = "hg38_exons.bed"
+
+# Raw ClinVar export and the unified track built from it (clinvar_track.py):
+# classification, condition and pathogenicity rank in one BED, one overlap query.
+# Only CLINVAR_TRACK is (re)built by the pipeline; any other CLINVAR_BED
+# (--clinvar-bed) is a read-only input
+CLINVAR_TXT = "annovar/humandb/clinvar_SV.txt"
+CLINVAR_TRACK = "clinvar_SV.track.bed"
+CLINVAR_BED = CLINVAR_TRACK
+
+# Separate condition BED of the old two-BED ClinVar layout
+# (e.g. clinvar_SV.bed + clinvar_SV_condition.bed); None = CLINVAR_BED is the track
+CLINVAR_CONDITION_BED = None
+
 # AVINPUT files produced by AWK
 ALL_AVINPUT = "SV_summary.avinput"
 DENOVO_AVINPUT_PRECISE = "denovo_variants_precise.avinput"
 DENOVO_AVINPUT_IMPRECISE = "denovo_variants_imprecise.avinput"
 
+# Trio text tables written next to the AVINPUT files
+TRIO_TXT = "output/SV_summary.txt"
+DENOVO_PRECISE_TXT = "output/denovo_variants_precise.txt"
+DENOVO_IMPRECISE_TXT = "output/denovo_variants_imprecise.txt"
+
+# bgzip + tabix-index the trio text tables and AVINPUT files after parsing
+# (coordinate-sorted <file>.gz + <file>.gz.tbi; annotation reads them as is)
+BGZIP_TRIO_OUTPUTS = False
+TRIO_OUTPUTS = ["ALL_AVINPUT", "DENOVO_AVINPUT_PRECISE", "DENOVO_AVINPUT_IMPRECISE",
+                "TRIO_TXT", "DENOVO_PRECISE_TXT", "DENOVO_IMPRECISE_TXT"]
+
+# Trio summary statistics (text as script.sh writes it, and JSON for the plots)
+SUMMARY_STATS_TXT = "output/summary_stats.txt"
+SUMMARY_STATS = "output/summary_stats.json"
+
+# Content hashes of every stage's inputs/outputs (for skipping unchanged stages)
+MANIFEST_FILE = "output/.pipeline_manifest.json"
+
+# Time / CPU / peak memory / rows / bytes of every stage and step of the last run
+METRICS_FILE = "output/pipeline_metrics.json"
+
+# Output tables
+SV_ANNOTATED = "output/SV_summary_annotated" + TABLE_EXT
+DENOVO_PRECISE_ANNOTATED = "output/denovo_variants_precise_annotated" + TABLE_EXT
+DENOVO_IMPRECISE_ANNOTATED = "output/denovo_variants_imprecise_annotated" + TABLE_EXT
+SV_EXONIC = "output/SV_summary_annotated_exonic" + TABLE_EXT
+SV_PATHLINK = "output/SV_summary_annotated_pathLink" + TABLE_EXT
+
+# Region / gene query store of the annotated SVs (sv_store.py)
+SV_STORE = "output/SV_summary_annotated.store"
+
+TABLE_OUTPUTS = ["SV_ANNOTATED", "DENOVO_PRECISE_ANNOTATED", "DENOVO_IMPRECISE_ANNOTATED",
+                 "SV_EXONIC", "SV_PATHLINK"]
+
+# Paths that move into a folder with set_output_dir (batch.py: one per family)
+OUTPUT_PATHS = ["ALL_AVINPUT", "DENOVO_AVINPUT_PRECISE", "DENOVO_AVINPUT_IMPRECISE",
+                "TRIO_TXT", "DENOVO_PRECISE_TXT", "DENOVO_IMPRECISE_TXT",
+                "SUMMARY_STATS_TXT", "SUMMARY_STATS", "MANIFEST_FILE", "METRICS_FILE",
+                *TABLE_OUTPUTS, "SV_STORE", "PLOT_DIR", "PLOT_STATS_DIR"]
+_DEFAULT_PATHS = {name: globals()[name] for name in OUTPUT_PATHS}
+
+# Tables produced during this run, handed to later stages without re-reading
+_tables = {}
+
+
+def set_output_dir(output_dir):
+    """
+    Puts every output (AVINPUT files, output/, plots/, the stage manifest)
+    under output_dir, or back in the working directory for None. Call
+    configure() afterwards: the table format and --bgzip apply on top.
+    Only the python parser follows it (script.sh writes fixed paths).
+    """
+    for name in OUTPUT_PATHS:
+        path = _DEFAULT_PATHS[name]
+        globals()[name] = os.path.join(output_dir, path) if output_dir else path
+    _tables.clear()
+
+
+def table(path):
+    if path not in _tables:
+        from table_io import read_table
+        _tables[path] = read_table(path)
+    return _tables[path]
+
 
 #=============Python to Terminal====================
 
@@ -33,72 +161,516 @@ def run_cmd(cmd, label):
         sys.exit(1)
 
 
-#==============1. RUNNING AWK DELLY-PIPELINE=========================
+#==============1. PARSING THE DELLY VCF=========================
+
+def parse_vcf():
+    with measure("parse") as m:
+        if PARSER == "awk":
+            from delly_parser import load_summary, write_summary_json
+
+            run_cmd(
+                ["awk", "-f", DELLY_SCRIPT, VCF_FILE],
+                "===Running AWK==="
+            )
+            # script.sh only writes the text summary
+            write_summary_json(load_summary(SUMMARY_STATS_TXT), SUMMARY_STATS)
+            print(f"{SUMMARY_STATS} is saved.")
+        else:
+            from delly_parser import write_trio_outputs
+
+            print("\n===Parsing Delly VCF (streaming)===")
+            stats = write_trio_outputs(
+                VCF_FILE,
+                output_dir=os.path.dirname(TRIO_TXT),
+                avinput_dir=os.path.dirname(ALL_AVINPUT) or ".",
+                workers=PARSER_WORKERS,
+            )
+            m["rows_in"] = stats.total
+            m["rows_out"] = sum(stats.type_counts.values())
+
+        if BGZIP_TRIO_OUTPUTS:
+            bgzip_trio_outputs()
+
+
+def bgzip_trio_outputs():
+    """Replaces the parsed text tables by sorted, tabix-indexed <file>.gz."""
+    from bgzf import bgzip_file
+
+    with measure("bgzip"):
+        for name in TRIO_OUTPUTS:
+            path = globals()[name]
+            # the header line (column names, or the blank first AVINPUT line) stays on top
+            bgzip_file(path[:-len(".gz")], path, skip=1, keep=False)
+            print(f"{path} is saved.")
+
+
+#==============1b. BUILDING THE CLINVAR TRACK=========================
 
-run_cmd(
-    ["awk", "-f", DELLY_SCRIPT, VCF_FILE],
-    "===Running AWK==="
-)
+def builds_clinvar_track():
+    """True when the ClinVar reference is the pipeline's own track (not a --clinvar-bed file)."""
+    return CLINVAR_BED == CLINVAR_TRACK and CLINVAR_CONDITION_BED is None
 
-#=====================2. ANNOTATING USING BEDTOOLS==========================
 
-from annotate_sv import annotate_sv
+def clinvar():
+    from clinvar_track import build_track
 
-print("\n===Annotating SV_summary.avinput using BEDTools===")
-annotate_sv("SV_summary.avinput", "output/SV_summary_annotated.csv")
+    print(f"\n===Building {CLINVAR_TRACK} from {CLINVAR_TXT}===")
+    with measure("clinvar") as m:
+        m["rows_out"] = build_track(CLINVAR_TXT, CLINVAR_TRACK)
 
-print("\n===Annotating denovo_variants_precise.avinput using BEDTools===")
-annotate_sv("denovo_variants_precise.avinput", "output/denovo_variants_precise_annotated.csv")
 
-print("\n===Annotating denovo_variants_imprecise.avinput using BEDTools===")
-annotate_sv("denovo_variants_imprecise.avinput", "output/denovo_variants_imprecise_annotated.csv")
+#=====================2. ANNOTATING (BEDTOOLS / INDEX / CACHE)==========================
+
+def annotate():
+    from annotate_sv import annotate_sv_batch
+
+    if ANNOTATION_CHUNK_SIZE:
+        return annotate_chunked()
+
+    # the de novo files are subsets of SV_summary.avinput: annotated once,
+    # then joined on (chrom, start, end, alt)
+    print(f"\n===Annotating {ALL_AVINPUT} (+ de novo subsets) using {ANNOTATION_BACKEND}===")
+    with measure("annotate") as m:
+        annotated = annotate_sv_batch(
+            ALL_AVINPUT, SV_ANNOTATED,
+            {
+                DENOVO_AVINPUT_PRECISE: DENOVO_PRECISE_ANNOTATED,
+                DENOVO_AVINPUT_IMPRECISE: DENOVO_IMPRECISE_ANNOTATED,
+            },
+            gene_bed=GENE_BED,
+            exon_bed=EXON_BED,
+            clinvar_bed=CLINVAR_BED,
+            clinvar_condition_bed=CLINVAR_CONDITION_BED,
+            backend=ANNOTATION_BACKEND,
+            annotation_cache=ANNOTATION_CACHE,
+        )
+        # one annotated row per AVINPUT record
+        m["rows_in"] = m["rows_out"] = len(annotated[SV_ANNOTATED])
+        write_store(annotated[SV_ANNOTATED])
+    _tables.update(annotated)
+
+
+def annotate_chunked():
+    from annotate_sv import annotate_sv_chunked
+
+    print(f"\n===Annotating {ALL_AVINPUT} in chunks of {ANNOTATION_CHUNK_SIZE} SVs "
+          f"using {ANNOTATION_BACKEND}===")
+    with measure("annotate") as m:
+        for avinput, output in [
+            (ALL_AVINPUT, SV_ANNOTATED),
+            (DENOVO_AVINPUT_PRECISE, DENOVO_PRECISE_ANNOTATED),
+            (DENOVO_AVINPUT_IMPRECISE, DENOVO_IMPRECISE_ANNOTATED),
+        ]:
+            rows = annotate_sv_chunked(
+                avinput, output,
+                gene_bed=GENE_BED,
+                exon_bed=EXON_BED,
+                clinvar_bed=CLINVAR_BED,
+                clinvar_condition_bed=CLINVAR_CONDITION_BED,
+                backend=ANNOTATION_BACKEND,
+                chunk_size=ANNOTATION_CHUNK_SIZE,
+                annotation_cache=ANNOTATION_CACHE,
+                # the store is built from the annotated chunks, not the whole table
+                store_dir=SV_STORE if output == SV_ANNOTATED else None,
+            )
+            if output == SV_ANNOTATED:
+                m["rows_in"] = m["rows_out"] = rows
+
+
+def write_store(annotated):
+    """
+    Region / gene query store of the annotated SVs held in memory (the
+    chunked and streamed runs build it from their chunks instead).
+    """
+    from sv_store import build_store
+
+    with measure("build_store") as m:
+        m["rows_out"] = build_store(annotated, SV_STORE)
+    print(f"{SV_STORE} is saved.")
 
 
 
 #=================3. EXTRACTING EXONIC and PATHOGENIC SVs=====================
 
-print("\n=== Extracting EXONIC variants ===")
-sv = pd.read_csv("output/SV_summary_annotated.csv")
-sv_exonic = sv[sv["Function"] == "exonic"]
-sv_exonic.to_csv("output/SV_summary_annotated_exonic.csv", index=False)
-print("output/SV_summary_annotated_exonic.csv is saved.")
-
-print("\n=== Extracting Pathogenic / Likely Pathogenic variants ===")
-sv_path = sv[
-    sv["clinvar_germline_classification"].str.contains(
-        "pathogenic|likely pathogenic",
-        case=False,
-        na=False
-    )
-]
-sv_path.to_csv("output/SV_summary_annotated_pathLink.csv", index=False)
-print("output/SV_summary_annotated_pathLink.csv is saved.")
+def extract_exonic_pathogenic():
+    from annotate_sv import exonic_rows, pathogenic_rows
+    from table_io import write_table
+
+    with measure("filter") as m:
+        # the annotated table is used in memory when annotation ran in this process
+        sv = table(SV_ANNOTATED)
+        m["rows_in"] = len(sv)
+
+        # Function is a categorical (table_io.to_columnar), so == compares integer
+        # codes; the pathogenic SVs are a comparison on the integer ClinVar rank
+        print("\n=== Extracting EXONIC variants ===")
+        sv_exonic = exonic_rows(sv)
+        write_table(sv_exonic, SV_EXONIC)
+        _tables[SV_EXONIC] = sv_exonic
+        print(f"{SV_EXONIC} is saved.")
+
+        print("\n=== Extracting Pathogenic / Likely Pathogenic variants ===")
+        sv_path = pathogenic_rows(sv)
+        write_table(sv_path, SV_PATHLINK)
+        _tables[SV_PATHLINK] = sv_path
+        print(f"{SV_PATHLINK} is saved.")
+        m["rows_out"] = len(sv_exonic) + len(sv_path)
 
 
 #=======================4. RUNNING PLOTS==========================
 
-print("\n=== Generating Plots ===")
-svp.run_all_plots()
+def plots():
+    import sv_plot as svp
+
+    print("\n=== Generating Plots ===")
+    with measure("plots") as m:
+        sv = table(SV_ANNOTATED)
+        m["rows_in"] = len(sv)
+        svp.run_all_plots(tables={
+            "SV_summary_annotated": sv,
+            "denovo_variants_imprecise_annotated": table(DENOVO_IMPRECISE_ANNOTATED),
+            "SV_summary_annotated_exonic": table(SV_EXONIC),
+            "SV_summary_annotated_pathLink": table(SV_PATHLINK),
+        }, workers=PLOT_WORKERS, summary_stats=SUMMARY_STATS, plot_dir=PLOT_DIR,
+           stats_dir=PLOT_STATS_DIR)
+
+    print("\n=== PIPELINE COMPLETED WITH PLOTS ===")
+
+
+#=================STREAMING: 1-3 OVERLAPPED, THEN 4=====================
+
+def stream():
+    """
+    parse -> annotate -> filter / stats with every step on its own thread,
+    chunk by chunk (streaming.py; the store is built from the same chunks),
+    then the plots from the aggregates. Same files as the stages; always runs (no stage manifest),
+    except the ClinVar track, which is only rebuilt when its stage is out of date.
+    """
+    from streaming import stream_trio
+
+    if builds_clinvar_track():
+        StageRunner([clinvar_stage()], MANIFEST_FILE).run()
+
+    print("\n===Streaming: parse -> annotate -> filter / stats===")
+    with measure("stream") as m:
+        stats, trio = stream_trio(
+            VCF_FILE,
+            {
+                "called": SV_ANNOTATED,
+                "denovo_precise": DENOVO_PRECISE_ANNOTATED,
+                "denovo_imprecise": DENOVO_IMPRECISE_ANNOTATED,
+            },
+            SV_EXONIC, SV_PATHLINK,
+            output_dir=os.path.dirname(TRIO_TXT),
+            avinput_dir=os.path.dirname(ALL_AVINPUT) or ".",
+            gene_bed=GENE_BED,
+            exon_bed=EXON_BED,
+            clinvar_bed=CLINVAR_BED,
+            clinvar_condition_bed=CLINVAR_CONDITION_BED,
+            backend=ANNOTATION_BACKEND,
+            chunk_size=ANNOTATION_CHUNK_SIZE,
+            workers=PARSER_WORKERS,
+            annotation_cache=ANNOTATION_CACHE,
+            store_dir=SV_STORE,
+        )
+        m["rows_in"] = trio.total
+        m["rows_out"] = stats["SV_summary_annotated"].rows
+
+    if BGZIP_TRIO_OUTPUTS:
+        bgzip_trio_outputs()
+
+    import sv_plot as svp
+
+    print("\n=== Generating Plots ===")
+    with measure("plots"):
+        svp.run_all_plots(tables=stats, workers=PLOT_WORKERS, summary_stats=SUMMARY_STATS,
+                          plot_dir=PLOT_DIR, stats_dir=PLOT_STATS_DIR)
+
+
+#=======================STAGE GRAPH==========================
+
+def code(name):
+    """Path of one of the pipeline's own modules (a stage input), from any working directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+
+def clinvar_stage():
+    # the track is rebuilt when the ClinVar export (or its builder) changes
+    return Stage(
+        "clinvar", clinvar,
+        inputs=[CLINVAR_TXT, code("clinvar_track.py")],
+        outputs=[CLINVAR_TRACK],
+    )
+
+
+def build_stages(with_clinvar=True):
+    """
+    The stages of a run. with_clinvar=False leaves out the ClinVar track
+    build, for runs that share the references with others (batch.py). It is
+    also left out when CLINVAR_BED is not the pipeline's own track.
+    """
+    parse_outputs = [
+        TRIO_TXT,
+        DENOVO_PRECISE_TXT,
+        DENOVO_IMPRECISE_TXT,
+        SUMMARY_STATS_TXT,
+        SUMMARY_STATS,
+        ALL_AVINPUT,
+        DENOVO_AVINPUT_PRECISE,
+        DENOVO_AVINPUT_IMPRECISE,
+    ]
+    annotated = [SV_ANNOTATED, DENOVO_PRECISE_ANNOTATED, DENOVO_IMPRECISE_ANNOTATED,
+                 SV_STORE]
+
+    stages = [
+        Stage(
+            "parse", parse_vcf,
+            inputs=[VCF_FILE, DELLY_SCRIPT if PARSER == "awk" else code("delly_parser.py"),
+                    *([code("bgzf.py")] if BGZIP_TRIO_OUTPUTS else [])],
+            outputs=parse_outputs,
+            params={"parser": PARSER, "bgzip": BGZIP_TRIO_OUTPUTS},
+        ),
+        Stage(
+            "annotate", annotate,
+            inputs=[ALL_AVINPUT, DENOVO_AVINPUT_PRECISE, DENOVO_AVINPUT_IMPRECISE,
+                    GENE_BED, EXON_BED, CLINVAR_BED,
+                    *([CLINVAR_CONDITION_BED] if CLINVAR_CONDITION_BED else []),
+                    code("annotate_sv.py"), code("sv_store.py"), code("interval_index.py"),
+                    code("reference_cache.py"), code("table_io.py"), code("clinvar_track.py"),
+                    code("annotation_cache.py"), code("bgzf.py")],
+            outputs=annotated,
+            params={"backend": ANNOTATION_BACKEND, "chunk_size": ANNOTATION_CHUNK_SIZE,
+                    "annotation_cache": ANNOTATION_CACHE},
+        ),
+        Stage(
+            "filter", extract_exonic_pathogenic,
+            inputs=[SV_ANNOTATED, code("annotate_sv.py"), code("table_io.py"), code("bgzf.py")],
+            outputs=[SV_EXONIC, SV_PATHLINK],
+        ),
+        Stage(
+            "plots", plots,
+            inputs=[SV_ANNOTATED, DENOVO_IMPRECISE_ANNOTATED, SV_EXONIC, SV_PATHLINK,
+                    SUMMARY_STATS, code("sv_plot.py"), code("sv_stats.py")],
+            outputs=[PLOT_DIR, PLOT_STATS_DIR],
+        ),
+    ]
+    if with_clinvar and builds_clinvar_track():
+        stages.insert(1, clinvar_stage())
+    return stages
+
+
+#=======================COMMAND LINE==========================
+
+# command line option -> configuration constant above
+OPTIONS = {
+    "vcf": "VCF_FILE",
+    "parser": "PARSER",
+    "delly_script": "DELLY_SCRIPT",
+    "parser_workers": "PARSER_WORKERS",
+    "bgzip": "BGZIP_TRIO_OUTPUTS",
+    "table_ext": "TABLE_EXT",
+    "backend": "ANNOTATION_BACKEND",
+    "chunk_size": "ANNOTATION_CHUNK_SIZE",
+    "annotation_cache": "ANNOTATION_CACHE",
+    "gene_bed": "GENE_BED",
+    "exon_bed": "EXON_BED",
+    "clinvar_txt": "CLINVAR_TXT",
+    "clinvar_bed": "CLINVAR_BED",
+    "clinvar_condition_bed": "CLINVAR_CONDITION_BED",
+    "plot_dir": "PLOT_DIR",
+    "plot_workers": "PLOT_WORKERS",
+}
+
+
+def strip_table_ext(path):
+    """output/x.tsv.gz -> output/x (any of TABLE_EXTS; splitext would keep the .tsv)"""
+    for ext in TABLE_EXTS:
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return os.path.splitext(path)[0]
 
-print("\n=== PIPELINE COMPLETED WITH PLOTS ===")
 
+def configure(args):
+    """Overrides the configuration with the options given on the command line."""
+    for option, name in OPTIONS.items():
+        value = getattr(args, option, None)
+        if value is not None:
+            globals()[name] = value
+    # the output tables follow the table format
+    for name in TABLE_OUTPUTS:
+        globals()[name] = strip_table_ext(globals()[name]) + TABLE_EXT
+    if BGZIP_TRIO_OUTPUTS:
+        for name in TRIO_OUTPUTS:
+            if not globals()[name].endswith(".gz"):
+                globals()[name] += ".gz"
+
+
+def build_parser(stage_names):
+    vcf_options = argparse.ArgumentParser(add_help=False)
+    vcf_options.add_argument("--vcf", help=f"Delly VCF (default {VCF_FILE})")
+    vcf_options.add_argument("--parser", choices=["python", "awk"],
+                             help=f"VCF parser (default {PARSER})")
+    vcf_options.add_argument("--delly-script",
+                             help=f"awk script of the awk parser (default {DELLY_SCRIPT})")
+    vcf_options.add_argument("--parser-workers", type=int,
+                             help=f"processes of the python parser (default {PARSER_WORKERS})")
+
+    # parse writes the bgzipped files, annotate reads them
+    trio_options = argparse.ArgumentParser(add_help=False)
+    trio_options.add_argument("--bgzip", action="store_true", default=None,
+                              help="bgzip + tabix-index the trio tables and AVINPUT files")
+
+    table_options = argparse.ArgumentParser(add_help=False)
+    table_options.add_argument("--table-ext", choices=TABLE_EXTS,
+                               help=f"format of the annotated tables (default {TABLE_EXT})")
+
+    annotation_options = argparse.ArgumentParser(add_help=False)
+    annotation_options.add_argument("--backend", choices=["bedtools", "index", "cache"],
+                                    help=f"annotation backend (default {ANNOTATION_BACKEND})")
+    annotation_options.add_argument("--chunk-size", type=int,
+                                    help="annotate in chunks of this many SVs")
+    annotation_options.add_argument("--annotation-cache", metavar="SQLITE",
+                                    help="reuse annotations of earlier runs from this cache file")
+    annotation_options.add_argument("--gene-bed", help=f"default {GENE_BED}")
+    annotation_options.add_argument("--exon-bed", help=f"default {EXON_BED}")
+    annotation_options.add_argument("--clinvar-txt",
+                                    help=f"raw ClinVar export (default {CLINVAR_TXT})")
+    annotation_options.add_argument("--clinvar-bed",
+                                    help=f"unified ClinVar track, read only (default "
+                                         f"{CLINVAR_TRACK}, rebuilt from --clinvar-txt)")
+    annotation_options.add_argument("--clinvar-condition-bed",
+                                    help="condition BED of the two-BED ClinVar layout "
+                                         "(then --clinvar-bed is its classification BED)")
+
+    plot_options = argparse.ArgumentParser(add_help=False)
+    plot_options.add_argument("--plot-dir", help=f"folder of the PNGs (default {PLOT_DIR})")
+    plot_options.add_argument("--plot-workers", type=int,
+                              help=f"processes rendering the plots (default {PLOT_WORKERS})")
+
+    run_options = argparse.ArgumentParser(add_help=False)
+    run_options.add_argument("--metrics",
+                             help=f"stage/step metrics JSON (default {METRICS_FILE})")
+    run_options.add_argument("--profile", metavar="DIR",
+                             help="also write a cProfile dump of every stage to DIR/<stage>.prof")
+
+    parser = argparse.ArgumentParser(
+        description="Delly trio SV pipeline. `run` skips stages whose inputs did not "
+                    "change since the last run; the single-stage commands always run."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser(
+        "run", help="all stages, skipping the ones that are up to date",
+        parents=[vcf_options, trio_options, table_options, annotation_options, plot_options,
+                 run_options])
+    run.add_argument("--only", nargs="+", choices=stage_names,
+                     help="run only these stages, e.g. --only annotate, --only plots")
+    run.add_argument("--force", action="store_true",
+                     help="run the selected stages even if they are up to date")
+
+    commands.add_parser(
+        "stream", help="parse, annotate and filter as one stream of chunks, then plot",
+        parents=[vcf_options, trio_options, table_options, annotation_options, plot_options,
+                 run_options])
+    commands.add_parser("parse", help="parse the Delly VCF into the trio outputs",
+                        parents=[vcf_options, trio_options, run_options])
+    commands.add_parser("clinvar", help="build the ClinVar track from the raw ClinVar export",
+                        parents=[annotation_options, run_options])
+
+    annotate = commands.add_parser(
+        "annotate", help="annotate the AVINPUT files (or one file with --input/--output)",
+        parents=[trio_options, table_options, annotation_options, run_options])
+    annotate.add_argument("--input", help="annotate only this AVINPUT file ...")
+    annotate.add_argument("--output", help="... into this table (.csv/.parquet/.feather/.tsv.gz)")
+
+    commands.add_parser("filter", help="extract the exonic and pathogenic SVs",
+                        parents=[table_options, run_options])
+    commands.add_parser("plot", help="render the plots",
+                        parents=[table_options, plot_options, run_options])
+    return parser
+
+
+def annotate_one(input_file, output_file):
+    """Annotates a single AVINPUT file (no stage bookkeeping, e.g. for job arrays)."""
+    from annotate_sv import annotate_sv, annotate_sv_chunked
+
+    refs = {
+        "gene_bed": GENE_BED,
+        "exon_bed": EXON_BED,
+        "clinvar_bed": CLINVAR_BED,
+        "clinvar_condition_bed": CLINVAR_CONDITION_BED,
+        "backend": ANNOTATION_BACKEND,
+        "annotation_cache": ANNOTATION_CACHE,
+    }
+    if ANNOTATION_CHUNK_SIZE:
+        annotate_sv_chunked(input_file, output_file, chunk_size=ANNOTATION_CHUNK_SIZE, **refs)
+    else:
+        annotate_sv(input_file, output_file, **refs)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    stage_names = [stage.name for stage in build_stages()]
+    command_stages = {"parse": "parse", "clinvar": "clinvar", "annotate": "annotate",
+                      "filter": "filter", "plot": "plots"}
+
+    # `pipeline.py` and `pipeline.py --only ...` still mean `pipeline.py run ...`
+    if not argv or argv[0] not in ["run", "stream", *command_stages, "-h", "--help"]:
+        argv = ["run", *argv]
+
+    parser = build_parser(stage_names)
+    args = parser.parse_args(argv)
+    configure(args)
+    enable_profiling(args.profile)
+
+    if args.command == "clinvar" and not builds_clinvar_track():
+        parser.error(f"clinvar: only {CLINVAR_TRACK} is built here; --clinvar-bed files "
+                     f"are read-only (use clinvar_track.py -o to build another track)")
+
+    if args.command == "annotate" and (args.input or args.output):
+        if not (args.input and args.output):
+            parser.error("annotate: --input and --output go together")
+        with measure("annotate"):
+            annotate_one(args.input, args.output)
+        if args.metrics:
+            write_metrics(args.metrics)
+        return
+
+    metrics_file = args.metrics or METRICS_FILE
+    try:
+        if args.command == "stream":
+            stream()
+        elif args.command == "run":
+            StageRunner(build_stages(), MANIFEST_FILE).run(only=args.only, force=args.force)
+        else:
+            StageRunner(build_stages(), MANIFEST_FILE).run(
+                only=[command_stages[args.command]], force=True
+            )
+    finally:
+        write_metrics(metrics_file)
+        print(f"\nStage metrics written to {metrics_file}")
+
+    if args.command != "run":
+        return
+    #===========DONE==================
 
+    print("\n============================================================")
+    print("FULL PIPELINE COMPLETED")
+    print("============================================================")
+    print("Generated files:")
+    print("1. SV_summary.txt")
+    print("2. SV_summary.avinput")
+    print("3. denovo_variants_precise.txt")
+    print("4. denovo_variants_imprecise.txt")
+    print("5. denovo_variants_precise.avinput")
+    print("6. denovo_variants_imprecise.avinput")
+    print(f"7. {SV_ANNOTATED}")
+    print(f"8. {DENOVO_PRECISE_ANNOTATED}")
+    print(f"9. {DENOVO_IMPRECISE_ANNOTATED}")
+    print(f"10. {SV_EXONIC}")
+    print(f"11. {SV_PATHLINK}")
+    print("============================================================")
 
-#===========DONE==================
 
-print("\n============================================================")
-print("FULL PIPELINE COMPLETED")
-print("============================================================")
-print("Generated files:")
-print("1. SV_summary.txt")
-print("2. SV_summary.avinput")
-print("3. denovo_variants_precise.txt")
-print("4. denovo_variants_imprecise.txt")
-print("5. denovo_variants_precise.avinput")
-print("6. denovo_variants_imprecise.avinput")
-print("7. output/SV_summary_annotated.csv")
-print("8. output/denovo_variants_precise_annotated.csv")
-print("9. output/denovo_variants_imprecise_annotated.csv")
-print("10. output/SV_summary_annotated_exonic.csv")
-print("11. output/SV_summary_annotated_pathLink.csv")
-print("============================================================")
+if __name__ == "__main__":
+    main()
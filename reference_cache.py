@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from interval_index import IntervalIndex, read_bed
+
+
+# Bumped whenever the on-disk layout below changes, so old caches get rebuilt.
+CACHE_VERSION = 1
+
+# In-process memo: bed path -> (source stamp, loaded index)
+_LOADED = {}
+
+
+# -------------------------------------------------------------------
+# 1. SOURCE FINGERPRINT (size, mtime, sha256)
+# -------------------------------------------------------------------
+def cache_dir_for(bed_file):
+    """The cache sits next to its source: hg38_refGene.bed -> hg38_refGene.bed.cache/"""
+    return bed_file + ".cache"
+
+
+def _stamp(bed_file):
+    st = os.stat(bed_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _sha256(bed_file):
+    h = hashlib.sha256()
+    with open(bed_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache_dir, meta):
+    # meta.json is written last and atomically: a cache without it is incomplete
+    tmp = os.path.join(cache_dir, f"meta.json.{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(cache_dir, "meta.json"))
+
+
+def is_cache_valid(bed_file):
+    """
+    True when the cache matches its source BED.
+
+    Size + mtime are checked first (cheap). If they differ, the sha256 decides:
+    a touched but unchanged file only refreshes the stored stamp, any real
+    change means the cache must be rebuilt.
+    """
+    cache_dir = cache_dir_for(bed_file)
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+
+    stamp = _stamp(bed_file)
+    if stamp["size"] == meta["size"] and stamp["mtime_ns"] == meta["mtime_ns"]:
+        return True
+
+    if stamp["size"] != meta["size"] or _sha256(bed_file) != meta["sha256"]:
+        return False
+
+    meta.update(stamp)
+    _write_meta(cache_dir, meta)
+    return True
+
+
+# -------------------------------------------------------------------
+# 2. COMPILING A BED FILE INTO THE CACHE
+# -------------------------------------------------------------------
+def _save(cache_dir, name, array):
+    tmp = os.path.join(cache_dir, f"{name}.{os.getpid()}.npy")
+    np.save(tmp, array)
+    os.replace(tmp, os.path.join(cache_dir, f"{name}.npy"))
+
+
+def build_cache(bed_file):
+    """
+    Compiles a reference BED into <bed_file>.cache/:
+
+        meta.json               source fingerprint, chromosome names and
+                                each chromosome's slice of the track arrays
+        track_start/end/max_end/row.npy
+                                IntervalIndex tracks, concatenated per chromosome
+        row_chrom/start/end.npy one entry per BED line (chrom as a code)
+        label<i>_code.npy       extra BED columns as int32 codes (-1 = missing)
+        label<i>_names.npy      interned string table for each extra column
+    """
+    cache_dir = cache_dir_for(bed_file)
+    print(f"---Building reference cache {cache_dir}---")
+
+    stamp = _stamp(bed_file)
+    sha256 = _sha256(bed_file)
+
+    bed = read_bed(bed_file)
+    index = IntervalIndex(bed)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        os.remove(os.path.join(cache_dir, "meta.json"))
+    except FileNotFoundError:
+        pass
+
+    chroms = list(index.tracks)
+    offsets = np.cumsum([0] + [len(index.tracks[c][0]) for c in chroms])
+    for i, name in enumerate(["track_start", "track_end", "track_max_end", "track_row"]):
+        parts = [index.tracks[c][i] for c in chroms]
+        _save(cache_dir, name, np.concatenate(parts) if parts else np.empty(0, dtype=np.int64))
+
+    chrom_code = pd.Categorical(bed[0], categories=chroms).codes.astype(np.int32)
+    _save(cache_dir, "row_chrom", chrom_code)
+    _save(cache_dir, "row_start", bed[1].to_numpy(dtype=np.int64))
+    _save(cache_dir, "row_end", bed[2].to_numpy(dtype=np.int64))
+
+    n_labels = bed.shape[1] - 3
+    for i in range(n_labels):
+        codes, names = pd.factorize(bed[3 + i])
+        _save(cache_dir, f"label{i}_code", codes.astype(np.int32))
+        _save(cache_dir, f"label{i}_names", np.array(list(names), dtype=str))
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": os.path.basename(bed_file),
+        "sha256": sha256,
+        "chroms": chroms,
+        "offsets": offsets.tolist(),
+        "n_labels": n_labels,
+    }
+    meta.update(stamp)
+    _write_meta(cache_dir, meta)
+
+
+# -------------------------------------------------------------------
+# 3. LOADING (memory-mapped, shared between processes)
+# -------------------------------------------------------------------
+class CachedIntervalIndex(IntervalIndex):
+    """
+    IntervalIndex backed by the memory-mapped .npy arrays of a reference cache.
+
+    Nothing is parsed at load time, and every process annotating on the same
+    node maps the same pages instead of holding its own pandas copy.
+    Reference rows are only materialised (as a DataFrame) for actual hits.
+    """
+
+    def __init__(self, cache_dir):
+        meta = _read_meta(cache_dir)
+
+        def load(name):
+            return np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+
+        starts = load("track_start")
+        ends = load("track_end")
+        max_end = load("track_max_end")
+        rows = load("track_row")
+
+        offsets = meta["offsets"]
+        self.tracks = {}
+        for i, chrom in enumerate(meta["chroms"]):
+            s = slice(offsets[i], offsets[i + 1])
+            self.tracks[chrom] = (starts[s], ends[s], max_end[s], rows[s])
+
+        self.chrom_names = np.array(meta["chroms"], dtype=object)
+        self.row_chrom = load("row_chrom")
+        self.row_start = load("row_start")
+        self.row_end = load("row_end")
+        self.labels = [
+            (load(f"label{i}_code"), load(f"label{i}_names"))
+            for i in range(meta["n_labels"])
+        ]
+
+    def take(self, ref_rows):
+        table = pd.DataFrame({
+            0: self.chrom_names[self.row_chrom[ref_rows]],
+            1: self.row_start[ref_rows],
+            2: self.row_end[ref_rows],
+        })
+
+        for i, (codes, names) in enumerate(self.labels):
+            hit_codes = codes[ref_rows]
+            values = np.full(len(hit_codes), np.nan, dtype=object)
+            found = hit_codes >= 0
+            values[found] = names[hit_codes[found]].astype(object)
+            table[3 + i] = values
+
+        return table
+
+
+def load_reference(bed_file):
+    """
+    Returns the interval index of a reference BED, compiling (or recompiling)
+    its cache first if the source changed. Indexes already loaded in this
+    process are reused as long as the source stays the same.
+    """
+    key = os.path.abspath(bed_file)
+    stamp = _stamp(bed_file)
+
+    if key in _LOADED and _LOADED[key][0] == stamp:
+        return _LOADED[key][1]
+
+    if not is_cache_valid(bed_file):
+        build_cache(bed_file)
+
+    index = CachedIntervalIndex(cache_dir_for(bed_file))
+    _LOADED[key] = (stamp, index)
+    return index
+
+
+def clear_cache(bed_file):
+    """Deletes the compiled cache of a reference BED (rebuilt on next load)."""
+    _LOADED.pop(os.path.abspath(bed_file), None)
+    shutil.rmtree(cache_dir_for(bed_file), ignore_errors=True)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+
+# -------------------------------------------------------------------
+# 1. CONTENT HASHES
+# -------------------------------------------------------------------
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -------------------------------------------------------------------
+# 2. STAGES
+# -------------------------------------------------------------------
+class Stage:
+    """
+    One step of the pipeline.
+
+    run:     function called with no arguments
+    inputs:  files the stage reads (data, reference BEDs, its own code)
+    outputs: files (or directories) the stage writes
+    params:  settings that change the result (parser, backend, format...)
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), params=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+
+class StageRunner:
+    """
+    Runs stages in order and records the content hash of every input and
+    output in a JSON manifest. A stage is skipped when its inputs, params
+    and outputs are exactly what the manifest recorded for its last run.
+
+    A stage whose upstream reran but produced identical files is skipped too,
+    since only content is compared.
+    """
+
+    def __init__(self, stages, manifest_file):
+        self.stages = stages
+        self.manifest_file = manifest_file
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"files": {}, "stages": {}}
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_file) or ".", exist_ok=True)
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_file)
+
+    def hash_of(self, path):
+        """
+        sha256 of a file, re-read only when its size or mtime changed
+        since it was last hashed. A directory hashes its files (relative
+        paths and their sha256), so a deleted or edited plot counts as a
+        changed output. Missing paths -> None.
+        """
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file = os.path.join(root, name)
+                    h.update(f"{os.path.relpath(file, path)}\0{self.hash_of(file)}\n".encode())
+            return h.hexdigest()
+        if not os.path.exists(path):
+            return None
+
+        st = os.stat(path)
+        known = self.manifest["files"].get(path)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["sha256"]
+
+        sha256 = file_sha256(path)
+        self.manifest["files"][path] = {
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256
+        }
+        return sha256
+
+    def _fingerprint(self, stage):
+        return {
+            "inputs": {p: self.hash_of(p) for p in stage.inputs},
+            "params": stage.params,
+        }
+
+    def is_up_to_date(self, stage):
+        last = self.manifest["stages"].get(stage.name)
+        if last is None:
+            return False
+        if last["inputs"] != self._fingerprint(stage)["inputs"]:
+            return False
+        if last["params"] != json.loads(json.dumps(stage.params)):
+            return False
+        # outputs moved (e.g. another --clinvar-bed or table format): never written there
+        if sorted(last["outputs"]) != sorted(stage.outputs):
+            return False
+        return all(
+            self.hash_of(p) is not None and self.hash_of(p) == h
+            for p, h in last["outputs"].items()
+        )
+
+    def run(self, only=None, force=False):
+        """
+        only:  stage names to run (all stages when None)
+        force: run the selected stages even if they are up to date
+        """
+        for stage in self.stages:
+            if only is not None and stage.name not in only:
+                continue
+
+            if not force and self.is_up_to_date(stage):
+                print(f"\n=== Skipping stage '{stage.name}' (inputs unchanged) ===")
+                continue
+
+            missing = [p for p in stage.inputs if not os.path.exists(p)]
+            if missing:
+                raise FileNotFoundError(
+                    f"Stage '{stage.name}' is missing inputs: {', '.join(missing)}"
+                )
+
+            fingerprint = self._fingerprint(stage)
+            stage.run()
+
+            fingerprint["outputs"] = {p: self.hash_of(p) for p in stage.outputs}
+            self.manifest["stages"][stage.name] = fingerprint
+            self._save_manifest()
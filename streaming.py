@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Streaming execution of parse -> annotate -> filter / stats.
+
+The batch pipeline runs its stages one after the other: the whole VCF is
+parsed before annotation starts, and the filters wait for all of the
+annotation. Here every stage runs on its own thread and chunks of records
+flow between them through bounded queues:
+
+    parse (delly_parser, 50k records a chunk, optional process pool)
+      | {table: (txt, avinput)} texts of the chunk
+    annotate (annotate_sv._annotate, reference index loaded once)
+      | (table, annotated chunk)
+    filter / stats (exonic and pathogenic rows, sv_stats aggregates)
+
+so the first annotated, exonic and pathogenic SVs are on disk while the
+rest of the VCF is still being parsed, and the run takes about as long as
+its slowest stage instead of the sum of all of them. The queues hold at
+most QUEUE_SIZE chunks, so a slow stage holds back the ones before it and
+memory stays bounded.
+
+The files are the ones the batch stages write (the python parser's trio
+outputs, the annotated / exonic / pathLink tables), with the same rows in
+the same order. The plots are drawn from the aggregates once the last chunk
+is through (pipeline.py stream).
+"""
+import io
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+from metrics import measure
+
+
+# Chunks waiting between two stages. One is enough to keep every stage
+# busy; deeper queues only let parsing run ahead and compete with annotation
+# for the CPU, which delays the first results.
+QUEUE_SIZE = 1
+
+# How often a blocked stage checks whether another stage failed (seconds)
+POLL_SECONDS = 0.1
+
+# Tables of process_chunk that are annotated, and the plot aggregates they feed
+ANNOTATED_TABLES = ["called", "denovo_precise", "denovo_imprecise"]
+PLOT_TABLES = {
+    "called": "SV_summary_annotated",
+    "denovo_imprecise": "denovo_variants_imprecise_annotated",
+    "exonic": "SV_summary_annotated_exonic",
+    "pathogenic": "SV_summary_annotated_pathLink",
+}
+
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    """Raised in a stage when another stage failed."""
+
+
+# -------------------------------------------------------------------
+# 1. BOUNDED QUEUES BETWEEN THE STAGES
+# -------------------------------------------------------------------
+class Pipe:
+    """
+    Bounded queue from one stage to the next. put blocks while the queue is
+    full, iterating blocks until the next chunk (and stops after close);
+    both give up when another stage failed.
+    """
+
+    def __init__(self, failed, size=QUEUE_SIZE):
+        self.failed = failed
+        self.queue = queue.Queue(maxsize=size)
+
+    def put(self, item):
+        while True:
+            if self.failed.is_set():
+                raise _Cancelled()
+            try:
+                self.queue.put(item, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def close(self):
+        self.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            if self.failed.is_set():
+                raise _Cancelled()
+            try:
+                item = self.queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+
+def run_stages(stages, failed):
+    """
+    Runs every (name, function) on its own thread and waits for all of
+    them. The first exception sets `failed` (so the others stop) and is
+    re-raised here.
+    """
+    errors = []
+
+    def run(name, fn):
+        try:
+            with measure(name):
+                fn()
+        except _Cancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+
+    threads = [threading.Thread(target=run, args=stage, name=stage[0]) for stage in stages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+# -------------------------------------------------------------------
+# 2. THE STREAMED TRIO PIPELINE
+# -------------------------------------------------------------------
+def stream_trio(
+    vcf_file,
+    annotated_outputs,
+    exonic_output,
+    pathogenic_output,
+    output_dir="output",
+    avinput_dir=".",
+    gene_bed="hg38_refGene.bed",
+    exon_bed="hg38_exons.bed",
+    clinvar_bed="clinvar_SV.track.bed",
+    clinvar_condition_bed=None,
+    backend="index",
+    chunk_size=None,
+    workers=1,
+    queue_size=QUEUE_SIZE,
+    annotation_cache=None,
+    store_dir=None):
+    """
+    Parses vcf_file, annotates and filters it as a stream of chunks.
+
+    annotated_outputs: {"called" | "denovo_precise" | "denovo_imprecise": table path}
+    exonic_output, pathogenic_output: the filtered tables of "called"
+    output_dir, avinput_dir, chunk_size, workers: as in delly_parser.write_trio_outputs
+    backend: as in annotate_sv ("index" or "cache" load the references once;
+        "bedtools" runs bedtools on every chunk)
+    annotation_cache: optional annotation cache (annotation_cache.py)
+    store_dir: optional region / gene query store of the "called" table
+        (sv_store.StoreWriter), built from the same chunks
+
+    Returns ({plot table name: SVStats}, TrioStats).
+    """
+    from annotate_sv import (FINAL_COLS, _annotate, _check_backend, exonic_rows,
+                             load_indexes, open_cache, pathogenic_rows, read_avinput)
+    from delly_parser import CHUNK_SIZE, write_trio_outputs
+    from sv_stats import SVStats
+    from sv_store import StoreWriter
+    from table_io import TableWriter
+
+    _check_backend(backend)
+    references = (gene_bed, exon_bed, clinvar_bed, clinvar_condition_bed)
+    indexes = None
+    if backend == "index":
+        indexes = load_indexes(references)
+    annotation_cache = open_cache(annotation_cache)
+
+    failed = threading.Event()
+    parsed = Pipe(failed, queue_size)
+    annotated = Pipe(failed, queue_size)
+    stats = {name: SVStats() for name in PLOT_TABLES.values()}
+    trio = {}
+    start = time.perf_counter()
+
+    def parse():
+        trio["stats"] = write_trio_outputs(
+            vcf_file, output_dir=output_dir, avinput_dir=avinput_dir,
+            chunk_size=chunk_size or CHUNK_SIZE, workers=workers, on_chunk=parsed.put,
+        )
+        parsed.close()
+
+    def annotate():
+        writers = {name: TableWriter(annotated_outputs[name], FINAL_COLS)
+                   for name in ANNOTATED_TABLES}
+        try:
+            for texts in parsed:
+                for name in ANNOTATED_TABLES:
+                    avinput = texts[name][1]
+                    if not avinput:
+                        continue
+                    df = _annotate(read_avinput(io.StringIO(avinput)), *references,
+                                   backend, indexes=indexes,
+                                   annotation_cache=annotation_cache)
+                    writers[name].write(df)
+                    annotated.put((name, df))
+                annotated.put(("chunk", None))
+        finally:
+            for writer in writers.values():
+                writer.close()
+        annotated.close()
+
+    def filter_stats():
+        writers = {"exonic": TableWriter(exonic_output, FINAL_COLS),
+                   "pathogenic": TableWriter(pathogenic_output, FINAL_COLS)}
+        chunks = 0
+        # the query store of the called table, from the same chunks (discarded on failure)
+        with (StoreWriter(store_dir, FINAL_COLS) if store_dir else nullcontext()) as store:
+            try:
+                for name, df in annotated:
+                    if name == "chunk":
+                        chunks += 1
+                        print(f"----Chunk {chunks}: {stats['SV_summary_annotated'].rows} SVs "
+                              f"annotated, {writers['exonic'].rows} exonic, "
+                              f"{writers['pathogenic'].rows} pathogenic "
+                              f"({time.perf_counter() - start:.1f} s)----")
+                        continue
+                    if name in PLOT_TABLES:
+                        stats[PLOT_TABLES[name]].update(df)
+                    if name != "called":
+                        continue
+                    if store is not None:
+                        store.write(df)
+                    for part, rows in [("exonic", exonic_rows(df)),
+                                       ("pathogenic", pathogenic_rows(df))]:
+                        writers[part].write(rows)
+                        stats[PLOT_TABLES[part]].update(rows)
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+    run_stages([("stream_parse", parse), ("stream_annotate", annotate),
+                ("stream_filter", filter_stats)], failed)
+
+    for path in [*annotated_outputs.values(), exonic_output, pathogenic_output,
+                 *([store_dir] if store_dir else [])]:
+        print(f"{path} is saved.")
+    return stats, trio["stats"]
@@ -3,22 +3,31 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import re
+from concurrent.futures import ProcessPoolExecutor
 from matplotlib import ticker
 
+from delly_parser import load_summary
+from metrics import add_records, measure, reset, take_records
+from sv_stats import SVStats, compute_stats, load_stats, write_stats
+from table_io import find_table
+
 # -------------------------------------------------------------------
-# PREPARE OUTPUT FOLDER
+# OUTPUT FOLDER AND STYLE
+# (applied when plotting starts, not when the module is imported)
 # -------------------------------------------------------------------
 PLOT_DIR = "plots"
-os.makedirs(PLOT_DIR, exist_ok=True)
+PLOT_STYLE = {"style": "whitegrid", "font_scale": 1.2}
+
 
-sns.set(style="whitegrid", font_scale=1.2)
+def set_plot_style():
+    sns.set(**PLOT_STYLE)
 
 
 # -------------------------------------------------------------------
 # 1. SAVING FIGURES
 # -------------------------------------------------------------------
 def save_plot(fig, name):
+    os.makedirs(PLOT_DIR, exist_ok=True)
     path = os.path.join(PLOT_DIR, name)
     fig.savefig(path, dpi=300, bbox_inches="tight")
     print(f"{path} is saved.")
@@ -37,23 +46,39 @@ def add_value_labels(ax, fmt="%.0f"):
 # -------------------------------------------------------------------
 # 2. PLOTING FOR SV ANNOTATED FILES
 # -------------------------------------------------------------------
-def plot_sv_annotation(csv_file, tag="SV_summary"):
-    print(f"==={csv_file} is being loaded===")
-    df = pd.read_csv(csv_file)
+def table_stats(table, tag="table"):
+    """
+    SVStats aggregates of an annotated table (path or DataFrame), computed
+    in one pass; SVStats (e.g. loaded or merged stats files) pass through.
+    """
+    if isinstance(table, SVStats):
+        return table
+    if isinstance(table, pd.DataFrame):
+        print(f"==={tag} table handed over in memory===")
+    else:
+        print(f"==={table} is being loaded===")
+    return compute_stats(table)
 
-    # Basic columns
-    df["SV_size"] = df["end"] - df["start"]
+
+def plot_sv_annotation(csv_file, tag="SV_summary"):
+    """
+    csv_file: path to an annotated table (.csv/.parquet/.feather), the
+    DataFrame itself, or its SVStats. The figures are drawn from the
+    aggregates only, so their cost does not grow with the number of SVs.
+    """
+    stats = table_stats(csv_file, tag)
+    if not isinstance(csv_file, str):
+        csv_file = tag
 
     # -----------------------------------------------------------------
     # PLOT 1: Variant Function Distribution
     # -----------------------------------------------------------------
     if tag != "SV_exonic":
         fig, ax = plt.subplots(figsize=(8, 5))
-        order = df["Function"].value_counts().index
-        sns.countplot(
-            data=df,
-            x="Function",
-            order=order,
+        function_counts = stats.function.most_common()
+        sns.barplot(
+            x=[name for name, _ in function_counts],
+            y=[count for _, count in function_counts],
             ax=ax,
             palette="Blues"
         )
@@ -80,13 +105,12 @@ def plot_sv_annotation(csv_file, tag="SV_summary"):
             return (1, 24)
         return (2, name)
 
-    chrom_order = sorted(df["chrom"].unique(), key=chrom_sort_key)
+    chrom_order = sorted(stats.chrom, key=chrom_sort_key)
 
     fig, ax = plt.subplots(figsize=(9, 5))
-    sns.countplot(
-        data=df,
-        x="chrom",
-        order=chrom_order,
+    sns.barplot(
+        x=chrom_order,
+        y=[stats.chrom[ch] for ch in chrom_order],
         ax=ax,
         palette="GnBu"
     )
@@ -101,16 +125,13 @@ def plot_sv_annotation(csv_file, tag="SV_summary"):
     # -----------------------------------------------------------------
     # PLOT 3: Top Most Affected Genes (genes on X, counts on Y)
     # -----------------------------------------------------------------
-    df_genes = df[df["Gene"] != "-"]
-
-    if not df_genes.empty:
-        exploded = df_genes["Gene"].str.split(";", expand=True).stack()
-        top_genes = exploded.value_counts().nlargest(20)
+    top_genes = stats.top_genes(20)
 
+    if top_genes:
         fig, ax = plt.subplots(figsize=(10, 6))
         sns.barplot(
-            x=top_genes.index,
-            y=top_genes.values,
+            x=[gene for gene, _ in top_genes],
+            y=[count for _, count in top_genes],
             ax=ax,
             palette="Oranges_r"
         )
@@ -127,77 +148,67 @@ def plot_sv_annotation(csv_file, tag="SV_summary"):
 
     
 # -------------------------------------------------------------------
-# 3. SOME PLOTS FROM summary_stats.txt 
+# 3. SOME PLOTS FROM summary_stats.json
 # -------------------------------------------------------------------
 
-def plot_summary_stats(stats_file="summary_stats.txt"):
-    print(f"----Reading summary stats: {stats_file}----")
-    with open(stats_file) as f:
-        content = f.read()
-        
-    # Extract bi-allelic and multi-allelic
-    bi = re.search(r"Bi-allelic variants:\s+(\d+)", content)
-    multi = re.search(r"Multi-allelic variants:\s+(\d+)", content)
-    
-    # Extract structural variants and single nucleotide variants
-    snv = re.search(r"SNVs.*:\s+(\d+)", content)
-    sv = re.search(r"SVs.*:\s+(\d+)", content)
-    
+def plot_summary_stats(stats_file="summary_stats.json", summary=None):
+    """
+    stats_file: summary_stats.json (or a summary_stats.txt from script.sh)
+    summary:    the summary dict when it has already been loaded
+    """
+    if summary is None:
+        print(f"----Reading summary stats: {stats_file}----")
+        summary = load_summary(stats_file)
+
+    alleles = summary["alleles"]
+    variants = summary["variants"]
 
-   
     #------------------------SNV vs SV-----------------------------
     
-    if snv and sv:
-        fig, ax = plt.subplots(figsize=(7, 5))
-        sns.barplot(
-            x=["SNVs", "SVs"],
-            y=[int(snv.group(1)), int(sv.group(1))],
-            palette="Purples",
-            ax=ax
-        )
-        ax.set_title("SNV vs SV Count")
-        ax.yaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-        add_value_labels(ax)
-        save_plot(fig, "summary_snvs_vs_svs.png")
-        
-        
+    fig, ax = plt.subplots(figsize=(7, 5))
+    sns.barplot(
+        x=["SNVs", "SVs"],
+        y=[variants["snv"], variants["sv"]],
+        palette="Purples",
+        ax=ax
+    )
+    ax.set_title("SNV vs SV Count")
+    ax.yaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+    add_value_labels(ax)
+    save_plot(fig, "summary_snvs_vs_svs.png")
+    
+    
     
     # ----------------------Bi-allelic & MULTI-ALLELIC----------------------
     
-    if bi and multi:
-        fig, ax = plt.subplots(figsize=(7, 5))
-        y_vals = [int(bi.group(1)), int(multi.group(1))]
-        sns.barplot(
-            x=["Bi-allelic", "Multi-allelic"],
-            y=y_vals,
-            ax=ax,
-            palette="Reds"
-        )
-        ax.set_title("Allele Structure Count")
-        ax.set_ylabel("Count")
-        ax.yaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-        add_value_labels(ax)
-        save_plot(fig, "summary_allele_structure.png")
+    fig, ax = plt.subplots(figsize=(7, 5))
+    y_vals = [alleles["biallelic"], alleles["multiallelic"]]
+    sns.barplot(
+        x=["Bi-allelic", "Multi-allelic"],
+        y=y_vals,
+        ax=ax,
+        palette="Reds"
+    )
+    ax.set_title("Allele Structure Count")
+    ax.set_ylabel("Count")
+    ax.yaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+    add_value_labels(ax)
+    save_plot(fig, "summary_allele_structure.png")
         
         
 #-------------------PRECISE and IMPRECISE READS---------------------------
 
-def plot_precise_imprecise_pie(stats_file="summary_stats.txt"):
-    print(f"----Reading precise/imprecise counts from: {stats_file}----")
-
-    with open(stats_file) as f:
-        content = f.read()
-
-    # Extract counts using regex
-    precise = re.search(r"Precise reads:\s+(\d+)", content)
-    imprecise = re.search(r"Imprecise reads:\s+(\d+)", content)
-
-    if not precise or not imprecise:
-        print("----Could not find precise/imprecise counts in summary_stats.txt----")
-        return
+def plot_precise_imprecise_pie(stats_file="summary_stats.json", summary=None):
+    """
+    stats_file: summary_stats.json (or a summary_stats.txt from script.sh)
+    summary:    the summary dict when it has already been loaded
+    """
+    if summary is None:
+        print(f"----Reading precise/imprecise counts from: {stats_file}----")
+        summary = load_summary(stats_file)
 
-    precise_count = int(precise.group(1))
-    imprecise_count = int(imprecise.group(1))
+    precise_count = summary["reads"]["precise"]
+    imprecise_count = summary["reads"]["imprecise"]
 
     labels = ["Precise Reads", "Imprecise Reads"]
     values = [precise_count, imprecise_count]
@@ -232,18 +243,18 @@ def plot_precise_imprecise_pie(stats_file="summary_stats.txt"):
 # 4. ALT Variant Type Count (DEL / INS / DUP) plots
 # -------------------------------------------------------------------
 def plot_alt_counts(csv_file, tag="ALT_counts"):
-    print(f"=== Loading ALT counts from {csv_file} ===")
-    df = pd.read_csv(csv_file)
-
-    alt_counts = df["alt"].value_counts()
+    """csv_file: annotated table (path or DataFrame) or its SVStats."""
+    if isinstance(csv_file, str):
+        print(f"=== Loading ALT counts from {csv_file} ===")
+    alt_counts = table_stats(csv_file, tag).alt.most_common()
     
     rename_map = {
         "<DEL>": "DEL",
         "<INS>": "INS",
         "<DUP>": "DUP"
     }
-    labels = [rename_map.get(x, x) for x in alt_counts.index]
-    values = alt_counts.values
+    labels = [rename_map.get(x, x) for x, _ in alt_counts]
+    values = [count for _, count in alt_counts]
 
     # -------------------- PLOT --------------------
     fig, ax = plt.subplots(figsize=(8, 5))
@@ -280,41 +291,129 @@ def plot_alt_counts(csv_file, tag="ALT_counts"):
 # -------------------------------------------------------------------
 # 4. MAIN FUNCTION 
 # -------------------------------------------------------------------
-def run_all_plots():
+# Table aggregates / trio summary shared by the plot jobs of one run_all_plots call
+# (set once per worker process, not sent with every job)
+_shared = {}
 
-    print("\n=== Plotting Full SV Summary ===")
-    if os.path.exists("SV_summary_annotated.csv"):
-        plot_sv_annotation("SV_summary_annotated.csv", tag="SV_summary")
 
-    print("\n=== Plotting Imprecise de novo ===")
-    if os.path.exists("denovo_variants_imprecise_annotated.csv"):
-        plot_sv_annotation("denovo_variants_imprecise_annotated.csv", tag="denovo_imprecise")
+def _init_plot_worker(shared, plot_dir):
+    global PLOT_DIR
+    PLOT_DIR = plot_dir
+    plt.switch_backend("Agg")
+    set_plot_style()
+    # metrics of this worker are handed back per job, not the parent's copy
+    reset()
+    _shared.update(shared)
 
-    print("\n=== Plotting Some Info from Summary Stats ===")
-    if os.path.exists("summary_stats.txt"):
-        plot_summary_stats("summary_stats.txt")
 
-    print("\n=== Plotting EXONIC variants ===")
-    if os.path.exists("SV_summary_annotated_exonic.csv"):
-        plot_sv_annotation("SV_summary_annotated_exonic.csv", tag="SV_exonic")
+def _run_plot_job(job):
+    """job = (banner, function name, keyword args, {param: key of a shared input})"""
+    banner, func_name, kwargs, shared_args = job
+    if banner:
+        print(f"\n{banner}")
+    kwargs = dict(kwargs, **{param: _shared[key] for param, key in shared_args.items()})
+    step = func_name + (f"_{kwargs['tag']}" if "tag" in kwargs else "")
+    with measure(step):
+        globals()[func_name](**kwargs)
 
-    print("\n=== Plotting PATHOGENIC variants ===")
-    if os.path.exists("SV_summary_annotated_pathLink.csv"):
-        plot_sv_annotation("SV_summary_annotated_pathLink.csv", tag="SV_pathogenic")
-        
-    print("\n=== Plotting Precise vs Imprecise Pie Chart ===")
-    if os.path.exists("summary_stats.txt"):
-        plot_precise_imprecise_pie("summary_stats.txt")
-    
-    print("\n=== Plotting ALT Value Counts ===")
-    if os.path.exists("SV_summary_annotated_exonic.csv"):
-        plot_alt_counts("SV_summary_annotated_exonic.csv", tag="SV_exonic")
-        
-    if os.path.exists("SV_summary_annotated_pathLink.csv"):
-        plot_alt_counts("SV_summary_annotated_pathLink.csv", tag="SV_pathlink")
-        
-    if os.path.exists("SV_summary_annotated.csv"):
-        plot_alt_counts("SV_summary_annotated.csv", tag="SV_annotated")
+
+def _run_plot_job_in_worker(job):
+    """Runs a job in a pool worker and hands its metrics back to the parent."""
+    _run_plot_job(job)
+    return take_records()
+
+
+def run_all_plots(tables=None, workers=1, summary_stats=None, plot_dir=None,
+                  stats_dir=None):
+    """
+    tables: optional {name: DataFrame, path or SVStats} of the tables, e.g.
+        {"SV_summary_annotated": sv, "SV_summary_annotated_exonic": sv_exonic}
+    Tables not handed over are looked up on disk as <name>.parquet,
+    .feather, .arrow or .csv, then as <stats_dir>/<name>.stats.json.
+
+    Each table is aggregated once (sv_stats) and every figure is drawn from
+    the aggregates; with stats_dir they are also saved there as
+    <name>.stats.json.
+
+    summary_stats: trio summary dict, or the path of summary_stats.json
+        (a script.sh summary_stats.txt also works); looked up in the
+        working directory when not given.
+
+    With workers > 1 the
+    figures are rendered in a process pool (non-interactive Agg backend);
+    the same PNGs are written either way, into plot_dir (default PLOT_DIR).
+    """
+    global PLOT_DIR
+    if plot_dir is not None:
+        PLOT_DIR = plot_dir
+    set_plot_style()
+
+    tables = tables or {}
+    shared = {}
+
+    for name in ["SV_summary_annotated", "denovo_variants_imprecise_annotated",
+                 "SV_summary_annotated_exonic", "SV_summary_annotated_pathLink"]:
+        source = tables.get(name, find_table(name))
+        stats_file = os.path.join(stats_dir or ".", f"{name}.stats.json")
+        if source is not None:
+            shared[name] = table_stats(source, name)
+            if stats_dir is not None:
+                os.makedirs(stats_dir, exist_ok=True)
+                write_stats(shared[name], stats_file)
+                print(f"{stats_file} is saved.")
+        elif os.path.exists(stats_file):
+            print(f"----Reading plot aggregates: {stats_file}----")
+            shared[name] = load_stats(stats_file)
+
+    if summary_stats is None:
+        summary_stats = next(
+            (p for p in ["summary_stats.json", "summary_stats.txt"] if os.path.exists(p)),
+            None
+        )
+    if isinstance(summary_stats, dict):
+        shared["summary_stats"] = summary_stats
+    elif summary_stats is not None and os.path.exists(summary_stats):
+        print(f"----Reading summary stats: {summary_stats}----")
+        shared["summary_stats"] = load_summary(summary_stats)
+
+    # (banner, function, keyword args, {param: shared input}), in the usual order
+    plan = [
+        ("=== Plotting Full SV Summary ===", "plot_sv_annotation",
+         {"tag": "SV_summary"}, {"csv_file": "SV_summary_annotated"}),
+        ("=== Plotting Imprecise de novo ===", "plot_sv_annotation",
+         {"tag": "denovo_imprecise"}, {"csv_file": "denovo_variants_imprecise_annotated"}),
+        ("=== Plotting Some Info from Summary Stats ===", "plot_summary_stats",
+         {}, {"summary": "summary_stats"}),
+        ("=== Plotting EXONIC variants ===", "plot_sv_annotation",
+         {"tag": "SV_exonic"}, {"csv_file": "SV_summary_annotated_exonic"}),
+        ("=== Plotting PATHOGENIC variants ===", "plot_sv_annotation",
+         {"tag": "SV_pathogenic"}, {"csv_file": "SV_summary_annotated_pathLink"}),
+        ("=== Plotting Precise vs Imprecise Pie Chart ===", "plot_precise_imprecise_pie",
+         {}, {"summary": "summary_stats"}),
+        ("=== Plotting ALT Value Counts ===", "plot_alt_counts",
+         {"tag": "SV_exonic"}, {"csv_file": "SV_summary_annotated_exonic"}),
+        (None, "plot_alt_counts",
+         {"tag": "SV_pathlink"}, {"csv_file": "SV_summary_annotated_pathLink"}),
+        (None, "plot_alt_counts",
+         {"tag": "SV_annotated"}, {"csv_file": "SV_summary_annotated"}),
+    ]
+
+    jobs = [
+        job for job in plan
+        if all(key in shared for key in job[3].values())
+    ]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_plot_worker,
+                                 initargs=(shared, PLOT_DIR)) as executor:
+            for records in executor.map(_run_plot_job_in_worker, jobs):
+                add_records(records)
+    else:
+        _shared.clear()
+        _shared.update(shared)
+        for job in jobs:
+            _run_plot_job(job)
+        _shared.clear()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Aggregates of an annotated SV table, for the plots.
+
+One pass over the table (chunk by chunk for CSV, so memory stays bounded)
+gives everything sv_plot draws:
+
+    function   SVs per Function (exonic / intronic / intergenic)
+    chrom      SVs per chromosome
+    alt        SVs per ALT type (<DEL>, <DUP>, ...)
+    genes      SVs hitting each gene (the top ones are plotted)
+    sv_size    histogram of end - start over SIZE_BIN_EDGES
+
+The aggregates are a few KB whatever the number of SVs, are saved as JSON,
+and add up: per-sample or per-family files can be merged into cohort
+aggregates and plotted the same way.
+
+    python3 sv_stats.py output/SV_summary_annotated.csv -o SV_summary.stats.json
+    python3 sv_stats.py --merge fam1.stats.json fam2.stats.json -o cohort.stats.json
+"""
+import argparse
+import json
+from collections import Counter
+
+import numpy as np
+
+
+STATS_VERSION = 1
+
+# Lower edges of the SV size bins (bp); the last bin is open-ended
+SIZE_BIN_EDGES = [0, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000,
+                  500_000, 1_000_000, 10_000_000]
+
+# Columns read from the annotated table
+STATS_COLS = ["chrom", "start", "end", "alt", "Function", "Gene"]
+CHUNK_SIZE = 500_000
+
+
+# -------------------------------------------------------------------
+# 1. THE AGGREGATES
+# -------------------------------------------------------------------
+def _ordered_counts(series):
+    """{value: count}, most frequent first (values that do not occur left out)."""
+    counts = series.value_counts()
+    return {str(k): int(v) for k, v in counts.items() if v > 0}
+
+
+class SVStats:
+    """
+    Counters accumulated chunk by chunk. Each counter keeps the order in
+    which values were first counted, so ties come out in table order.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.function = Counter()
+        self.chrom = Counter()
+        self.alt = Counter()
+        self.genes = Counter()
+        self.sv_size = np.zeros(len(SIZE_BIN_EDGES), dtype=np.int64)
+
+    def update(self, df):
+        """Adds one chunk of an annotated table."""
+        from table_io import gene_counts
+
+        self.rows += len(df)
+        self.function.update(_ordered_counts(df["Function"]))
+        self.chrom.update(_ordered_counts(df["chrom"]))
+        self.alt.update(_ordered_counts(df["alt"]))
+        self.genes.update(dict(gene_counts(df["Gene"]).items()))
+
+        sizes = df["end"].to_numpy(np.int64) - df["start"].to_numpy(np.int64)
+        bins = np.searchsorted(SIZE_BIN_EDGES, sizes, side="right") - 1
+        self.sv_size += np.bincount(np.clip(bins, 0, None),
+                                    minlength=len(SIZE_BIN_EDGES))
+        return self
+
+    def merge(self, other):
+        """Adds the aggregates of another table (e.g. another family)."""
+        self.rows += other.rows
+        for name in ["function", "chrom", "alt", "genes"]:
+            getattr(self, name).update(getattr(other, name))
+        self.sv_size += other.sv_size
+        return self
+
+    def top_genes(self, n=20):
+        """[(gene, count)] of the n most hit genes (ties in first-counted order)."""
+        return self.genes.most_common(n)
+
+    def size_labels(self):
+        """Label of every SV size bin: "0-50", ..., ">=10000000"."""
+        edges = SIZE_BIN_EDGES
+        return [f"{lo}-{hi}" for lo, hi in zip(edges, edges[1:])] + [f">={edges[-1]}"]
+
+    def to_dict(self):
+        return {
+            "version": STATS_VERSION,
+            "rows": self.rows,
+            "function": dict(self.function),
+            "chrom": dict(self.chrom),
+            "alt": dict(self.alt),
+            "genes": dict(self.genes),
+            "sv_size": {"edges": SIZE_BIN_EDGES, "counts": self.sv_size.tolist()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data["sv_size"]["edges"] != SIZE_BIN_EDGES:
+            raise ValueError("SV size bins differ from SIZE_BIN_EDGES; recompute the stats")
+        stats = cls()
+        stats.rows = data["rows"]
+        for name in ["function", "chrom", "alt", "genes"]:
+            setattr(stats, name, Counter(data[name]))
+        stats.sv_size = np.array(data["sv_size"]["counts"], dtype=np.int64)
+        return stats
+
+
+# -------------------------------------------------------------------
+# 2. COMPUTING, SAVING AND LOADING
+# -------------------------------------------------------------------
+def compute_stats(table, chunk_size=CHUNK_SIZE):
+    """
+    SVStats of an annotated table: a DataFrame, or a path (CSV files are
+    read chunk_size rows at a time, only the columns the stats need).
+    """
+    import pandas as pd
+
+    stats = SVStats()
+    if isinstance(table, pd.DataFrame):
+        return stats.update(table)
+
+    from table_io import read_table, table_format
+
+    if table_format(table) != "csv":
+        return stats.update(read_table(table))
+
+    with pd.read_csv(table, usecols=STATS_COLS, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            stats.update(chunk)
+    return stats
+
+
+def write_stats(stats, json_file):
+    with open(json_file, "w") as f:
+        json.dump(stats.to_dict(), f, indent=1)
+        f.write("\n")
+
+
+def load_stats(json_file):
+    with open(json_file) as f:
+        return SVStats.from_dict(json.load(f))
+
+
+def merge_stats(json_files):
+    """Cohort aggregates: the sum of several stats files."""
+    merged = SVStats()
+    for json_file in json_files:
+        merged.merge(load_stats(json_file))
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot aggregates of an annotated SV table")
+    parser.add_argument("table", nargs="?", help="annotated table (.csv/.parquet/.feather)")
+    parser.add_argument("--merge", nargs="+", metavar="STATS",
+                        help="merge these stats files instead of reading a table")
+    parser.add_argument("-o", "--output", required=True, help="stats JSON to write")
+    args = parser.parse_args()
+
+    if args.merge:
+        stats = merge_stats(args.merge)
+    elif args.table:
+        stats = compute_stats(args.table)
+    else:
+        parser.error("give a table or --merge STATS...")
+
+    write_stats(stats, args.output)
+    print(f"{args.output} is saved.")
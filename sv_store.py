@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Region / gene query store over an annotated SV table.
+
+The annotation stage writes output/SV_summary_annotated.store/ next to the
+annotated table, from the same chunks (StoreWriter):
+
+    rows.csv        the annotated rows (CSV, same columns), sorted by chrom, start, end
+    starts.npy      per row: start, end and the running maximum of the ends
+    ends.npy          within its chromosome (int32, memory-mapped when queried)
+    max_ends.npy
+    offsets.npy     byte offset of every row in rows.csv (+ end of file)
+    gene_names.npy  sorted gene names, and for gene i the rows
+    gene_ptr.npy      gene_rows[gene_ptr[i]:gene_ptr[i + 1]]
+    gene_rows.npy
+    meta.json       columns, row count, {chrom: [first row, end row]}
+
+A region query binary-searches the chromosome's block (the same sorted
+starts / running max end scheme as interval_index.IntervalIndex) and reads
+only the matching byte range of rows.csv; a gene query looks the gene up in
+the sorted names and reads its rows. Neither loads the table.
+
+    python3 sv_store.py output/SV_summary_annotated.store --region chr7:57900000-58100000
+    python3 sv_store.py output/SV_summary_annotated.store --gene CFTR
+    python3 sv_store.py output/SV_summary_annotated.store --build output/SV_summary_annotated.csv
+
+Regions are 1-based and inclusive, like the AVINPUT start / end: an SV
+matches when start <= region end and end >= region start.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+
+STORE_VERSION = 1
+ROWS_FILE = "rows.csv"
+META_FILE = "meta.json"
+
+
+def store_path(table_path):
+    """output/SV_summary_annotated.csv -> output/SV_summary_annotated.store"""
+    return os.path.splitext(table_path)[0] + ".store"
+
+
+# -------------------------------------------------------------------
+# 1. BUILDING THE STORE
+# -------------------------------------------------------------------
+class StoreWriter:
+    """
+    Builds the store of an annotated table chunk by chunk, as the table
+    itself is written (table_io.TableWriter), so the table never has to be
+    held in memory at once:
+
+        with StoreWriter("output/SV_summary_annotated.store", columns) as store:
+            for chunk in chunks:
+                store.write(chunk)
+
+    The CSV text of every chunk is spilled to rows.csv.part as it comes in;
+    only chrom, start, end, the length of every row's line and the (row, gene)
+    hits are kept. close() sorts those, copies the lines into rows.csv in
+    store order and writes the index arrays. The store is the same, byte for
+    byte, as build_store of the whole table. Leaving the with block on an
+    exception discards the partial store.
+    """
+
+    def __init__(self, store_dir, columns):
+        self.store_dir = store_dir
+        self.columns = list(columns)
+        self.rows = 0
+        os.makedirs(store_dir, exist_ok=True)
+        self._part = os.path.join(store_dir, ROWS_FILE + ".part")
+        self._spill = open(self._part, "wb")
+        self._chrom_ids = {}        # chrom -> id, in order of first appearance
+        self._gene_ids = {}         # gene -> id, likewise
+        self._chroms, self._starts, self._ends, self._lengths = [], [], [], []
+        self._hit_rows, self._hit_genes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, df):
+        import pandas as pd
+        from table_io import gene_sets
+
+        if not len(df):
+            return
+        df = df[self.columns]
+        text = df.to_csv(index=False, header=False).encode()
+        self._spill.write(text)
+        line_ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n")) + 1
+        self._lengths.append(np.diff(line_ends, prepend=0))
+
+        codes, names = pd.factorize(df["chrom"].astype(str))
+        ids = np.array([self._chrom_ids.setdefault(name, len(self._chrom_ids))
+                        for name in names], dtype=np.int32)
+        self._chroms.append(ids[codes])
+        self._starts.append(df["start"].to_numpy(np.int64))
+        self._ends.append(df["end"].to_numpy(np.int64))
+
+        names, hits, offsets = gene_sets(df["Gene"])
+        ids = np.array([self._gene_ids.setdefault(str(name), len(self._gene_ids))
+                        for name in names], dtype=np.int32)
+        self._hit_genes.append(ids[hits])
+        self._hit_rows.append(self.rows + np.repeat(np.arange(len(df), dtype=np.int64),
+                                                    np.diff(offsets)))
+        self.rows += len(df)
+
+    def discard(self):
+        """Drops the partial store (rows.csv.part); the index files are left untouched."""
+        self._spill.close()
+        if os.path.exists(self._part):
+            os.remove(self._part)
+
+    def close(self):
+        """Writes the store. Returns the number of rows."""
+        import pandas as pd
+
+        self._spill.close()
+
+        def joined(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        lengths = joined(self._lengths, np.int64)
+        starts = joined(self._starts, np.int64)
+        ends = joined(self._ends, np.int64)
+        chrom_names = np.array(list(self._chrom_ids), dtype=str)
+        chrom_rank = np.empty(len(chrom_names), dtype=np.int32)
+        chrom_rank[np.argsort(chrom_names, kind="stable")] = np.arange(len(chrom_names))
+        chroms = chrom_rank[joined(self._chroms, np.int32)]
+
+        # chromosomes by name, then start, end; ties stay in table order
+        order = np.lexsort((ends, starts, chroms))
+        chroms, starts, ends = chroms[order], starts[order], ends[order]
+        chrom_names = np.sort(chrom_names)
+
+        # block of every chromosome, and the running max end within it
+        chrom_rows = {}
+        max_ends = ends.copy()
+        bounds = np.flatnonzero(np.r_[True, chroms[1:] != chroms[:-1], True]) if len(order) else []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            chrom_rows[str(chrom_names[chroms[lo]])] = [int(lo), int(hi)]
+            max_ends[lo:hi] = np.maximum.accumulate(ends[lo:hi])
+
+        # rows.csv: the header, then the spilled lines in store order, one
+        # copy per run of rows that were already consecutive
+        header = pd.DataFrame(columns=self.columns).to_csv(index=False).encode()
+        line_starts = np.cumsum(lengths) - lengths
+        with open(self._part, "rb") as src, open(os.path.join(self.store_dir, ROWS_FILE), "wb") as out:
+            out.write(header)
+            breaks = np.flatnonzero(np.diff(order) != 1) + 1
+            for run in np.split(order, breaks) if len(order) else []:
+                begin = line_starts[run[0]]
+                src.seek(begin)
+                out.write(src.read(line_starts[run[-1]] + lengths[run[-1]] - begin))
+        os.remove(self._part)
+        offsets = len(header) + np.concatenate([[0], np.cumsum(lengths[order])]).astype(np.int64)
+
+        # gene index: genes by name, the rows of each in store order
+        gene_names = np.array(list(self._gene_ids), dtype=str)
+        gene_rank = np.empty(len(gene_names), dtype=np.int32)
+        gene_rank[np.argsort(gene_names, kind="stable")] = np.arange(len(gene_names))
+        hit_genes = gene_rank[joined(self._hit_genes, np.int32)]
+        store_row = np.empty(len(order), dtype=np.int64)
+        store_row[order] = np.arange(len(order))
+        hit_rows = store_row[joined(self._hit_rows, np.int64)]
+        by_gene = np.lexsort((hit_rows, hit_genes))
+        gene_ptr = np.concatenate([[0], np.cumsum(np.bincount(hit_genes, minlength=len(gene_names)))])
+
+        arrays = {
+            "starts": starts.astype(np.int32),
+            "ends": ends.astype(np.int32),
+            "max_ends": max_ends.astype(np.int32),
+            "offsets": offsets,
+            "gene_names": np.sort(gene_names),
+            "gene_ptr": gene_ptr.astype(np.int64),
+            "gene_rows": hit_rows[by_gene].astype(np.int32),
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(self.store_dir, f"{name}.npy"), values)
+
+        with open(os.path.join(self.store_dir, META_FILE), "w") as f:
+            json.dump({
+                "version": STORE_VERSION,
+                "columns": self.columns,
+                "rows": self.rows,
+                "chroms": chrom_rows,
+            }, f, indent=1)
+        return self.rows
+
+
+def build_store(table, store_dir, chunk_size=100_000):
+    """
+    Writes the query store of an annotated table (DataFrame or path) into
+    store_dir. A path is read chunk_size rows at a time. Returns the number
+    of rows.
+    """
+    import pandas as pd
+    from table_io import iter_table
+
+    chunks = iter([table]) if isinstance(table, pd.DataFrame) else iter_table(table, chunk_size)
+    first = next(chunks)
+    with StoreWriter(store_dir, first.columns) as store:
+        for chunk in itertools.chain([first], chunks):
+            store.write(chunk)
+    return store.rows
+
+
+# -------------------------------------------------------------------
+# 2. QUERYING
+# -------------------------------------------------------------------
+def parse_region(region):
+    """"chr7:57,900,000-58,100,000" -> ("chr7", 57900000, 58100000); "chr7" -> whole chromosome."""
+    match = re.fullmatch(r"([^:]+)(?::([\d,]+)-([\d,]+))?", region.strip())
+    if not match:
+        raise ValueError(f"Bad region: {region} (use chrom:start-end)")
+    chrom, start, end = match.groups()
+    if start is None:
+        return chrom, 1, np.iinfo(np.int32).max
+    return chrom, int(start.replace(",", "")), int(end.replace(",", ""))
+
+
+class SVStore:
+    """
+    Read-only view of a store written by StoreWriter / build_store. The index arrays are
+    memory-mapped and rows are read with pread, so one SVStore can answer
+    queries from several threads.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE)) as f:
+            meta = json.load(f)
+        if meta["version"] != STORE_VERSION:
+            raise ValueError(f"{store_dir}: store version {meta['version']}, "
+                             f"expected {STORE_VERSION}; rebuild it")
+        self.columns = meta["columns"]
+        self.rows = meta["rows"]
+        self.chroms = meta["chroms"]
+
+        def load(name):
+            return np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.starts = load("starts")
+        self.ends = load("ends")
+        self.max_ends = load("max_ends")
+        self.offsets = load("offsets")
+        self.gene_names = load("gene_names")
+        self.gene_ptr = load("gene_ptr")
+        self.gene_rows = load("gene_rows")
+        self._fd = os.open(os.path.join(store_dir, ROWS_FILE), os.O_RDONLY)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def region_rows(self, chrom, start, end):
+        """Store rows of the SVs overlapping chrom:start-end (1-based, inclusive)."""
+        if chrom not in self.chroms:
+            return np.zeros(0, dtype=np.int64)
+        lo, hi = self.chroms[chrom]
+        # rows lo..hi are sorted by start; max_ends is non-decreasing within them
+        first = lo + np.searchsorted(self.max_ends[lo:hi], start, side="left")
+        last = lo + np.searchsorted(self.starts[lo:hi], end, side="right")
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        return first + np.flatnonzero(self.ends[first:last] >= start)
+
+    def gene_rows_of(self, gene):
+        """Store rows of the SVs hitting gene."""
+        i = np.searchsorted(self.gene_names, gene)
+        if i >= len(self.gene_names) or self.gene_names[i] != gene:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.gene_rows[self.gene_ptr[i]:self.gene_ptr[i + 1]], dtype=np.int64)
+
+    def read_lines(self, rows):
+        """CSV text (no header) of the given store rows, in row order."""
+        rows = np.sort(np.asarray(rows, dtype=np.int64))
+        if not len(rows):
+            return b""
+        # one read per run of consecutive rows
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        parts = []
+        for run in np.split(rows, breaks):
+            begin, stop = self.offsets[run[0]], self.offsets[run[-1] + 1]
+            parts.append(os.pread(self._fd, int(stop - begin), int(begin)))
+        return b"".join(parts)
+
+    def _table(self, rows):
+        import pandas as pd
+
+        text = self.read_lines(rows)
+        if not text:
+            return pd.DataFrame(columns=self.columns)
+        return pd.read_csv(io.BytesIO(text), header=None, names=self.columns)
+
+    def region(self, chrom, start, end):
+        """DataFrame of the SVs overlapping chrom:start-end (1-based, inclusive)."""
+        return self._table(self.region_rows(chrom, start, end))
+
+    def gene(self, gene):
+        """DataFrame of the SVs hitting gene."""
+        return self._table(self.gene_rows_of(gene))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query (or build) an annotated SV store")
+    parser.add_argument("store", help="store directory, e.g. output/SV_summary_annotated.store")
+    parser.add_argument("--region", action="append", default=[],
+                        help="chrom:start-end (1-based, inclusive); can be repeated")
+    parser.add_argument("--gene", action="append", default=[], help="gene name; can be repeated")
+    parser.add_argument("--build", metavar="TABLE",
+                        help="(re)build the store from this annotated table first")
+    args = parser.parse_args()
+
+    if args.build:
+        rows = build_store(args.build, args.store)
+        print(f"{args.store} is saved ({rows} SVs).", file=sys.stderr)
+
+    if args.region or args.gene:
+        with SVStore(args.store) as store:
+            # CSV to stdout: header, then the rows of every query in turn
+            out = sys.stdout.buffer
+            out.write((",".join(store.columns) + "\n").encode())
+            for region in args.region:
+                out.write(store.read_lines(store.region_rows(*parse_region(region))))
+            for gene in args.gene:
+                out.write(store.read_lines(store.gene_rows_of(gene)))
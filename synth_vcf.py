@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Synthetic Delly VCF generator (for benchmarks and scaling tests).
+
+Writes a Delly-style SV VCF with any number of records on hg38 coordinates
+taken from hg38_refGene.bed. Everything the pipeline looks at is
+configurable:
+
+    - number of records (10k ... 10M; written chunk by chunk per chromosome)
+    - SVTYPE mix and per-type SV length spectra (log-normal)
+    - PRECISE / IMPRECISE ratio and the share of non-PASS records
+    - genotype distribution of the founders, de novo and missing-call rates
+    - trio (3 samples, sample3 = child, as script.sh expects) or a cohort of
+      several trios (father, mother, child per family, optional PED file)
+
+Records are placed either inside a gene of the BED (genic_fraction) or
+uniformly along the chromosome, and are sorted by position like Delly output.
+"""
+import argparse
+
+import numpy as np
+
+from interval_index import read_bed
+
+
+# SVTYPE -> share of records
+SVTYPE_MIX = {"DEL": 0.55, "INS": 0.25, "DUP": 0.12, "INV": 0.08}
+
+# SVTYPE -> (median length in bp, sigma of log-length)
+LENGTH_SPECTRA = {
+    "DEL": (800, 1.6),
+    "INS": (300, 0.8),
+    "DUP": (5_000, 1.5),
+    "INV": (20_000, 1.4),
+}
+
+# Founder genotype -> frequency
+GT_FREQS = {"0/0": 0.62, "0/1": 0.24, "1/1": 0.12, "./.": 0.02}
+
+FORMAT = "GT:GL:GQ:FT:RCL:RC:RCR:RDCN:DR:DV:RR:RV"
+BASES = np.array(list("ACGT"))
+
+
+# -------------------------------------------------------------------
+# 1. GENOME LAYOUT FROM THE GENE BED
+# -------------------------------------------------------------------
+def genome_layout(gene_bed="hg38_refGene.bed"):
+    """
+    {chrom: (chromosome length, gene starts, gene ends)} for the primary
+    chromosomes of the BED; the length is the end of the last gene.
+    """
+    genes = read_bed(gene_bed)
+    genes = genes[genes[0].str.fullmatch(r"chr(\d+|X|Y)")]
+    starts, ends = genes[1].to_numpy(), genes[2].to_numpy()
+    layout = {}
+    for chrom, rows in genes.groupby(0, sort=False).indices.items():
+        layout[chrom] = (int(ends[rows].max()), starts[rows], ends[rows])
+    return layout
+
+
+# -------------------------------------------------------------------
+# 2. GENOTYPES
+# -------------------------------------------------------------------
+def _transmit(rng, gt):
+    """One allele (0/1) passed on by parents with genotype codes 0/1/2."""
+    return np.where(gt == 1, rng.integers(0, 2, len(gt)), gt // 2)
+
+
+def simulate_genotypes(rng, n, n_samples, gt_freqs=None, denovo_rate=0.01):
+    """
+    (n x n_samples) GT strings. Every full triple of samples is a family
+    (father, mother, child): parents are drawn from gt_freqs, the child
+    inherits one allele from each, and with denovo_rate a 0/0 child of two
+    0/0 parents becomes 0/1. Leftover samples are drawn like founders.
+    The "./." frequency is applied to every sample afterwards.
+    """
+    gt_freqs = gt_freqs or GT_FREQS
+    called = {k: v for k, v in gt_freqs.items() if k != "./."}
+    codes = np.array([{"0/0": 0, "0/1": 1, "1/1": 2}[k] for k in called])
+    p = np.array(list(called.values()), dtype=float)
+    p /= p.sum()
+
+    G = np.empty((n, n_samples), dtype=np.int8)
+    for s in range(0, n_samples - n_samples % 3, 3):
+        father = codes[rng.choice(len(codes), n, p=p)]
+        mother = codes[rng.choice(len(codes), n, p=p)]
+        child = _transmit(rng, father) + _transmit(rng, mother)
+        denovo = (father == 0) & (mother == 0) & (rng.random(n) < denovo_rate)
+        child[denovo] = 1
+        G[:, s], G[:, s + 1], G[:, s + 2] = father, mother, child
+    for s in range(n_samples - n_samples % 3, n_samples):
+        G[:, s] = codes[rng.choice(len(codes), n, p=p)]
+
+    labels = np.array(["0/0", "0/1", "1/1", "./."], dtype=object)
+    G[rng.random(G.shape) < gt_freqs.get("./.", 0.0)] = 3
+    return labels[G]
+
+
+# -------------------------------------------------------------------
+# 3. WRITING THE VCF
+# -------------------------------------------------------------------
+def _header(samples):
+    lines = [
+        "##fileformat=VCFv4.2",
+        "##source=synth_vcf.py (synthetic Delly calls)",
+        "##reference=hg38",
+        '##INFO=<ID=PRECISE,Number=0,Type=Flag,Description="Precise structural variation">',
+        '##INFO=<ID=IMPRECISE,Number=0,Type=Flag,Description="Imprecise structural variation">',
+        '##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">',
+        '##INFO=<ID=END,Number=1,Type=Integer,Description="End position of the structural variant">',
+        '##INFO=<ID=PE,Number=1,Type=Integer,Description="Paired-end support of the structural variant">',
+        '##INFO=<ID=SR,Number=1,Type=Integer,Description="Split-read support">',
+        '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+        "#" + "\t".join(["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER",
+                         "INFO", "FORMAT"] + list(samples)),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _records(rng, chrom, n, region, first_id, samples, svtype_mix, length_spectra,
+             precise_fraction, pass_fraction, genic_fraction, gt_freqs, denovo_rate):
+    """
+    n VCF lines in region = (lo, hi, gene starts, gene ends) of one
+    chromosome, sorted by position.
+    """
+    lo, hi, gene_starts, gene_ends = region
+    types = np.array(list(svtype_mix))
+    p = np.array(list(svtype_mix.values()), dtype=float)
+    svtype = types[rng.choice(len(types), n, p=p / p.sum())]
+
+    pos = rng.integers(lo, hi, n)
+    if len(gene_starts):
+        genic = rng.random(n) < genic_fraction
+        gene = rng.integers(0, len(gene_starts), genic.sum())
+        span = gene_ends[gene] - gene_starts[gene]
+        pos[genic] = gene_starts[gene] + (rng.random(len(gene)) * span).astype(np.int64)
+    pos += 1
+
+    sv_len = np.ones(n, dtype=np.int64)
+    for t, (median, sigma) in length_spectra.items():
+        of_type = svtype == t
+        sv_len[of_type] = np.maximum(
+            rng.lognormal(np.log(median), sigma, of_type.sum()).astype(np.int64), 50
+        )
+    # Delly reports insertions as a point (END = POS + 1) with INSLEN
+    end = np.where(svtype == "INS", pos + 1, pos + sv_len)
+
+    order = np.argsort(pos, kind="stable")
+    svtype, pos, end, sv_len = svtype[order], pos[order], end[order], sv_len[order]
+
+    precise = rng.random(n) < precise_fraction
+    passed = rng.random(n) < pass_fraction
+    pe = rng.poisson(np.where(precise, 12, 6))
+    sr = rng.poisson(10, n)
+    ref = BASES[rng.integers(0, 4, n)]
+    gt = simulate_genotypes(rng, n, len(samples), gt_freqs, denovo_rate)
+
+    fmt_tail = ":-10,-1,0:10000:PASS:100:200:100:2:0:0:10:10"
+    lines = []
+    for i in range(n):
+        t = svtype[i]
+        info = (f"{'PRECISE' if precise[i] else 'IMPRECISE'};SVTYPE={t};"
+                f"SVMETHOD=EMBL.DELLYv1.1.6;END={end[i]};PE={pe[i]};MAPQ=60;"
+                f"CT={'NtoN' if t == 'INS' else '3to5'};CIPOS=-10,10;CIEND=-10,10")
+        if t == "INS":
+            info += f";INSLEN={sv_len[i]}"
+        if precise[i]:
+            info += f";SRMAPQ=60;SR={sr[i]};SRQ=0.99"
+        genotypes = "\t".join(g + fmt_tail for g in gt[i])
+        lines.append(
+            f"{chrom}\t{pos[i]}\t{t}{first_id + i:08d}\t{ref[i]}\t<{t}>\t1000\t"
+            f"{'PASS' if passed[i] else 'LowQual'}\t{info}\t{FORMAT}\t{genotypes}\n"
+        )
+    return lines
+
+
+def generate_vcf(vcf_file, n_records, n_samples=3, gene_bed="hg38_refGene.bed",
+                 svtype_mix=None, length_spectra=None, precise_fraction=0.9,
+                 pass_fraction=0.95, genic_fraction=0.5, gt_freqs=None,
+                 denovo_rate=0.01, sample_prefix="HG", seed=0, chunk_size=100_000):
+    """
+    Writes a synthetic Delly VCF with n_records records and returns the
+    sample names. Records are spread over the chromosomes in proportion to
+    their length and generated chunk_size at a time, so memory stays
+    bounded for 10M-record files.
+    """
+    rng = np.random.default_rng(seed)
+    layout = genome_layout(gene_bed)
+    samples = [f"{sample_prefix}{512 + i:05d}" for i in range(n_samples)]
+
+    chroms = list(layout)
+    lengths = np.array([layout[c][0] for c in chroms], dtype=float)
+    per_chrom = rng.multinomial(n_records, lengths / lengths.sum())
+
+    written = 0
+    with open(vcf_file, "w") as out:
+        out.write(_header(samples))
+        for chrom, n in zip(chroms, per_chrom):
+            # each chunk covers its own slice of the chromosome, so the
+            # records stay sorted without holding the chromosome in memory
+            length, starts, ends = layout[chrom]
+            n_chunks = max(1, -(-n // chunk_size))
+            bounds = np.linspace(0, length, n_chunks + 1).astype(np.int64)
+            counts = rng.multinomial(n, np.diff(bounds) / length)
+            for lo, hi, k in zip(bounds[:-1], bounds[1:], counts):
+                if k == 0:
+                    continue
+                # genes starting in the slice, clipped to it
+                in_slice = (starts >= lo) & (starts < hi)
+                region = (lo, hi, starts[in_slice], np.minimum(ends[in_slice], hi))
+                lines = _records(
+                    rng, chrom, int(k), region, written, samples,
+                    svtype_mix or SVTYPE_MIX, length_spectra or LENGTH_SPECTRA,
+                    precise_fraction, pass_fraction, genic_fraction,
+                    gt_freqs, denovo_rate,
+                )
+                out.writelines(lines)
+                written += int(k)
+
+    return samples
+
+
+def write_ped(ped_file, samples):
+    """PED file for the families of generate_vcf (father, mother, child)."""
+    with open(ped_file, "w") as f:
+        for s in range(0, len(samples) - len(samples) % 3, 3):
+            family = f"fam{s // 3 + 1}"
+            father, mother, child = samples[s:s + 3]
+            f.write(f"{family}\t{father}\t0\t0\t1\t0\n")
+            f.write(f"{family}\t{mother}\t0\t0\t2\t0\n")
+            f.write(f"{family}\t{child}\t{father}\t{mother}\t0\t0\n")
+
+
+def _mix(text):
+    """'DEL=0.5,INS=0.3' -> {"DEL": 0.5, "INS": 0.3}"""
+    return {k: float(v) for k, v in (item.split("=") for item in text.split(","))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic Delly VCF generator")
+    parser.add_argument("vcf", help="output VCF")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=3,
+                        help="3 = one trio; more = cohort of trios (father, mother, child)")
+    parser.add_argument("--ped", help="also write a PED file for the families")
+    parser.add_argument("--gene-bed", default="hg38_refGene.bed")
+    parser.add_argument("--svtype-mix", type=_mix, help="e.g. DEL=0.6,INS=0.2,DUP=0.1,INV=0.1")
+    parser.add_argument("--gt-freqs", type=_mix, help="e.g. 0/0=0.6,0/1=0.25,1/1=0.13,./.=0.02")
+    parser.add_argument("--precise-fraction", type=float, default=0.9)
+    parser.add_argument("--pass-fraction", type=float, default=0.95)
+    parser.add_argument("--genic-fraction", type=float, default=0.5)
+    parser.add_argument("--denovo-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    samples = generate_vcf(
+        args.vcf, args.records, n_samples=args.samples, gene_bed=args.gene_bed,
+        svtype_mix=args.svtype_mix, gt_freqs=args.gt_freqs,
+        precise_fraction=args.precise_fraction, pass_fraction=args.pass_fraction,
+        genic_fraction=args.genic_fraction, denovo_rate=args.denovo_rate,
+        seed=args.seed,
+    )
+    if args.ped:
+        write_ped(args.ped, samples)
+        print(f"{args.ped} is saved.")
+    print(f"{args.vcf} is saved ({args.records} records, {len(samples)} samples).")
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the top of the repository
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+
+@pytest.fixture(scope="session")
+def references(tmp_path_factory):
+    """
+    Reference tracks for annotate_sv. The exon BED is not shipped, so the
+    first and last 250 bp of every gene stand in for its exons.
+    """
+    import pandas as pd
+
+    genes = pd.read_csv(os.path.join(REPO, "hg38_refGene.bed"), sep="\t")
+    genes.columns = ["chrom", "start", "end", "gene"]
+    first = genes.assign(end=(genes["start"] + 250).clip(upper=genes["end"]))
+    last = genes.assign(start=(genes["end"] - 250).clip(lower=genes["start"]))
+    exon_bed = str(tmp_path_factory.mktemp("references") / "exons.bed")
+    pd.concat([first, last]).sort_values(["chrom", "start"]).to_csv(
+        exon_bed, sep="\t", header=False, index=False)
+    return {
+        "gene_bed": os.path.join(REPO, "hg38_refGene.bed"),
+        "exon_bed": exon_bed,
+        "clinvar_bed": os.path.join(REPO, "clinvar_SV.track.bed"),
+        "clinvar_condition_bed": None,
+    }
+
+
+@pytest.fixture(scope="session")
+def trio(tmp_path_factory):
+    """(VCF, directory of its parsed trio outputs and AVINPUTs) of a synthetic trio."""
+    import delly_parser
+    from synth_vcf import generate_vcf
+
+    root = tmp_path_factory.mktemp("trio")
+    vcf = str(root / "calls.vcf")
+    generate_vcf(vcf, 3_000, gene_bed=os.path.join(REPO, "hg38_refGene.bed"), seed=5)
+    delly_parser.write_trio_outputs(vcf, str(root / "output"), str(root))
+    return vcf, root
@@ -0,0 +1,25 @@
+"""annotate_sv.py: the chunked annotation against the one-shot annotation."""
+import shutil
+
+import pytest
+
+from annotate_sv import annotate_sv, annotate_sv_chunked
+
+BACKENDS = ["index", "cache",
+            pytest.param("bedtools", marks=pytest.mark.skipif(
+                not shutil.which("bedtools"), reason="bedtools is not installed"))]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_chunked_output_matches_batch(tmp_path, references, trio, backend):
+    _, trio_dir = trio
+    avinput = str(trio_dir / "SV_summary.avinput")
+    batch, chunked = str(tmp_path / "batch.csv"), str(tmp_path / "chunked.csv")
+
+    annotated = annotate_sv(avinput, batch, backend=backend, **references)
+    # chunks far smaller than the input, and not a divisor of its length
+    rows = annotate_sv_chunked(avinput, chunked, backend=backend, chunk_size=317, **references)
+
+    assert rows == len(annotated) > 317
+    with open(batch, "rb") as one_shot, open(chunked, "rb") as in_chunks:
+        assert in_chunks.read() == one_shot.read()
@@ -0,0 +1,108 @@
+"""Annotation through the persistent cache against a fresh annotation."""
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import annotation_cache
+from annotate_sv import _annotate
+from annotation_cache import KEY_COLS, VALUE_COLS, AnnotationCache
+from interval_index import read_bed
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENE_BED = os.path.join(REPO, "hg38_refGene.bed")
+CLINVAR_TRACK = os.path.join(REPO, "clinvar_SV.track.bed")
+
+
+@pytest.fixture(scope="module")
+def references(tmp_path_factory):
+    """(gene, exon, ClinVar track, condition) BEDs; the exons are cut from the genes."""
+    genes = read_bed(GENE_BED)
+    exons = genes.iloc[::3].copy()
+    exons[2] = np.minimum(exons[2], exons[1] + 300)
+    exon_bed = str(tmp_path_factory.mktemp("refs") / "exons.bed")
+    exons.to_csv(exon_bed, sep="\t", header=False, index=False)
+    return GENE_BED, exon_bed, CLINVAR_TRACK, None
+
+
+def avinput(n, seed):
+    """AVINPUT table: random SVs plus some on ClinVar SVs."""
+    rng = np.random.default_rng(seed)
+    start = rng.integers(1, 150_000_000, n)
+    random = pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr2", "chr7", "chr17", "chrX"], n),
+        "start": start,
+        "end": start + rng.integers(0, 200_000, n),
+    })
+    clinvar = read_bed(CLINVAR_TRACK).sample(n // 10, replace=True, random_state=seed)
+    on_clinvar = pd.DataFrame({"chrom": clinvar[0], "start": clinvar[1] + 1, "end": clinvar[2]})
+    df = pd.concat([random, on_clinvar], ignore_index=True)
+    df["ref"] = "0"
+    df["alt"] = rng.choice(["<DEL>", "<DUP>", "<INV>"], len(df))
+    return df
+
+
+def test_cache_matches_fresh_annotation(references, tmp_path):
+    first, second = avinput(2_000, seed=0), avinput(2_000, seed=1)
+    # a later sample: half the SVs come back, half are new
+    later = pd.concat([first.iloc[::2], second], ignore_index=True)
+
+    with AnnotationCache(str(tmp_path / "annotation_cache.sqlite")) as cache:
+        for df in (first, first, later):   # cold, warm, partly cached
+            fresh = _annotate(df, *references, "index")
+            cached = _annotate(df, *references, "index", annotation_cache=cache)
+            # same values; text columns can come back as object instead of str
+            pd.testing.assert_frame_equal(cached, fresh, check_dtype=False)
+
+        fingerprint = cache.fingerprint(references)
+        assert len(cache.lookup(later, fingerprint)) == len(later.drop_duplicates(
+            ["chrom", "start", "end", "alt"]))
+
+
+def annotated(chrom, n):
+    """An annotated table (KEY_COLS + VALUE_COLS) of n SVs on chrom."""
+    start = np.arange(1, n + 1) * 1_000
+    return pd.DataFrame({
+        "chrom": chrom, "start": start, "end": start + 500, "alt": "<DEL>",
+        "Function": "intergenic", "Gene": "-", "Priority": "Low",
+        "clinvar_germline_classification": "-", "clinvar_condition": "-",
+        "clinvar_pathogenic_rank": 0,
+    })[KEY_COLS + VALUE_COLS]
+
+
+def test_eviction_drops_least_recently_used(tmp_path, monkeypatch):
+    clock = [1_000]
+    monkeypatch.setattr(annotation_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    a, b, c = annotated("chr1", 60), annotated("chr2", 40), annotated("chr3", 20)
+
+    with AnnotationCache(str(tmp_path / "cache.sqlite"), max_entries=100) as cache:
+        fingerprint = "refs"
+        cache.add(a, fingerprint)
+        clock[0] = 2_000
+        cache.add(b, fingerprint)
+        assert len(cache) == 100
+
+        # A is used again later than B
+        clock[0] = 10_000
+        assert len(cache.lookup(a, fingerprint)) == 60
+        # 20 over the cap: the 20 + 10 % of the cap least recently used go (all from B)
+        clock[0] = 20_000
+        cache.add(c, fingerprint)
+        assert len(cache) == 90
+        assert len(cache.lookup(a, fingerprint)) == 60
+        assert len(cache.lookup(c, fingerprint)) == 20
+        assert len(cache.lookup(b, fingerprint)) == 10
+
+
+def test_add_under_the_cap_counts_once(tmp_path):
+    statements = []
+    with AnnotationCache(str(tmp_path / "cache.sqlite"), max_entries=1_000) as cache:
+        cache.db.set_trace_callback(statements.append)
+        for i in range(10):
+            cache.add(annotated(f"chr{i + 1}", 50), "refs")
+        assert len(cache) == 500
+    counts = [s for s in statements if "COUNT(*)" in s]
+    # the first add counts the table, then the running count is enough (plus len() above)
+    assert len(counts) == 2
@@ -0,0 +1,116 @@
+"""annotation_server.py: answers like annotate_sv, and 503 when overloaded."""
+import json
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import annotation_client
+import annotation_server
+from annotate_sv import annotate_sv
+
+
+@pytest.fixture
+def start_server(monkeypatch):
+    """start_server(service) -> URL of a server on a free port, shut down after the test."""
+    servers = []
+
+    def start(service):
+        monkeypatch.setattr(annotation_server._Handler, "service", service)
+        monkeypatch.setattr(annotation_server._Handler, "log_message", lambda *args: None)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), annotation_server._Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, input_file, output_file):
+    """(HTTP status, reply) of one /annotate request."""
+    request = urllib.request.Request(
+        url + "/annotate", headers={"Content-Type": "application/json"},
+        data=json.dumps({"input_file": input_file, "output_file": output_file}).encode())
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_reply_matches_annotate_sv(tmp_path, references, trio, start_server):
+    _, trio_dir = trio
+    avinput = str(trio_dir / "denovo_variants_imprecise.avinput")
+    service = annotation_server.AnnotationService(
+        annotation_server.References(**references), workers=1)
+    url = start_server(service)
+
+    reply = annotation_client.annotate_sv(avinput, str(tmp_path / "served.csv"), server=url)
+    expected = annotate_sv(avinput, str(tmp_path / "local.csv"), backend="index", **references)
+
+    assert reply["rows"] == len(expected)
+    assert (tmp_path / "served.csv").read_bytes() == (tmp_path / "local.csv").read_bytes()
+
+
+class Stall:
+    """Stands in for the worker slots: no batch gets a worker until opened."""
+
+    def __init__(self):
+        self.waiting = threading.Event()
+        self.opened = threading.Event()
+
+    def acquire(self):
+        self.waiting.set()
+        self.opened.wait()
+
+    def release(self):
+        pass
+
+
+def test_overloaded_server_answers_503(tmp_path, start_server):
+    # never annotates: every request is held back by the stall, then fails on its missing input
+    references = types.SimpleNamespace(beds=("genes.bed", "exons.bed", "clinvar.bed", None))
+    service = annotation_server.AnnotationService(references, workers=1, batch_size=1,
+                                                  max_pending=1)
+    stall = service._slots = Stall()
+    url = start_server(service)
+    missing = str(tmp_path / "missing.avinput")
+
+    replies = []
+
+    def held(n):
+        thread = threading.Thread(target=lambda: replies.append(
+            post(url, missing, str(tmp_path / f"{n}.csv"))))
+        thread.start()
+        return thread
+
+    # the first request is taken by the batch loop, which waits for a worker;
+    # the second fills the queue of pending requests
+    first = held(1)
+    assert stall.waiting.wait(30)
+    second = held(2)
+    for _ in range(300):
+        if service.requests.qsize() == 1:
+            break
+        time.sleep(0.1)
+    assert service.requests.qsize() == 1
+
+    status, reply = post(url, missing, str(tmp_path / "3.csv"))
+    assert status == 503
+    assert reply == {"error": "too many pending requests"}
+    # the client gives up once its retries are spent
+    with pytest.raises(RuntimeError, match="too many pending requests"):
+        annotation_client.annotate_sv(missing, str(tmp_path / "4.csv"), server=url, retries=0)
+
+    # freed, the held requests are answered (with their own errors)
+    stall.opened.set()
+    first.join(30)
+    second.join(30)
+    assert sorted(status for status, _ in replies) == [500, 500]
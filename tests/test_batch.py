@@ -0,0 +1,42 @@
+"""batch.py: the cohort summary of several families."""
+import os
+
+import batch
+import delly_parser
+from synth_vcf import generate_vcf
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def family_summary(tmp_path, family, seed):
+    vcf = str(tmp_path / f"{family}.vcf")
+    generate_vcf(vcf, 1_000, gene_bed=os.path.join(REPO, "hg38_refGene.bed"),
+                 sample_prefix=family, seed=seed)
+    output_dir = tmp_path / family / "output"
+    delly_parser.write_trio_outputs(vcf, str(output_dir), str(tmp_path / family))
+    return delly_parser.load_summary(str(output_dir / "summary_stats.json"))
+
+
+def test_cohort_summary_sums_records_and_keeps_samples_per_family(tmp_path):
+    summaries = {family: family_summary(tmp_path, family, seed)
+                 for family, seed in [("FAM1", 1), ("FAM2", 2)]}
+    cohort = batch.cohort_summary(summaries)
+
+    fam1, fam2 = summaries["FAM1"], summaries["FAM2"]
+    for section in ["reads", "alleles", "variants"]:
+        assert cohort[section] == {key: fam1[section][key] + fam2[section][key]
+                                   for key in fam1[section]}
+    for section in ["sv_types", "genotype_combinations", "chromosomes"]:
+        keys = set(fam1[section]) | set(fam2[section])
+        assert cohort[section] == {key: fam1[section].get(key, 0) + fam2[section].get(key, 0)
+                                   for key in keys}
+    assert cohort["chrX"] == {"total": fam1["chrX"]["total"] + fam2["chrX"]["total"]}
+
+    # sample1..3 are different people in every family: nothing per sample is summed
+    for key in ["samples", "deviations", "parents", "child_sex"]:
+        assert key not in cohort
+    assert cohort["families"] == {
+        family: {key: summary[key] for key in batch.FAMILY_SUMMARY_KEYS}
+        for family, summary in summaries.items()
+    }
+    assert cohort["families"]["FAM1"]["samples"]["sample1"].startswith("FAM1")
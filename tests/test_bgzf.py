@@ -0,0 +1,103 @@
+"""bgzf.py: region queries against brute force, indexes against htslib."""
+import gzip
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bgzf
+
+
+def sv_table(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.integers(1, 240_000_000, n)
+    # mostly short SVs, some of several Mb (they land in the upper bins)
+    length = np.where(rng.random(n) < 0.05, rng.integers(1, 5_000_000, n),
+                      rng.integers(0, 5_000, n))
+    return pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr2", "chr10", "chrX"], n),
+        "start": start,
+        "end": start + length,
+        "ref": "0",
+        "alt": rng.choice(["<DEL>", "<DUP>", "<INS>", "<INV>"], n),
+        "note": ["x" * k for k in rng.integers(0, 300, n)],
+    })
+
+
+@pytest.fixture(params=["tbi", "csi"])
+def table_file(request, tmp_path):
+    path = str(tmp_path / "sv.tsv.gz")
+    bgzf.write_bgzf_table(sv_table(), path, index=request.param)
+    return path, request.param
+
+
+def records(path):
+    """(line, chrom, start, end) of every record of the file, in file order."""
+    with gzip.open(path, "rb") as f:
+        lines = [line for line in f if not line.startswith(b"#")]
+    fields = [line.split(b"\t", 3) for line in lines]
+    return [(line, f[0].decode(), int(f[1]), int(f[2])) for line, f in zip(lines, fields)]
+
+
+def test_fetch_matches_brute_force(table_file):
+    path, _ = table_file
+    rows = records(path)
+    index = bgzf.read_index(path)
+    rng = np.random.default_rng(1)
+
+    regions = [("chr1", 1, 1), ("chrX", 1, 250_000_000)]
+    # the exact bounds of some records: both ends are inclusive
+    for _, chrom, start, end in [rows[i] for i in rng.integers(0, len(rows), 20)]:
+        regions += [(chrom, start, start), (chrom, end, end), (chrom, end + 1, end + 1)]
+    for chrom, start, size in zip(rng.choice(["chr1", "chr2", "chr10", "chrX"], 100),
+                                  rng.integers(1, 240_000_000, 100),
+                                  rng.choice([1, 1_000, 100_000, 3_000_000], 100)):
+        regions.append((str(chrom), int(start), int(start + size)))
+
+    for chrom, start, end in regions:
+        expected = [line for line, c, s, e in rows
+                    if c == chrom and s <= end and max(e, s) >= start]
+        assert bgzf.fetch(path, chrom, start, end, index=index) == expected, (chrom, start, end)
+
+
+def test_fetch_unknown_chromosome(table_file):
+    path, _ = table_file
+    assert bgzf.fetch(path, "chrM", 1, 16_569) == []
+
+
+def test_bgzf_is_plain_gzip(table_file):
+    path, _ = table_file
+    df = pd.read_csv(path, sep="\t")
+    assert len(df) == 20_000
+    assert list(df.columns[:3]) == ["#chrom", "start", "end"]
+
+
+def test_htslib_reads_our_index(table_file):
+    """
+    tabix (or pysam, the same htslib) answers region queries through our
+    .tbi / .csi with the same records as a scan of the file.
+    """
+    path, kind = table_file
+    rows = records(path)
+    regions = [("chr1", 1, 1_000_000), ("chr2", 50_000_000, 50_000_000),
+               ("chr10", 120_000_000, 125_000_000), ("chrX", 1, 250_000_000)]
+    regions += [(c, s, e) for _, c, s, e in rows[::2_000]]
+
+    if shutil.which("tabix"):
+        def htslib_fetch(chrom, start, end):
+            out = subprocess.run(["tabix", path, f"{chrom}:{start}-{end}"],
+                                 check=True, capture_output=True).stdout
+            return out.splitlines(keepends=True)
+    else:
+        pysam = pytest.importorskip("pysam")
+        tabix = pysam.TabixFile(path, index=f"{path}.{kind}")
+
+        def htslib_fetch(chrom, start, end):
+            return [line.encode() + b"\n" for line in tabix.fetch(chrom, start - 1, end)]
+
+    for chrom, start, end in regions:
+        expected = [line for line, c, s, e in rows
+                    if c == chrom and s <= end and max(e, s) >= start]
+        assert htslib_fetch(chrom, start, end) == expected, (chrom, start, end)
@@ -0,0 +1,70 @@
+"""delly_parser.py against script.sh (awk) on a synthetic trio VCF."""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import delly_parser
+from synth_vcf import generate_vcf
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TABLES = [
+    "output/SV_summary.txt",
+    "output/denovo_variants_precise.txt",
+    "output/denovo_variants_imprecise.txt",
+    "SV_summary.avinput",
+    "denovo_variants_precise.avinput",
+    "denovo_variants_imprecise.avinput",
+]
+
+
+# write_trio_outputs settings: one process, and a pool over many small
+# chunks (they finish out of order and are merged back in file order)
+RUNS = {
+    "serial": {"chunk_size": 700, "workers": 1},
+    "pool": {"chunk_size": 97, "workers": 4},
+}
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory):
+    """(awk run dir, {run: python run dir}) for the same VCF."""
+    if not shutil.which("awk"):
+        pytest.skip("awk is not installed")
+    root = tmp_path_factory.mktemp("trio")
+    vcf = str(root / "calls.vcf")
+    generate_vcf(vcf, 5_000, gene_bed=os.path.join(REPO, "hg38_refGene.bed"), seed=3)
+
+    # script.sh writes output/... and *.avinput under the working directory
+    awk_dir = root / "awk"
+    (awk_dir / "output").mkdir(parents=True)
+    subprocess.run(["awk", "-f", os.path.join(REPO, "script.sh"), vcf],
+                   cwd=awk_dir, check=True, stdout=subprocess.DEVNULL)
+
+    py_dirs = {}
+    for run, settings in RUNS.items():
+        py_dirs[run] = root / run
+        delly_parser.write_trio_outputs(vcf, str(py_dirs[run] / "output"), str(py_dirs[run]),
+                                        **settings)
+    return awk_dir, py_dirs
+
+
+@pytest.mark.parametrize("run", RUNS)
+@pytest.mark.parametrize("table", TABLES)
+def test_tables_match_script_sh(runs, run, table):
+    awk_dir, py_dir = runs[0], runs[1][run]
+    with open(awk_dir / table, "rb") as awk, open(py_dir / table, "rb") as python:
+        assert python.read() == awk.read()
+
+
+@pytest.mark.parametrize("run", RUNS)
+def test_summary_matches_script_sh(runs, run):
+    """Same statistics; awk prints its count tables in hash order, so they are compared parsed."""
+    awk_dir, py_dir = runs[0], runs[1][run]
+    with open(awk_dir / "output/summary_stats.txt") as f:
+        expected = delly_parser.summary_from_text(f.read())
+    with open(py_dir / "output/summary_stats.txt") as f:
+        assert delly_parser.summary_from_text(f.read()) == expected
+    assert delly_parser.load_summary(str(py_dir / "output/summary_stats.json")) == expected
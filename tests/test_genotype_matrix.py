@@ -0,0 +1,62 @@
+"""genotype_matrix.py against the parser's TrioStats (and brute force) on one trio VCF."""
+import pytest
+
+import delly_parser
+import genotype_matrix
+
+
+@pytest.fixture(scope="module")
+def stats(trio):
+    """(GenotypeStats over every candidate trio, TrioStats of the parser) of the trio VCF."""
+    vcf, trio_dir = trio
+    summary = delly_parser.load_summary(str(trio_dir / "output" / "summary_stats.json"))
+    return (genotype_matrix.genotype_stats(vcf, chunk_size=700),
+            delly_parser.TrioStats.from_dict(summary))
+
+
+def candidate(matrix, child):
+    """Row of the candidate trio with `child` as the child."""
+    return [tuple(t) for t in matrix.trios].index(
+        (child, *[s for s in range(3) if s != child]))
+
+
+def test_samples_and_deviations_match_trio_stats(stats):
+    matrix, trio = stats
+    assert matrix.samples == trio.samples
+    # script.sh's "deviations" of sample i: the de novo pattern with i as the child
+    assert [matrix.denovo[candidate(matrix, i)] for i in range(3)] == trio.deviations
+    assert tuple(matrix.likely_child()) == (2, 0, 1)
+
+
+def test_chrx_het_matches_trio_stats(stats):
+    matrix, trio = stats
+    t = candidate(matrix, 2)
+    assert matrix.trio_x_total[t] == trio.total_x
+    # columns (child, parent1, parent2) -> sample3, sample1, sample2
+    assert list(matrix.trio_x_het[t]) == [trio.het[2], trio.het[0], trio.het[1]]
+    assert matrix.child_sex(t) == ("FEMALE" if trio.child_is_female() else "MALE")
+
+
+def test_mendelian_violations_match_brute_force(trio, stats):
+    vcf, _ = trio
+    matrix, _ = stats
+
+    def alt_count(gt):
+        alleles = gt.replace("|", "/").split("/")
+        return None if "." in alleles else sum(a != "0" for a in alleles)
+
+    expected = [0] * len(matrix.trios)
+    with delly_parser.open_vcf(vcf) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            # the parser reads PASS records only
+            if line.startswith("#") or fields[6] != "PASS":
+                continue
+            gts = [alt_count(s.split(":")[0]) for s in fields[9:]]
+            for t, (child, p1, p2) in enumerate(matrix.trios):
+                if None in (gts[child], gts[p1], gts[p2]):
+                    continue
+                transmits = [{0}, {0, 1}, {1}]
+                possible = {a + b for a in transmits[gts[p1]] for b in transmits[gts[p2]]}
+                expected[t] += gts[child] not in possible
+    assert list(matrix.violations) == expected
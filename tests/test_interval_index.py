@@ -0,0 +1,80 @@
+"""IntervalIndex and the cached index against a brute-force overlap scan."""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from interval_index import IntervalIndex, read_bed
+from reference_cache import load_reference
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENE_BED = os.path.join(REPO, "hg38_refGene.bed")
+
+
+@pytest.fixture(scope="module")
+def genes():
+    return read_bed(GENE_BED)
+
+
+@pytest.fixture(scope="module")
+def svs(genes):
+    """SVs as the annotation queries them: chrom, start0, end (BED)."""
+    rng = np.random.default_rng(0)
+    n = 1_000
+    start0 = rng.integers(0, 150_000_000, n)
+    length = np.where(rng.random(n) < 0.1, rng.integers(1, 3_000_000, n),
+                      rng.integers(1, 5_000, n))
+    random = pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr7", "chrX", "chrUn_nohit"], n),
+        "start0": start0,
+        "end": start0 + length,
+    })
+    # SVs ending where a gene starts or starting where one ends (no overlap,
+    # half-open), and one base inside either bound (overlap)
+    picked = genes.iloc[rng.integers(0, len(genes), 200)]
+    edges = pd.concat([
+        pd.DataFrame({"chrom": picked[0], "start0": picked[1] - 100, "end": picked[1]}),
+        pd.DataFrame({"chrom": picked[0], "start0": picked[2], "end": picked[2] + 100}),
+        pd.DataFrame({"chrom": picked[0], "start0": picked[1] - 100, "end": picked[1] + 1}),
+        pd.DataFrame({"chrom": picked[0], "start0": picked[2] - 1, "end": picked[2] + 100}),
+    ])
+    return pd.concat([random, edges], ignore_index=True)
+
+
+def brute_force(ref, svs):
+    """(query row, reference row) of every overlapping pair, by query then reference."""
+    chroms, starts, ends = ref[0].to_numpy(), ref[1].to_numpy(), ref[2].to_numpy()
+    pairs = []
+    for q, (chrom, start0, end) in enumerate(svs.itertuples(index=False)):
+        hits = np.flatnonzero((chroms == chrom) & (starts < end) & (start0 < ends))
+        pairs += [(q, r) for r in hits]
+    return pairs
+
+
+def test_query_matches_brute_force(genes, svs):
+    query_rows, ref_rows = IntervalIndex(genes).query(svs["chrom"], svs["start0"], svs["end"])
+    assert list(zip(query_rows.tolist(), ref_rows.tolist())) == brute_force(genes, svs)
+
+
+def test_cached_index_matches(genes, svs, tmp_path):
+    bed = str(tmp_path / "genes.bed")
+    shutil.copy(GENE_BED, bed)
+    cols = ["sv_chrom", "sv_start0", "sv_end", "gene_chrom", "gene_start", "gene_end", "gene_name"]
+
+    # the first load compiles the cache next to the BED
+    cached = load_reference(bed)
+    assert os.path.isdir(f"{bed}.cache")
+    pd.testing.assert_frame_equal(cached.intersect(svs, cols), IntervalIndex(genes).intersect(svs, cols))
+
+
+def test_empty_bed(svs, tmp_path):
+    """An empty reference gives no overlaps, as bedtools does (no parse error)."""
+    bed = tmp_path / "empty.bed"
+    bed.write_text("")
+    cols = ["sv_chrom", "sv_start0", "sv_end", "gene_chrom", "gene_start", "gene_end", "gene_name"]
+
+    for index in (IntervalIndex.from_bed(str(bed)), load_reference(str(bed))):
+        hits = index.intersect(svs, cols)
+        assert hits.empty and list(hits.columns) == cols
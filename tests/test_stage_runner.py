@@ -0,0 +1,46 @@
+"""StageRunner: a stage is skipped only when its inputs, params and outputs are unchanged."""
+import os
+
+from stage_runner import Stage, StageRunner
+
+
+def plot_stage(tmp_path, runs):
+    """A stage that writes two PNGs into a directory output, counting its runs."""
+    source = tmp_path / "table.csv"
+    plot_dir = tmp_path / "plots"
+
+    def run():
+        runs.append(1)
+        plot_dir.mkdir(exist_ok=True)
+        for name in ("top_genes.png", "sv_types.png"):
+            (plot_dir / name).write_text(source.read_text())
+
+    source.write_text("chrom,start,end\nchr1,1,100\n")
+    return Stage("plots", run, inputs=[str(source)], outputs=[str(plot_dir)])
+
+
+def run_twice(tmp_path, change):
+    runs = []
+    stage = plot_stage(tmp_path, runs)
+    manifest = str(tmp_path / "manifest.json")
+    StageRunner([stage], manifest).run()
+    change(tmp_path)
+    StageRunner([stage], manifest).run()
+    return len(runs)
+
+
+def test_unchanged_stage_is_skipped(tmp_path):
+    assert run_twice(tmp_path, lambda d: None) == 1
+
+
+def test_changed_input_reruns(tmp_path):
+    assert run_twice(tmp_path, lambda d: (d / "table.csv").write_text("chrom,start,end\n")) == 2
+
+
+def test_deleted_file_of_directory_output_reruns(tmp_path):
+    assert run_twice(tmp_path, lambda d: os.remove(d / "plots" / "top_genes.png")) == 2
+    assert (tmp_path / "plots" / "top_genes.png").exists()
+
+
+def test_edited_file_of_directory_output_reruns(tmp_path):
+    assert run_twice(tmp_path, lambda d: (d / "plots" / "sv_types.png").write_text("edited")) == 2
@@ -0,0 +1,126 @@
+"""streaming.py: the streamed tables against the batch stages, and a failing stage."""
+import threading
+
+import pytest
+
+import annotate_sv
+import delly_parser
+import streaming
+from sv_stats import compute_stats
+from table_io import read_table, write_table
+
+TRIO_TABLES = [
+    "output/SV_summary.txt",
+    "output/denovo_variants_precise.txt",
+    "output/denovo_variants_imprecise.txt",
+    "SV_summary.avinput",
+    "denovo_variants_precise.avinput",
+    "denovo_variants_imprecise.avinput",
+]
+ANNOTATED = {
+    "called": "SV_summary",
+    "denovo_precise": "denovo_variants_precise",
+    "denovo_imprecise": "denovo_variants_imprecise",
+}
+
+
+def stream(vcf, run_dir, references, **kwargs):
+    """stream_trio into run_dir, on a thread: a stage that never stops fails the test."""
+    result = {}
+
+    def run():
+        try:
+            result["value"] = streaming.stream_trio(
+                vcf,
+                {name: str(run_dir / f"{stem}_annotated.csv") for name, stem in ANNOTATED.items()},
+                str(run_dir / "exonic.csv"), str(run_dir / "pathogenic.csv"),
+                output_dir=str(run_dir / "output"), avinput_dir=str(run_dir),
+                chunk_size=500, **references, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(timeout=300)
+    assert not thread.is_alive(), "stream_trio did not return"
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_stream_matches_batch(tmp_path, references, trio):
+    vcf, trio_dir = trio
+    stream_dir, batch_dir = tmp_path / "stream", tmp_path / "batch"
+    batch_dir.mkdir()
+    stats, trio_stats = stream(vcf, stream_dir, references, workers=2)
+
+    for table in TRIO_TABLES:
+        assert read(stream_dir / table) == read(trio_dir / table)
+
+    # the batch stages: annotate every AVINPUT, then filter the called SVs
+    for name, stem in ANNOTATED.items():
+        batch = str(batch_dir / f"{stem}_annotated.csv")
+        annotate_sv.annotate_sv(str(trio_dir / f"{stem}.avinput"), batch, backend="index",
+                                **references)
+        assert read(stream_dir / f"{stem}_annotated.csv") == read(batch)
+    called = read_table(str(batch_dir / "SV_summary_annotated.csv"))
+    for part, rows in [("exonic", annotate_sv.exonic_rows(called)),
+                       ("pathogenic", annotate_sv.pathogenic_rows(called))]:
+        write_table(rows, str(batch_dir / f"{part}.csv"))
+        assert read(stream_dir / f"{part}.csv") == read(batch_dir / f"{part}.csv")
+
+    for name, table in [("SV_summary_annotated", "SV_summary_annotated.csv"),
+                        ("SV_summary_annotated_exonic", "exonic.csv"),
+                        ("SV_summary_annotated_pathLink", "pathogenic.csv")]:
+        assert stats[name].to_dict() == compute_stats(read_table(str(batch_dir / table))).to_dict()
+    assert trio_stats.to_dict() == delly_parser.load_summary(
+        str(trio_dir / "output" / "summary_stats.json"))
+
+
+def fail_on_second_call(module, name, monkeypatch):
+    original = getattr(module, name)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError(f"{name} failed")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, failing)
+
+
+@pytest.mark.parametrize("stage", ["parse", "annotate", "filter"])
+def test_failing_stage_stops_the_stream(tmp_path, references, trio, monkeypatch, stage):
+    vcf, _ = trio
+    if stage == "parse":
+        # the parser hands over its first chunk, then fails
+        original = delly_parser.write_trio_outputs
+
+        def failing_parser(*args, on_chunk, **kwargs):
+            chunks = []
+
+            def first_chunk_only(texts):
+                if chunks:
+                    raise RuntimeError("write_trio_outputs failed")
+                chunks.append(texts)
+                on_chunk(texts)
+            return original(*args, on_chunk=first_chunk_only, **kwargs)
+
+        monkeypatch.setattr(delly_parser, "write_trio_outputs", failing_parser)
+    elif stage == "annotate":
+        fail_on_second_call(annotate_sv, "_annotate", monkeypatch)
+    else:
+        fail_on_second_call(annotate_sv, "exonic_rows", monkeypatch)
+
+    # the other stages are cancelled (_Cancelled) and the error comes out of stream_trio
+    with pytest.raises(RuntimeError, match="failed"):
+        stream(vcf, tmp_path, references, store_dir=str(tmp_path / "store"))
+    # and the query store of the unfinished run is not left behind
+    assert not (tmp_path / "store" / "meta.json").exists()
+    assert not (tmp_path / "store" / "rows.csv.part").exists()
@@ -0,0 +1,88 @@
+"""sv_store.py: the store built from chunks against the one built from the whole table."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sv_store
+from annotate_sv import annotate_sv_chunked
+from table_io import read_table
+
+
+def annotated_table(n=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.integers(1, 50_000_000, n)
+    genes = np.array(["-", "BRCA2", "CFTR", "CFTR;TP53", "TP53;BRCA2;ZNF1", "-"])
+    return pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr2", "chr10", "chrX"], n),
+        "start": start,
+        # a few exact duplicates of coordinates, to keep the tie order honest
+        "end": start + rng.integers(0, 3, n) * rng.integers(0, 200_000, n),
+        "alt": rng.choice(["<DEL>", "<DUP>", "<INV>"], n),
+        "Gene": rng.choice(genes, n),
+        "note": ["a, \"quoted\" note" if k == 0 else "x" * k for k in rng.integers(0, 50, n)],
+    })
+
+
+def store_files(store_dir):
+    return {name: open(os.path.join(store_dir, name), "rb").read()
+            for name in sorted(os.listdir(store_dir))}
+
+
+def test_chunks_build_the_whole_table_store(tmp_path):
+    df = annotated_table()
+    sv_store.build_store(df, str(tmp_path / "whole"))
+
+    with sv_store.StoreWriter(str(tmp_path / "chunks"), df.columns) as store:
+        for lo in range(0, len(df), 613):
+            store.write(df.iloc[lo:lo + 613])
+    # a table on disk is read back in chunks too
+    df.to_csv(tmp_path / "table.csv", index=False)
+    assert sv_store.build_store(str(tmp_path / "table.csv"), str(tmp_path / "file"),
+                                chunk_size=1_000) == len(df)
+
+    whole = store_files(tmp_path / "whole")
+    assert "rows.csv.part" not in whole
+    assert store_files(tmp_path / "chunks") == whole
+    assert store_files(tmp_path / "file") == whole
+
+
+def test_queries_match_brute_force(tmp_path):
+    df = annotated_table()
+    with sv_store.StoreWriter(str(tmp_path), df.columns) as store:
+        for lo in range(0, len(df), 1_000):
+            store.write(df.iloc[lo:lo + 1_000])
+
+    def key(table):
+        return sorted(map(tuple, table[["chrom", "start", "end", "alt"]].astype(str).values))
+
+    with sv_store.SVStore(str(tmp_path)) as store:
+        for chrom, start, end in [("chr1", 1, 1_000_000), ("chr10", 20_000_000, 20_500_000),
+                                  ("chrX", 1, 60_000_000), ("chr3", 1, 10)]:
+            hits = df[(df["chrom"] == chrom) & (df["start"] <= end) & (df["end"] >= start)]
+            assert key(store.region(chrom, start, end)) == key(hits)
+        for gene in ["BRCA2", "CFTR", "TP53", "ZNF1", "NOPE"]:
+            hits = df[df["Gene"].str.split(";").apply(lambda g: gene in g)]
+            assert key(store.gene(gene)) == key(hits)
+
+
+def test_failed_write_leaves_no_store(tmp_path):
+    df = annotated_table(100)
+    with pytest.raises(RuntimeError):
+        with sv_store.StoreWriter(str(tmp_path), df.columns) as store:
+            store.write(df)
+            raise RuntimeError("annotation failed")
+    assert os.listdir(tmp_path) == []
+
+
+def test_chunked_annotation_writes_the_store(tmp_path, references, trio):
+    _, trio_dir = trio
+    output = str(tmp_path / "SV_summary_annotated.csv")
+    rows = annotate_sv_chunked(str(trio_dir / "SV_summary.avinput"), output,
+                               chunk_size=400, store_dir=str(tmp_path / "chunked.store"),
+                               **references)
+    assert rows > 400
+
+    sv_store.build_store(read_table(output), str(tmp_path / "whole.store"))
+    assert store_files(tmp_path / "chunked.store") == store_files(tmp_path / "whole.store")